@@ -1,4 +1,4 @@
 from .ibaq import iBAQ
 from .flyability import estimate_flyability_upper_bound
-from .partner_summarization import partner_aggregation, partner_top_n_mean
+from .partner_summarization import partner_aggregation, partner_top_n_mean, partner_summary_matrix
 from .maxlfq import maxlfq
\ No newline at end of file
@@ -45,6 +45,12 @@ def max_lfq(
     result_column: Optional[str]=None,
     pbar: bool = False,
 ) -> pd.Series:
+    """Aggregates values with alphapept's MaxLFQ implementation (requires alphapept).
+
+    The dataset is converted into alphapept's long data frame format first. Prefer
+    pyproteonet.aggregation.maxlfq, which works on the value matrices directly and supports the same
+    delayed normalization (normalize=True) as well as fractions.
+    """
     if result_column is None:
         result_column = partner_column
     samples = dataset.sample_names
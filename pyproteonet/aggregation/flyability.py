@@ -1,9 +1,28 @@
-from tqdm.auto import tqdm
+from typing import List
+import weakref
+
+import numpy as np
 import pandas as pd
 
 from ..data.dataset import Dataset
 
 
+def _input_objects(
+    dataset: Dataset, column: str, protein_molecule: str, peptide_molecule: str, mapping: str
+) -> List[object]:
+    # frames the estimate depends on, pandas clears a frame's column cache on every assignment, so a value column
+    # that was modified (e.g. by set_column_flat or .loc) is a new Series object the next time it is accessed
+    objects = [
+        dataset.molecule_set.mappings[mapping].df,
+        dataset.molecules[protein_molecule],
+        dataset.molecules[peptide_molecule],
+    ]
+    for sample in dataset.samples:
+        values = sample.values[peptide_molecule]
+        objects.append(values[column] if column in values.columns else values)
+    return objects
+
+
 def estimate_flyability_upper_bound(
     dataset: Dataset,
     column: str = "abundance",
@@ -12,6 +31,7 @@ def estimate_flyability_upper_bound(
     mapping: str = "protein",
     remove_one: bool = True,
     pbar: bool = False,
+    use_cache: bool = True,
 ):
     """Gives an upper bound estimate for the peptide flyability.
 
@@ -19,9 +39,14 @@ def estimate_flyability_upper_bound(
     To get an estimate for peptide flyability unique peptides (peptides that only
     occur within a single protein) are examined. Unique peptides of the same protein
     should all have the same abundance (at least in theory). In reality, they show
-    different abundances. We estimate the flyabilies of every peptide by computing 
+    different abundances. We estimate the flyabilies of every peptide by computing
     its abundance relative to the most abundant unique peptide for the protein.
 
+    The per protein maxima are computed for all samples at once as segment maxima over the protein-peptide pairs
+    (sorted by protein). Results are cached in the dataset and reused as long as the mapping, the molecules and the
+    peptide value columns are the same objects (assigning values to a column invalidates the cache, writing directly
+    into the array of an already accessed column Series does not).
+
     Args:
         dataset (Dataset): Dataset to estimate flyability distribution for.
         column (str, optional): Value column to use for the estimation (should represent peptide abundance). Defaults to 'abundance'.
@@ -31,32 +56,57 @@ def estimate_flyability_upper_bound(
         remove_one (bool, optional): Per protein all abundances are calculated relative to the highest abundant peptide.
         This results one peptide having a relative abundance of one for every protein (a peak at one in the resulting histogram).
         It makes sense to remove this peak at one from the histogram. Defaults to True.
-        pbar (bool, optional): Show progress bar. Defaults to False.
+        pbar (bool, optional): Unused, kept for compatibility. Defaults to False.
+        use_cache (bool, optional): Whether to use and update the dataset's flyability cache. Defaults to True.
 
     Returns:
         _type_: The flyability estimate for all peptides that could be estimated.
     """
+    key = (column, protein_molecule, peptide_molecule, mapping, remove_one)
+    if use_cache:
+        objects = _input_objects(
+            dataset, column=column, protein_molecule=protein_molecule, peptide_molecule=peptide_molecule, mapping=mapping
+        )
+        version = (tuple(dataset.sample_names), dataset.missing_value)
+        cached = dataset.flyability_cache.get(key)
+        if (
+            cached is not None
+            and cached[0] == version
+            and len(cached[1]) == len(objects)
+            and all(ref() is obj for ref, obj in zip(cached[1], objects))
+        ):
+            return cached[2].copy()
+    values = dataset.get_samples_value_tensor(molecule=peptide_molecule, columns=[column])[0]
     mapped = dataset.molecule_set.get_mapped_pairs(
         molecule_a=protein_molecule, molecule_b=peptide_molecule, mapping=mapping
     )
     unique_peps = dataset.molecule_set.get_mapping_unique_molecules(
         molecule=peptide_molecule, partner_molecule=protein_molecule, mapping=mapping
     )
-    mapped = mapped[mapped.peptide.isin(unique_peps)]
-    max_divided = []
-    iterator = dataset.samples
-    if pbar:
-        iterator = tqdm(iterator)
-    for sample in iterator:
-        mapped.loc[:, column] = sample.values[peptide_molecule][column].loc[mapped[peptide_molecule]].values
-        groups = mapped.groupby(protein_molecule)[column]
-        mapped.loc[:, "max"] = groups.max().loc[mapped[protein_molecule]].values
-        mapped.loc[:, "sum"] = groups.sum().loc[mapped[protein_molecule]].values
-        mapped.loc[:, "count"] = groups.count().loc[mapped[protein_molecule]].values
-        max_d = (mapped[column] / mapped["max"])[mapped["count"] > 1]
-        if remove_one:
-            max_d = max_d[max_d != 1]
-        max_divided.append(max_d)
-    max_divided = pd.concat(max_divided)
-    max_divided.name = "flyability_upper_bound"
+    mapped = mapped[mapped[peptide_molecule].isin(unique_peps)]
+    protein_pos = dataset.molecules[protein_molecule].index.get_indexer(mapped[protein_molecule])
+    peptide_pos = dataset.molecules[peptide_molecule].index.get_indexer(mapped[peptide_molecule])
+    # (pair x sample) values, grouped by protein for the segment reductions
+    pair_values = values[peptide_pos]
+    order = np.argsort(protein_pos, kind="stable")
+    groups, starts, group_of_pair = np.unique(protein_pos[order], return_index=True, return_inverse=True)
+    max_divided = np.empty(pair_values.shape)
+    keep = np.zeros(pair_values.shape, dtype=bool)
+    if len(groups):
+        sorted_values = pair_values[order]
+        group_max = np.fmax.reduceat(sorted_values, starts, axis=0)
+        group_count = np.add.reduceat(~np.isnan(sorted_values), starts, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            max_divided[order] = sorted_values / group_max[group_of_pair]
+        keep[order] = group_count[group_of_pair] > 1
+    if remove_one:
+        keep &= max_divided != 1
+    # flattened sample by sample like concatenating per sample results
+    max_divided = pd.Series(
+        max_divided.T[keep.T],
+        index=np.tile(mapped.index.to_numpy(), values.shape[1])[keep.T.ravel()],
+        name="flyability_upper_bound",
+    )
+    if use_cache:
+        dataset.flyability_cache[key] = (version, [weakref.ref(obj) for obj in objects], max_divided.copy())
     return max_divided
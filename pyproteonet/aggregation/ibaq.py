@@ -1,7 +1,11 @@
+from typing import Optional, Union
+from pathlib import Path
+
 import numpy as np
 
 from ..data.dataset import Dataset
 from ..processing.molecule_set_transforms import num_theoretical_peptides
+from .partner_summarization import partner_summary_matrix
 
 def iBAQ(
     dataset: Dataset,
@@ -14,17 +18,49 @@ def iBAQ(
     only_unique: bool = False,
     mapping: str = 'protein',
     inplace: bool = False,
-    tqdm_bar: bool = False
+    tqdm_bar: bool = False,
+    num_workers: int = 4,
+    cache_dir: Optional[Union[str, Path]] = None,
 ):
+    """Computes iBAQ values (summed peptide abundances divided by the number of theoretical peptides) for all proteins.
+
+    The numbers of theoretical peptides are cached in the molecule set, so repeated calls (e.g. in parameter sweeps)
+    only digest the proteome once per enzyme and length bounds. Peptide sums and the division are computed for all
+    samples at once.
+
+    Args:
+        dataset (Dataset): Dataset with proteins (having a sequence column) and peptides.
+        input_column (str, optional): Peptide value column. Defaults to 'abundance'.
+        sequence_column (str, optional): Protein sequence column. Defaults to "sequence".
+        enzyme (str, optional): Enzyme name as known to pyOpenMS. Defaults to "Trypsin".
+        min_peptide_length (int, optional): Minimum theoretical peptide length. Defaults to 6.
+        max_peptide_length (int, optional): Maximum theoretical peptide length. Defaults to 30.
+        result_column (str, optional): Protein column to write the iBAQ values to. Defaults to "abundance".
+        only_unique (bool, optional): Only sum peptides mapped to a single protein. Defaults to False.
+        mapping (str, optional): Protein-peptide mapping. Defaults to 'protein'.
+        inplace (bool, optional): Whether to write into the given dataset instead of a copy. Defaults to False.
+        tqdm_bar (bool, optional): Unused, kept for compatibility. Defaults to False.
+        num_workers (int, optional): Number of processes used for digestion. Defaults to 4.
+        cache_dir (Optional[Union[str, Path]], optional): Directory of the persistent digestion cache.
+            Defaults to None (no persistent cache).
+
+    Returns:
+        Optional[Dataset]: The dataset with iBAQ values if not inplace.
+    """
     num_peptides = num_theoretical_peptides(molecule_set=dataset.molecule_set, min_peptide_length=min_peptide_length, max_peptide_length=max_peptide_length,
-        enzyme=enzyme, sequence_column=sequence_column, result_column=None)
-    res = sum(dataset=dataset, only_unique=only_unique, input_column=input_column, result_column=result_column, mapping=mapping, inplace=inplace, tqdm_bar=tqdm_bar)
+        enzyme=enzyme, sequence_column=sequence_column, result_column=None, num_workers=num_workers,
+        cache_dir=cache_dir)
+    sums = partner_summary_matrix(dataset=dataset, molecule='protein', mapping=mapping, partner_column=input_column,
+                                  method='sum', only_unique=only_unique)
     if not inplace:
-        dataset = res # type: ignore
-    for sample in dataset.samples:
-        prot_vals = sample.values['protein']
-        prot_vals[result_column] /= num_peptides.loc[prot_vals.index]
-        mask = prot_vals[result_column] == np.inf
-        prot_vals.loc[mask, result_column] = dataset.missing_value
+        dataset = dataset.copy()
+    protein_ids = dataset.molecules['protein'].index
+    sums = sums.reindex(protein_ids)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ibaq = sums.to_numpy() / num_peptides.loc[protein_ids].to_numpy()[:, np.newaxis]
+    # proteins without (observed) peptides give NaN, proteins without theoretical peptides inf
+    ibaq[~np.isfinite(ibaq)] = dataset.missing_value
+    sums.loc[:, :] = ibaq
+    dataset.set_samples_value_matrix(matrix=sums, molecule='protein', column=result_column)
     if not inplace:
-        return dataset
\ No newline at end of file
+        return dataset
@@ -2,7 +2,7 @@
 Mostly taken from https://github.com/InfectionMedicineProteomics/DPKS/
 '''
 
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import math
 
 import numba  # type: ignore
@@ -13,6 +13,7 @@ from numba import njit, prange  # type: ignore
 from numba_progress import ProgressBar
 
 from ..data.dataset import Dataset
+from ..normalization.maxlfq import normalize_experiment_SLSQP, normalize_least_squares
 
 
 @njit(nogil=True)
@@ -235,39 +236,112 @@ def quantify_groups(groupings, minimum_subgroups, min_ratios: int, median_fallba
     return results
 
 
+def _fraction_profiles(values: np.ndarray, samples: List[str], fractions: Optional[Dict[str, Tuple[str, Any]]]):
+    # (partner x sample) values -> (fraction x sample group x partner) profiles
+    if fractions is None:
+        return values.T[np.newaxis, :, :], list(samples)
+    groups = list(dict.fromkeys([fractions[s][0] for s in samples]))
+    fraction_names = list(dict.fromkeys([fractions[s][1] for s in samples]))
+    profiles = np.full((len(fraction_names), len(groups), values.shape[0]), np.nan)
+    for i, sample in enumerate(samples):
+        group, fraction = fractions[sample]
+        profiles[fraction_names.index(fraction), groups.index(group)] = values[:, i]
+    return profiles, groups
+
+
+def delayed_normalization(profiles: np.ndarray) -> np.ndarray:
+    """Computes MaxLFQ's delayed normalization factors for every fraction and sample.
+
+    Args:
+        profiles (np.ndarray): (non log) intensities of shape (number of fractions, number of samples, number of partner molecules).
+
+    Returns:
+        np.ndarray: Normalization factors of shape (number of fractions, number of samples).
+    """
+    if profiles.shape[0] == 1:
+        return normalize_least_squares(profiles[0].T)[np.newaxis, :]
+    return normalize_experiment_SLSQP(profiles)
+
+
 def maxlfq(dataset: Dataset, molecule: str, mapping: str, partner_column: str, min_subgroups: int = 1, min_ratios: int = 1, median_fallback: bool = True,
-           is_log: bool = False, only_unique: bool = True, result_column: Optional[str] = None, pbar: bool = False):
-    mapped = dataset.molecule_set.get_mapped(molecule=molecule, mapping=mapping)
+           is_log: bool = False, only_unique: bool = True, result_column: Optional[str] = None, pbar: bool = False,
+           normalize: bool = False, fractions: Optional[Dict[str, Tuple[str, Any]]] = None):
+    """Aggregates partner molecule values (e.g. peptides) into molecule values (e.g. proteins) with the MaxLFQ algorithm.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to aggregate to (e.g. protein).
+        mapping (str): The mapping between molecule and partner molecule.
+        partner_column (str): The partner molecule column to aggregate.
+        min_subgroups (int, optional): Minimum number of partner molecules to quantify a molecule. Defaults to 1.
+        min_ratios (int, optional): Minimum number of ratios between two samples to consider them connected. Defaults to 1.
+        median_fallback (bool, optional): Use the median for samples not connected to any other sample. Defaults to True.
+        is_log (bool, optional): Whether values are log transformed. Defaults to False.
+        only_unique (bool, optional): Only use partner molecules mapped to exactly one molecule. Defaults to True.
+        result_column (Optional[str], optional): If given the result is written to this molecule column. Defaults to None.
+        pbar (bool, optional): Whether to show a progress bar. Defaults to False.
+        normalize (bool, optional): Apply MaxLFQ's delayed normalization (per fraction and sample factors minimizing the
+            squared log ratios of all considered partner molecules between samples) before aggregation. Defaults to False.
+        fractions (Optional[Dict[str, Tuple[str, Any]]], optional): Maps every sample (e.g. a fractionated run) to the
+            (sample group, fraction) it belongs to. Fractions are normalized separately and summed per sample group before
+            aggregation. The result is indexed by sample group and written to all samples of the group. Defaults to None.
+
+    Returns:
+        pd.Series: The aggregated values indexed by sample (or sample group) and id.
+    """
     molecule, mapping, partner = dataset.infer_mapping(molecule=molecule, mapping=mapping)
-    degs = dataset.molecule_set.get_mapping_degrees(molecule=partner, mapping=mapping)
+    pairs = dataset.molecule_set.get_mapped_pairs(molecule_a=partner, molecule_b=molecule, mapping=mapping)
     if only_unique:
-        considered_partners = degs[degs==1].index
-    else:
-        considered_partners = degs.index
-    mapped = mapped[mapped.index.get_level_values(partner).isin(considered_partners)]
-    mat = dataset.get_samples_value_matrix(molecule=partner, column=partner_column)
-    if not is_log:
-        mat = np.log(mat)
-    groupings_dict = {mol:np.ascontiguousarray(mat.loc[partner_ids.index.get_level_values(partner),:].to_numpy().astype(float))
-                    for mol,partner_ids in mapped.groupby(molecule)}
-    groupings = numba.typed.List()
-    group_ids = []
-    for key, group in groupings_dict.items():
-        groupings.append(group)
-        group_ids.append(key)
-    res_mat = pd.DataFrame(np.nan, index=dataset.molecules[molecule].index, columns=mat.columns)
-    progress_bar = None
-    if pbar:
-        progress_bar = ProgressBar(total=len(groupings))
-    res = quantify_groups(groupings=groupings, minimum_subgroups=min_subgroups, min_ratios=min_ratios, median_fallback=median_fallback,
-                          pbar=progress_bar)
-    if pbar:
-        progress_bar.close()
-    if not is_log:
-        res = math.e ** res
-    res_mat.loc[group_ids, :] = res
+        degs = dataset.molecule_set.get_mapping_degrees(molecule=partner, mapping=mapping)
+        pairs = pairs[pairs[partner].isin(degs[degs == 1].index)]
+    partner_ids = pd.Index(pairs[partner].unique())
+    partner_pos = partner_ids.get_indexer(pairs[partner])
+    samples = dataset.sample_names
+    values = dataset.get_samples_value_tensor(molecule=partner, columns=[partner_column])[0][
+        dataset.molecules[partner].index.get_indexer(partner_ids)
+    ]
+    result_samples = samples
+    mat = values
+    if normalize or fractions is not None:
+        # normalization and summation of fractions work on non log intensities
+        if is_log:
+            values = np.exp(values)
+        profiles, result_samples = _fraction_profiles(values=values, samples=samples, fractions=fractions)
+        if normalize:
+            profiles = profiles * delayed_normalization(profiles)[:, :, np.newaxis]
+        summed = np.nansum(profiles, axis=0)
+        summed[np.isnan(profiles).all(axis=0)] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mat = np.log(summed.T)
+    elif not is_log:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mat = np.log(values)
+    mol_codes, group_ids = pd.factorize(pairs[molecule])
+    res_mat = pd.DataFrame(np.nan, index=dataset.molecules[molecule].index, columns=result_samples)
+    # without any mapped partners np.split would still return one empty grouping
+    if len(group_ids) > 0:
+        # one (partner x sample) matrix per molecule
+        order = np.argsort(mol_codes, kind="stable")
+        splits = np.cumsum(np.bincount(mol_codes, minlength=len(group_ids)))[:-1]
+        groupings = numba.typed.List()
+        for grouping in np.split(mat[partner_pos[order]], splits):
+            groupings.append(np.ascontiguousarray(grouping))
+        progress_bar = None
+        if pbar:
+            progress_bar = ProgressBar(total=len(groupings))
+        res = quantify_groups(groupings=groupings, minimum_subgroups=min_subgroups, min_ratios=min_ratios, median_fallback=median_fallback,
+                              pbar=progress_bar)
+        if pbar:
+            progress_bar.close()
+        if not is_log:
+            res = math.e ** res
+        res_mat.loc[group_ids, :] = res
     if result_column is not None:
-        dataset.set_samples_value_matrix(matrix=res_mat, molecule=molecule, column=result_column)
+        if fractions is None:
+            sample_mat = res_mat
+        else:
+            sample_mat = pd.DataFrame({s: res_mat[fractions[s][0]] for s in samples}, index=res_mat.index)
+        dataset.set_samples_value_matrix(matrix=sample_mat, molecule=molecule, column=result_column)
     vals = res_mat.stack().swaplevel()
     vals.index.set_names(["sample", "id"], inplace=True)
-    return vals
\ No newline at end of file
+    return vals
@@ -1,8 +1,9 @@
-from typing import Union, Callable, Optional
+from typing import Union, Callable, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from pandas.core.groupby.generic import SeriesGroupBy
+from numba import njit, prange  # type: ignore
 
 from ..utils.numpy import eq_nan
 from ..data.dataset import Dataset
@@ -24,6 +25,146 @@ def _get_mapped(
         mapped = mapped[mapped.deg==1]
     return mapped
 
+_SUMMARY_METHODS = {"top_n_mean": 0, "mean": 1, "sum": 2, "median": 3, "min": 4, "max": 5}
+
+
+@njit(nogil=True, parallel=True, cache=True)
+def _summarize_groups(values, partners, offsets, method, top_n):
+    # values: (partner molecules x samples) with NaN for missing values
+    # partners[offsets[g]:offsets[g + 1]]: value rows of the partners of group g
+    num_groups = len(offsets) - 1
+    num_samples = values.shape[1]
+    res = np.full((num_groups, num_samples), np.nan)
+    counts = np.zeros((num_groups, num_samples), dtype=np.int64)
+    for g in prange(num_groups):
+        start, end = offsets[g], offsets[g + 1]
+        buffer = np.empty(end - start)
+        for s in range(num_samples):
+            k = 0
+            for i in range(start, end):
+                v = values[partners[i], s]
+                if not np.isnan(v):
+                    buffer[k] = v
+                    k += 1
+            counts[g, s] = k
+            if k == 0:
+                continue
+            vals = buffer[:k]
+            if method == 0:
+                # partial selection: insertion into a descending buffer of the top_n largest values
+                top = np.empty(min(k, top_n))
+                m = 0
+                for v in vals:
+                    if m < len(top):
+                        m += 1
+                    elif v <= top[m - 1]:
+                        continue
+                    i = m - 1
+                    while i > 0 and top[i - 1] < v:
+                        top[i] = top[i - 1]
+                        i -= 1
+                    top[i] = v
+                res[g, s] = top.mean()
+            elif method == 1:
+                res[g, s] = vals.mean()
+            elif method == 2:
+                res[g, s] = vals.sum()
+            elif method == 3:
+                res[g, s] = np.median(vals)
+            elif method == 4:
+                res[g, s] = vals.min()
+            else:
+                res[g, s] = vals.max()
+    return res, counts
+
+
+def _partner_groups(
+    dataset: Dataset, molecule: str, mapping: str, only_unique: bool = True
+) -> Tuple[pd.Index, str, np.ndarray, np.ndarray]:
+    # partner positions grouped by molecule (CSR like offsets), only molecules with at least one partner are kept
+    molecule, mapping, partner_molecule = dataset.infer_mapping(molecule=molecule, mapping=mapping)
+    mapping_df = dataset.molecule_set.get_mapping(
+        mapping_name=mapping, molecule=molecule, partner_molecule=partner_molecule
+    ).df
+    molecule_pos = dataset.molecules[molecule].index.get_indexer(mapping_df.index.get_level_values(molecule))
+    partner_pos = dataset.molecules[partner_molecule].index.get_indexer(
+        mapping_df.index.get_level_values(partner_molecule)
+    )
+    if only_unique:
+        degs = np.bincount(partner_pos, minlength=len(dataset.molecules[partner_molecule]))
+        unique = degs[partner_pos] == 1
+        molecule_pos, partner_pos = molecule_pos[unique], partner_pos[unique]
+    order = np.argsort(molecule_pos, kind="stable")
+    molecule_pos, partner_pos = molecule_pos[order], partner_pos[order]
+    groups, starts = np.unique(molecule_pos, return_index=True)
+    offsets = np.append(starts, len(molecule_pos)).astype(np.int64)
+    return dataset.molecules[molecule].index[groups], partner_molecule, partner_pos.astype(np.int64), offsets
+
+
+def partner_summary_matrix(
+    dataset: Dataset,
+    molecule: str,
+    mapping: str,
+    partner_column: str,
+    method: str = "top_n_mean",
+    top_n: int = 3,
+    min_partners: int = 1,
+    only_unique: bool = True,
+    is_log: bool = False,
+    samples_per_block: int = 64,
+) -> pd.DataFrame:
+    """Summarizes the values of mapped partner molecules per molecule and sample (e.g. top3 peptides per protein).
+
+    Computed directly from the partner value matrix and the mapping, one block of samples at a time, without building a
+    long (sample, molecule, partner) frame. Top n values are found by partial selection within every group.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to summarize values for (e.g. protein).
+        mapping (str): The mapping to the partner molecules (e.g. peptide).
+        partner_column (str): The partner value column.
+        method (str, optional): One of "top_n_mean", "mean", "sum", "median", "min" or "max". Defaults to "top_n_mean".
+        top_n (int, optional): Number of largest values averaged by "top_n_mean". Defaults to 3.
+        min_partners (int, optional): Summaries of fewer non-missing partner values are set to NaN. Defaults to 1.
+        only_unique (bool, optional): Only use partners mapped to exactly one molecule. Defaults to True.
+        is_log (bool, optional): Whether values are logarithmized, they are exponentiated before and logarithmized
+            after summarizing. Defaults to False.
+        samples_per_block (int, optional): Number of samples processed at once. Defaults to 64.
+
+    Returns:
+        pd.DataFrame: (molecule x sample) matrix of summaries for all molecules with at least one mapped partner.
+    """
+    method = method.lower()
+    if method not in _SUMMARY_METHODS:
+        raise AttributeError(f"Aggregation function {method} not known.")
+    ids, partner_molecule, partners, offsets = _partner_groups(
+        dataset=dataset, molecule=molecule, mapping=mapping, only_unique=only_unique
+    )
+    samples = list(dataset.sample_names)
+    res = np.full((len(ids), len(samples)), np.nan)
+    for start in range(0, len(samples), samples_per_block):
+        block = samples[start : start + samples_per_block]
+        values = dataset.get_samples_value_tensor(molecule=partner_molecule, columns=[partner_column], samples=block)[0]
+        values[eq_nan(values, dataset.missing_value)] = np.nan
+        if is_log:
+            values = np.exp(values)
+        block_res, counts = _summarize_groups(values, partners, offsets, _SUMMARY_METHODS[method], top_n)
+        block_res[counts < min_partners] = np.nan
+        res[:, start : start + len(block)] = block_res
+    if is_log:
+        res = np.log(res)
+    return pd.DataFrame(res, index=ids, columns=pd.Index(samples, name="sample"))
+
+
+def _matrix_to_flat(matrix: pd.DataFrame) -> pd.Series:
+    # (sample, id) series of all non-missing values, ordered like a groupby(["sample", molecule]) result
+    group_pos, sample_pos = np.nonzero(~np.isnan(matrix.to_numpy()))
+    index = pd.MultiIndex.from_arrays(
+        [matrix.columns[sample_pos], matrix.index[group_pos]], names=["sample", "id"]
+    )
+    return pd.Series(matrix.to_numpy()[group_pos, sample_pos], index=index, name="quanti").sort_index()
+
+
 def partner_aggregation(
     dataset: Dataset,
     molecule: str,
@@ -36,20 +177,16 @@ def partner_aggregation(
 ) -> pd.Series:
     if isinstance(method, str):
         method = method.lower()
-        if method == 'mean':
-            ag_fn = lambda group: group.mean()
-        if method == 'sum':
-            ag_fn = lambda group: group.sum()
-        elif method == 'median':
-            ag_fn = lambda group: group.median()
-        elif method == 'min':
-            ag_fn = lambda group: group.min()
-        elif method == 'max':
-            ag_fn = lambda group: group.max()
-        else:
+        if method not in {'mean', 'sum', 'median', 'min', 'max'}:
             raise AttributeError(f"Aggregation function {method} not known.")
-    else:
-        ag_fn = method
+        res = _matrix_to_flat(partner_summary_matrix(
+            dataset=dataset, molecule=molecule, mapping=mapping, partner_column=partner_column, method=method,
+            only_unique=only_unique, is_log=is_log,
+        ))
+        if result_column is not None:
+            dataset.values[molecule][result_column] = res
+        return res
+    ag_fn = method
     mapped = _get_mapped(dataset=dataset, molecule=molecule, mapping=mapping, partner_column=partner_column, only_unique=only_unique)
     if is_log:
         mapped['quanti'] = np.exp(mapped['quanti'])
@@ -73,17 +210,10 @@ def partner_top_n_mean(
     skip_if_less_than_n: bool = True,
     is_log: bool = False,
 )->Optional[pd.Series]:
-    mapped = _get_mapped(dataset=dataset, molecule=molecule, mapping=mapping, partner_column=partner_column, only_unique=only_unique)
-    if is_log:
-        mapped['quanti'] = np.exp(mapped['quanti'])
-    group = mapped.quanti.sort_values(ascending=False).groupby(['sample', molecule]).head(top_n).groupby(['sample',molecule])
-    if skip_if_less_than_n:
-        res = group.mean()[group.count() >= top_n]
-    else:
-        res = group.mean()
-    res.index.set_names('id', level=1, inplace=True)
-    if is_log:
-        res = np.log(res)
+    res = _matrix_to_flat(partner_summary_matrix(
+        dataset=dataset, molecule=molecule, mapping=mapping, partner_column=partner_column, method="top_n_mean",
+        top_n=top_n, min_partners=top_n if skip_if_less_than_n else 1, only_unique=only_unique, is_log=is_log,
+    ))
     if result_column is not None:
         dataset.set_column_flat(molecule=molecule, values=res, column=result_column, fill_missing=True)
     return res
\ No newline at end of file
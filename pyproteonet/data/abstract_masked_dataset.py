@@ -1,9 +1,10 @@
-from typing import Dict, Optional, List, Iterable, Union
+from typing import Dict, Optional, List, Iterable, Union, TYPE_CHECKING
 from abc import abstractmethod, ABC
 
 import pandas as pd
 
-from ..dgl.masked_dataset_adapter import MaskedDatasetAdapter
+if TYPE_CHECKING:
+    from ..dgl.masked_dataset_adapter import MaskedDatasetAdapter
 
 
 class AbstractMaskedDataset(ABC):
@@ -21,5 +22,5 @@ class AbstractMaskedDataset(ABC):
         molecule_columns: List[str] = [],
         target_column: str = "abundance",
         missing_column_value: Optional[float] = None
-    )->MaskedDatasetAdapter:
+    )->"MaskedDatasetAdapter":
         raise NotImplementedError()
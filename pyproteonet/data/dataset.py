@@ -1,15 +1,13 @@
-from typing import Any, Dict, Tuple, Callable, List, Iterable, Optional, Union
+from typing import Any, Dict, Tuple, Callable, List, Iterable, Optional, Union, TYPE_CHECKING
 from collections import OrderedDict
 import glob
 import shutil
 import copy
+import functools
 
 import numpy as np
 import pandas as pd
 from pandas import HDFStore
-from matplotlib import pyplot as plt
-import seaborn as sbn
-from scipy.stats import pearsonr  # type: ignore
 from pathlib import Path
 import json
 
@@ -20,6 +18,10 @@ from ..utils.numpy import eq_nan
 from ..utils.pandas import matrix_to_multiindex
 from ..processing.dataset_transforms import rename_values, drop_values, rename_columns
 
+if TYPE_CHECKING:
+    import dgl
+    import pyarrow as pa
+
 
 class DatasetMoleculeValues:
     def __init__(self, dataset: "Dataset", molecule: str):
@@ -37,6 +39,43 @@ class DatasetMoleculeValues:
         return self.dataset.get_values_flat(molecule=self.molecule)
 
 
+def _sample_values_to_matrices(
+    molecule_set: MoleculeSet, sample_values: List[Dict[str, pd.DataFrame]]
+) -> Optional[Dict[str, Dict[str, np.ndarray]]]:
+    """Stacks per sample value frames into (molecule x sample) matrices as expected by Dataset.from_value_matrices.
+
+    The matrices are transposes of sample major arrays, so from_value_matrices can use them without another copy.
+    Returns None if the samples differ in their molecules or columns, contain non float64 columns or ids which are not
+    in the molecule set. Such samples have to be created one by one.
+    """
+    if not sample_values:
+        return None
+    columns = {
+        mol: list(sample_values[0][mol].columns) if mol in sample_values[0] else [] for mol in molecule_set.molecules
+    }
+    matrices = {
+        mol: {c: np.empty((len(sample_values), len(molecule_set.molecules[mol])), dtype=np.float64) for c in mol_columns}
+        for mol, mol_columns in columns.items()
+    }
+    for i, values in enumerate(sample_values):
+        if not set(values.keys()) <= set(molecule_set.molecules.keys()):
+            return None
+        for mol, mol_columns in columns.items():
+            df = values.get(mol, pd.DataFrame())
+            if list(df.columns) != mol_columns or any(dtype != np.float64 for dtype in df.dtypes):
+                return None
+            if not mol_columns:
+                continue
+            index = molecule_set.molecules[mol].index
+            if not df.index.equals(index):
+                if not df.index.isin(index).all():
+                    return None
+                df = df.reindex(index)
+            for c in mol_columns:
+                matrices[mol][c][i] = df[c].to_numpy()
+    return {mol: {c: m.T for c, m in mol_matrices.items()} for mol, mol_matrices in matrices.items()}
+
+
 class Dataset:
     """Representing a dataset consisting of a MoleculeSet specifying molecules and relations
     and several DatasetSamples each holding a set of values for every molecule.
@@ -67,25 +106,57 @@ class Dataset:
             for molecule in self.molecules.keys()
         }
         self._dgl_graph = None
+        # flyability estimates keyed by column, molecules, mapping and remove_one,
+        # stored together with weak references to the value and mapping frames they were computed from
+        self.flyability_cache: Dict[Tuple, Tuple[Tuple, List[Any], pd.Series]] = {}
 
     @classmethod
-    def load(cls, dir_path: Union[str, Path]):
+    def load(cls, dir_path: Union[str, Path], num_workers: int = 8, pbar: bool = False):
+        """Loads a dataset saved with Dataset.save.
+
+        Sample files are read concurrently by a thread pool and parsed from memory,
+        which hides the latency of opening many files on network storage. If all samples have the same float
+        value columns, the dataset is assembled from value matrices (see from_value_matrices) instead of creating
+        and validating the samples one by one.
+
+        Args:
+            dir_path (Union[str, Path]): Directory the dataset was saved to.
+            num_workers (int, optional): Number of threads reading sample files. Defaults to 8.
+            pbar (bool, optional): Whether to show a progress bar reporting the loading throughput in samples/s. Defaults to False.
+
+        Returns:
+            Dataset: The loaded Dataset.
+        """
+        from tqdm.auto import tqdm
+        from ..utils.parallel import read_files_parallel, in_memory_hdf_store
+
         dir_path = Path(dir_path)
         molecule_set = MoleculeSet.load(dir_path / "molecule_set.h5")
         missing_value = np.nan
         with open(dir_path / "dataset_info.json") as f:
             dataset_info = json.load(f)
             missing_value = dataset_info["missing_value"]
-        ds = cls(molecule_set=molecule_set, missing_value=missing_value)
         samples = glob.glob(f'{dir_path / "samples"}/*.h5')
         samples.sort()
-        for sample in samples:
-            sample_path = Path(sample)
-            values = {}
-            with HDFStore(sample_path) as store:
-                for molecule in store.keys():
-                    values[molecule.strip("/")] = store[molecule]
-            ds.create_sample(name=sample_path.stem, values=values)
+        sample_names = [Path(sample).stem for sample in samples]
+        contents = read_files_parallel(samples, num_workers=num_workers)
+        sample_values = []
+        for sample_name, content in tqdm(zip(sample_names, contents), total=len(samples), unit="sample", disable=not pbar):
+            # HDF5 itself is not thread safe, so only the file reading is parallel and parsing happens from the in memory image
+            with in_memory_hdf_store(content, name=f"{sample_name}.h5") as store:
+                sample_values.append({molecule.strip("/"): store[molecule] for molecule in store.keys()})
+        matrices = _sample_values_to_matrices(molecule_set=molecule_set, sample_values=sample_values)
+        if matrices is not None:
+            return cls.from_value_matrices(
+                molecule_set=molecule_set,
+                sample_names=sample_names,
+                values=matrices,
+                missing_value=missing_value,
+                copy=False,
+            )
+        ds = cls(molecule_set=molecule_set, missing_value=missing_value)
+        for sample_name, values in zip(sample_names, sample_values):
+            ds.create_sample(name=sample_name, values=values)
         return ds
 
     @classmethod
@@ -114,6 +185,60 @@ class Dataset:
             mapping_name=mapping_name,
         )
 
+    @classmethod
+    def from_value_matrices(
+        cls,
+        molecule_set: MoleculeSet,
+        sample_names: List[str],
+        values: Dict[str, Dict[str, np.ndarray]],
+        missing_value: float = np.nan,
+        copy: bool = True,
+    ) -> "Dataset":
+        """Creates a dataset from (molecule x sample) value matrices.
+
+        Compared to calling create_sample once per sample, values are not validated and reindexed per sample,
+        which makes this the preferred way to install large simulated or computed value matrices.
+
+        The values are copied once into sample major arrays and every sample's value columns are views of these arrays.
+        With copy=False, matrices that already are the transposes of C contiguous float64 arrays (e.g. arr.T for an
+        array arr of shape (number of samples, number of molecules)) are used without any copy, so the dataset shares
+        memory with them.
+
+        Args:
+            molecule_set (MoleculeSet): The MoleculeSet the dataset is based on.
+            sample_names (List[str]): Names of the samples, one per matrix column.
+            values (Dict[str, Dict[str, np.ndarray]]): For every molecule type a dictionary mapping column names to
+                matrices of shape (number of molecules, number of samples). Rows must be ordered like the molecule set's ids.
+            missing_value (float, optional): Value used to represent missing values. Defaults to np.nan.
+            copy (bool, optional): Whether to always copy the matrices. Defaults to True.
+
+        Returns:
+            Dataset: The created Dataset.
+        """
+        # sample major arrays so that every sample column is a contiguous slice
+        to_sample_major = functools.partial(np.array, order="C") if copy else np.ascontiguousarray
+        sample_major = {
+            mol: {c: to_sample_major(np.asarray(m, dtype=np.float64).T) for c, m in mol_values.items()}
+            for mol, mol_values in values.items()
+        }
+        for mol, mol_values in sample_major.items():
+            for c, m in mol_values.items():
+                if m.shape != (len(sample_names), len(molecule_set.molecules[mol])):
+                    raise ValueError(
+                        f"The value matrix for molecule {mol} and column {c} has shape {m.T.shape},"
+                        f" expected {(len(molecule_set.molecules[mol]), len(sample_names))}."
+                    )
+        indices = {mol: mol_df.index.rename("id") for mol, mol_df in molecule_set.molecules.items()}
+        samples = OrderedDict()
+        for i, name in enumerate(sample_names):
+            sample_values = {}
+            for mol, index in indices.items():
+                sample_values[mol] = pd.DataFrame(
+                    {c: m[i] for c, m in sample_major.get(mol, {}).items()}, index=index.copy(), copy=False
+                )
+            samples[name] = DatasetSample(dataset=None, values=sample_values, name=name)
+        return cls(molecule_set=molecule_set, samples=samples, missing_value=missing_value)
+
     def save(self, dir_path: Union[str, Path], overwrite: bool = False):
         dir_path = Path(dir_path)
         dir_path.mkdir(parents=True, exist_ok=overwrite)
@@ -132,31 +257,137 @@ class Dataset:
                 for molecule, df in sample.values.items():
                     store[f"{molecule}"] = df
 
+    def save_parquet(
+        self,
+        dir_path: Union[str, Path],
+        layout: str = "long",
+        molecules: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        overwrite: bool = False,
+    ):
+        """Saves the dataset as Parquet files, see pyproteonet.io.parquet.write_parquet for details.
+
+        Args:
+            dir_path (Union[str, Path]): Directory to write to.
+            layout (str, optional): Either "long" (sample, id, columns) or "wide" (molecule x sample). Defaults to "long".
+            molecules (Optional[List[str]], optional): Molecule types to write values for. Defaults to all molecule types.
+            columns (Optional[List[str]], optional): Value columns to write. Defaults to all value columns.
+            overwrite (bool, optional): Whether to overwrite existing files. Defaults to False.
+        """
+        from ..io.parquet import write_parquet
+
+        write_parquet(
+            dataset=self, dir_path=dir_path, layout=layout, molecules=molecules, columns=columns, overwrite=overwrite
+        )
+
+    @classmethod
+    def load_parquet(
+        cls,
+        dir_path: Union[str, Path],
+        samples: Optional[List[str]] = None,
+        molecule_ids: Dict[str, Iterable] = {},
+        molecules: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> "Dataset":
+        """Loads a dataset saved with Dataset.save_parquet, see pyproteonet.io.parquet.read_parquet for details.
+
+        Args:
+            dir_path (Union[str, Path]): Directory the dataset was saved to.
+            samples (Optional[List[str]], optional): Samples to load. Defaults to all samples.
+            molecule_ids (Dict[str, Iterable], optional): Only load the given ids for these molecule types. Defaults to {}.
+            molecules (Optional[List[str]], optional): Molecule types to load values for. Defaults to all saved molecule types.
+            columns (Optional[List[str]], optional): Value columns to load. Defaults to all saved value columns.
+
+        Returns:
+            Dataset: The loaded Dataset.
+        """
+        from ..io.parquet import read_parquet
+
+        return read_parquet(
+            dir_path=dir_path, samples=samples, molecule_ids=molecule_ids, molecules=molecules, columns=columns
+        )
+
+    def to_arrow(
+        self,
+        molecule: str,
+        columns: Optional[Union[str, List[str]]] = None,
+        layout: str = "long",
+        samples: Optional[List[str]] = None,
+    ) -> "pa.Table":
+        """Converts the values of one molecule type into an Arrow table, see pyproteonet.io.parquet.dataset_to_arrow.
+
+        Args:
+            molecule (str): The molecule type.
+            columns (Optional[Union[str, List[str]]], optional): Value column(s) to include. Defaults to all value columns.
+            layout (str, optional): Either "long" or "wide" (requires a single column). Defaults to "long".
+            samples (Optional[List[str]], optional): Samples to include. Defaults to all samples.
+
+        Returns:
+            pa.Table: The values as Arrow table.
+        """
+        from ..io.parquet import dataset_to_arrow
+
+        return dataset_to_arrow(dataset=self, molecule=molecule, columns=columns, layout=layout, samples=samples)
+
     def write_tsvs(
         self,
-        output_dir: Path,
+        output_dir: Union[str, Path],
         molecules: List[str] = ["protein", "peptide"],
         columns: List["str"] = ["abundance"],
         molecule_columns: Union[bool, List[str]] = [],
         index_names: Optional[List[str]] = None,
         na_rep="NA",
+        decimals: Optional[int] = None,
+        compression: Optional[str] = None,
+        num_workers: int = 4,
     ):
+        """Writes one wide (molecule x sample) TSV file <molecule>_<column>.tsv per molecule type and value column.
+
+        Floats are formatted in vectorized chunks and files are written concurrently by a thread pool
+        (compression and disk writes release the GIL).
+
+        Args:
+            output_dir (Union[str, Path]): Directory to write to.
+            molecules (List[str], optional): Molecule types to write. Defaults to ["protein", "peptide"].
+            columns (List[str], optional): Value columns to write. Defaults to ["abundance"].
+            molecule_columns (Union[bool, List[str]], optional): Molecule columns appended to every row,
+                True for all molecule columns. Defaults to [].
+            index_names (Optional[List[str]], optional): Header of the id column for every molecule type. Defaults to the molecule names.
+            na_rep (str, optional): Representation of missing values. Defaults to "NA".
+            decimals (Optional[int], optional): Write floats with a fixed number of decimals (faster).
+                Defaults to None (shortest exact representation, like pandas.to_csv).
+            compression (Optional[str], optional): None, "gzip" or "zstd" (needs the zstd extra, pip install pyproteonet[zstd]),
+                the file suffix is extended accordingly. Defaults to None.
+            num_workers (int, optional): Number of files written concurrently. Defaults to 4.
+        """
+        from ..io.tsv import write_value_tsv, COMPRESSION_SUFFIXES
+        from ..utils.parallel import thread_map
+
+        output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         if index_names is None:
             index_names = molecules
-        for molecule, index_name in zip(molecules, index_names):
-            for column in columns:
-                vals = self.get_samples_value_matrix(
-                    molecule=molecule, column=column, molecule_columns=molecule_columns
-                )
-                vals.index.set_names(index_name, inplace=True)
-                vals = vals.reset_index()
-                vals.to_csv(
-                    output_dir / f"{molecule}_{column}.tsv",
-                    sep="\t",
-                    na_rep=na_rep,
-                    index=False,
-                )
+
+        def write(job):
+            molecule, index_name, column = job
+            mol_df = self.molecules[molecule]
+            annotation_columns = list(mol_df.columns) if molecule_columns is True else list(molecule_columns)
+            write_value_tsv(
+                path=output_dir / f"{molecule}_{column}.tsv{COMPRESSION_SUFFIXES[compression]}",
+                values=self.get_samples_value_tensor(molecule=molecule, columns=[column])[0],
+                sample_names=self.sample_names,
+                row_labels=pd.DataFrame({index_name: mol_df.index}),
+                row_annotations=mol_df.loc[:, annotation_columns].reset_index(drop=True),
+                na_rep=na_rep,
+                decimals=decimals,
+                compression=compression,
+            )
+
+        jobs = [
+            (molecule, index_name, column) for molecule, index_name in zip(molecules, index_names) for column in columns
+        ]
+        for _ in thread_map(write, jobs, num_workers=num_workers):
+            pass
 
     def __getitem__(self, sample_name: str) -> DatasetSample:
         return self.samples_dict[sample_name]
@@ -215,6 +446,12 @@ class Dataset:
     def __iter__(self) -> Iterable:
         return self.samples
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # the flyability cache holds weak references (which cannot be pickled) and is only valid for this instance
+        state = self.__dict__.copy()
+        state["flyability_cache"] = {}
+        return state
+
     def sample_apply(self, fn: Callable, *args, **kwargs):
         transformed = {}
         for key, sample in self.samples_dict.items():
@@ -240,7 +477,7 @@ class Dataset:
         molecule_set = self.molecule_set
         if copy_molecule_set:
             molecule_set = molecule_set.copy(molecule_ids=molecule_ids)
-        return Dataset(molecule_set=molecule_set, samples=copied)
+        return Dataset(molecule_set=molecule_set, samples=copied, missing_value=self.missing_value)
 
     def get_molecule_subset(self, molecule: str, ids: pd.Index):
         return self.copy(molecule_ids={molecule: ids}, copy_molecule_set=True)
@@ -485,6 +722,35 @@ class Dataset:
             ]
         return res
 
+    def get_samples_value_tensor(
+        self,
+        molecule: str,
+        columns: List[str],
+        samples: Optional[List[str]] = None,
+    ) -> np.ndarray:
+        """Stacks the (molecule x sample) value matrices of several columns into one array.
+
+        Compared to calling get_samples_value_matrix once per column, every sample's values are only accessed once.
+
+        Args:
+            molecule (str): The molecule type to get the values for.
+            columns (List[str]): The value columns to stack. Columns not present for a sample are filled with the missing value.
+            samples (Optional[List[str]], optional): Samples to include. Defaults to all samples.
+
+        Returns:
+            np.ndarray: Array of shape (len(columns), number of molecules, len(samples)).
+                Molecules are ordered like the molecule set's index for this molecule type.
+        """
+        if samples is None:
+            samples = self.sample_names
+        mol_ids = self.molecules[molecule].index
+        res = np.full((len(columns), len(mol_ids), len(samples)), self.missing_value, dtype=np.float64)
+        for i, name in enumerate(samples):
+            sample_df = self.samples_dict[name].values[molecule]
+            sample_df = sample_df.reindex(index=mol_ids, columns=columns, fill_value=self.missing_value)
+            res[:, :, i] = sample_df.to_numpy(dtype=np.float64).T
+        return res
+
     def set_samples_value_matrix(
         self, matrix: pd.DataFrame, molecule: str, column: str = "abundance"
     ):
@@ -624,6 +890,10 @@ class Dataset:
         samples: Optional[List[str]] = None,
         ax=None,
     ):
+        from matplotlib import pyplot as plt
+        import seaborn as sbn
+        from scipy.stats import pearsonr  # type: ignore
+
         if ax is None:
             fig, ax = plt.subplots()
         if samples is None:
@@ -2,12 +2,9 @@ from typing import Dict, Literal, TYPE_CHECKING, Callable, Optional, Iterable, L
 
 import pandas as pd
 import numpy as np
-import seaborn as sbn
-from matplotlib import pyplot as plt
 from pathlib import Path
 from pandas import HDFStore
 
-from ..dgl.graph_creation import populate_graph_dgl
 from .molecule_set import MoleculeSet
 from .molecule_graph import MoleculeGraph
 from ..utils.numpy import eq_nan
@@ -129,6 +126,8 @@ class DatasetSample:
         target_column: str = 'abundance',
         missing_column_value: Optional[float] = None,
     ):
+        from ..dgl.graph_creation import populate_graph_dgl
+
         populate_graph_dgl(
             graph=self.molecule_set.create_graph(mapping=mapping, bidirectional=True),
             dgl_graph=dgl_graph,
@@ -147,6 +146,9 @@ class DatasetSample:
             return values
 
     def plot_hist(self, bins="auto"):
+        from matplotlib import pyplot as plt
+        import seaborn as sbn
+
         keys = list(self.values.keys())
         fig, ax = plt.subplots(1, len(keys))
         for i, key in enumerate(keys):
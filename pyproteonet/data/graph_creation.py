@@ -4,8 +4,6 @@ import logging
 
 import pandas as pd
 import numpy as np
-import dgl
-import torch
 
 if TYPE_CHECKING:
     from .molecule_set import MoleculeSet
@@ -1,15 +1,16 @@
-from typing import Dict, Optional, List, Iterable, Union, Tuple
+from typing import Dict, Optional, List, Iterable, Union, Tuple, TYPE_CHECKING
 
 import pandas as pd
 import numpy as np
-import torch
-import dgl
 
 from .dataset import Dataset
 from .dataset_sample import DatasetSample
 from .molecule_graph import MoleculeGraph
 from .abstract_masked_dataset import AbstractMaskedDataset
-from ..dgl.graph_key_dataset import GraphKeyDataset
+
+if TYPE_CHECKING:
+    import dgl
+    from ..dgl.graph_key_dataset import GraphKeyDataset
 
 
 class MaskedDataset(AbstractMaskedDataset):
@@ -116,11 +117,14 @@ class MaskedDataset(AbstractMaskedDataset):
         mol_ids = self.dataset.molecules[molecule].index
         mat_df = self.dataset.get_samples_value_matrix(molecule=molecule, column=column, samples=samples)
         mat_df = mat_df.loc[mol_ids]
+        # mat_df.values is only a view for single block frames, so values are set on a copy
+        values = mat_df.to_numpy(copy=True)
         if only_set_masked:
             mask = self.masks[molecule].loc[mol_ids, samples].values
-            mat_df.values[mask] = matrix[mask]
+            values[mask] = matrix[mask]
         else:
-            mat_df.values[:, :] = matrix
+            values[:, :] = matrix
+        mat_df = pd.DataFrame(values, index=mat_df.index, columns=mat_df.columns)
         self.dataset.set_samples_value_matrix(
             matrix=mat_df, molecule=molecule, column=column
         )
@@ -143,7 +147,9 @@ class MaskedDataset(AbstractMaskedDataset):
         molecule_columns: List[str] = [],
         target_column: str = "abundance",
         missing_column_value: Optional[float] = None,
-    ) -> GraphKeyDataset:
+    ) -> "GraphKeyDataset":
+        from ..dgl.graph_key_dataset import GraphKeyDataset
+
         return GraphKeyDataset(
             masked_dataset=self,
             mapping=mapping,
@@ -161,7 +167,9 @@ class MaskedDataset(AbstractMaskedDataset):
         make_bidirectional: bool = False,
         features_to_float32: bool = True,
         samples: Optional[List[str]] = None
-    ) -> dgl.DGLHeteroGraph:
+    ) -> "dgl.DGLHeteroGraph":
+        import torch
+
         g = self.dataset.to_dgl_graph(
             feature_columns=feature_columns,
             mappings=mappings,
@@ -1,13 +1,15 @@
-from typing import Dict, Optional, List, Iterable, Union, Callable
+from typing import Dict, Optional, List, Iterable, Union, Callable, TYPE_CHECKING
 
 import pandas as pd
 
 from .dataset import Dataset
 from .dataset_sample import DatasetSample
 from .masks import MoleculeGraphMask
-from ..dgl.graph_iterable_dataset import GraphIterableDataset
 from ..data.masks import DatasetSampleMask
 
+if TYPE_CHECKING:
+    from ..dgl.graph_iterable_dataset import GraphIterableDataset
+
 
 class MaskedDatasetIterable:
     def __init__(
@@ -42,7 +44,9 @@ class MaskedDatasetIterable:
         molecule_columns: List[str] = [],
         target_column: str = "abundance",
         missing_column_value: Optional[float] = None
-    )->GraphIterableDataset:
+    )->"GraphIterableDataset":
+        from ..dgl.graph_iterable_dataset import GraphIterableDataset
+
         return GraphIterableDataset(
             masked_dataset=self,
             mapping=mapping,
@@ -4,8 +4,6 @@ from typing import Optional, TYPE_CHECKING, List, Dict, Hashable
 
 import pandas as pd
 import numpy as np
-from matplotlib import pyplot as plt
-import seaborn as snb
 
 if TYPE_CHECKING:
     from .molecule_set import MoleculeSet
@@ -43,6 +41,9 @@ class MoleculeGraph:
         return res
 
     def plot_node_degrees(self, molecule_type:str, outgoing:bool=True, incoming:bool=False, bins='auto', ax=None):
+        from matplotlib import pyplot as plt
+        import seaborn as snb
+
         deg = self.get_node_degrees(molecule_type=molecule_type, outgoing=outgoing, incoming=incoming)
         if ax is None:
             fig, ax = plt.subplots()
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, List, Iterable, Union, Tuple
+from typing import Dict, Optional, List, Iterable, Union, Tuple, TYPE_CHECKING
 import uuid
 from pathlib import Path
 import warnings
@@ -6,12 +6,16 @@ from itertools import chain
 from dataclasses import dataclass
 import shutil
 
+import numpy as np
 import pandas as pd
 from pandas import HDFStore
 
 from .graph_creation import create_graph_nodes_edges
 from .molecule_graph import MoleculeGraph
 
+if TYPE_CHECKING:
+    import scipy.sparse
+
 
 class MoleculeMapping:
     def __init__(self, name: str, df: pd.DataFrame, mapping_molecules: Optional[Tuple[str, str]] = None):
@@ -93,6 +97,9 @@ class MoleculeSet:
             self.mappings[mapping_name] = mapping
         self._update_mapping_lookup()
         self.clear_cache()
+        # digestion results (e.g. number of theoretical peptides) keyed by sequence column, enzyme and length bounds,
+        # stored together with the sequences they were computed from
+        self.digestion_cache: Dict[Tuple, Tuple[pd.Series, pd.Series]] = {}
         # self._node_mapping: Optional[Dict[str, pd.DataFrame]] = None
         # self._nodes = None
         # self._edges = None
@@ -156,6 +163,33 @@ class MoleculeSet:
                 identifier = f"mapping/{mapping_name}/{m1}/{m2}"
                 store[identifier] = mapping.df
 
+    @classmethod
+    def load_parquet(cls, dir_path: Union[str, Path], molecule_ids: Dict[str, Iterable] = {}) -> "MoleculeSet":
+        """Loads a MoleculeSet saved with MoleculeSet.save_parquet.
+
+        Args:
+            dir_path (Union[str, Path]): Directory the MoleculeSet was saved to.
+            molecule_ids (Dict[str, Iterable], optional): Only load the given ids for these molecule types
+                (filters are pushed down into the Parquet reader and applied to mappings as well). Defaults to {}.
+
+        Returns:
+            MoleculeSet: The loaded MoleculeSet.
+        """
+        from ..io.parquet import read_molecule_set_parquet
+
+        return read_molecule_set_parquet(dir_path=dir_path, molecule_ids=molecule_ids)
+
+    def save_parquet(self, dir_path: Union[str, Path], overwrite: bool = False):
+        """Saves the MoleculeSet as one Parquet file per molecule type and mapping.
+
+        Args:
+            dir_path (Union[str, Path]): Directory to write to.
+            overwrite (bool, optional): Whether to overwrite an existing directory. Defaults to False.
+        """
+        from ..io.parquet import write_molecule_set_parquet
+
+        write_molecule_set_parquet(molecule_set=self, dir_path=dir_path, overwrite=overwrite)
+
     def copy(self, molecule_ids: Dict[str, pd.Index] = {}) -> "MoleculeSet":
         molecules = {}
         for n, v in self.molecules.items():
@@ -264,6 +298,34 @@ class MoleculeSet:
         )
         return mapping.df
 
+    def get_mapping_matrix(
+        self,
+        mapping: str,
+        molecule: str,
+        partner_molecule: str = None,
+    ) -> "scipy.sparse.csr_matrix":
+        """Returns a mapping as sparse adjacency matrix.
+
+        Args:
+            mapping (str): Name of the mapping.
+            molecule (str): Molecule type of the matrix rows.
+            partner_molecule (str, optional): Molecule type of the matrix columns. Inferred from the mapping if not given.
+
+        Returns:
+            scipy.sparse.csr_matrix: Matrix of shape (number of molecules, number of partner molecules) with a one for every mapped pair.
+                Rows and columns are ordered like the molecule ids of the molecule set.
+        """
+        import scipy.sparse
+
+        mapping = self.get_mapping(mapping_name=mapping, molecule=molecule, partner_molecule=partner_molecule)
+        molecule, partner_molecule = mapping.mapping_molecules
+        rows = self.molecules[molecule].index.get_indexer(mapping.df.index.get_level_values(0))
+        cols = self.molecules[partner_molecule].index.get_indexer(mapping.df.index.get_level_values(1))
+        return scipy.sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)),
+            shape=(len(self.molecules[molecule]), len(self.molecules[partner_molecule])),
+        )
+
     def get_mapping_degrees(
         self,
         molecule: str,
@@ -1,9 +1,113 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import dgl
 import torch
 
 from ..data.masked_dataset import MaskedDataset
+from ..data.molecule_set import MoleculeSet
+
+
+class HomogeneousGraphTemplate:
+    """Homogeneous, bidirected and self looped graph topology of a molecule set.
+
+    Building the topology (dgl.to_homogeneous, dgl.to_bidirected, dgl.add_self_loop) only depends on the molecule set and
+    the mappings, so it is done once and every graph created from the template just scatters the node values of a masked
+    dataset into a lightweight copy sharing the graph structure.
+    """
+
+    def __init__(self, molecule_set: MoleculeSet, mappings: List[str]):
+        """Creates the template for the given molecule set and mappings.
+
+        Args:
+            molecule_set (MoleculeSet): The molecule set defining the nodes.
+            mappings (List[str]): The mappings defining the edges.
+        """
+        graph_data = dict()
+        for mapping_name in mappings:
+            mapping = molecule_set.mappings[mapping_name]
+            identifier = (mapping.mapping_molecules[0], mapping_name, mapping.mapping_molecules[1])
+            graph_data[identifier] = tuple(
+                torch.from_numpy(molecule_set.molecules[mol].index.get_indexer(mapping.df.index.get_level_values(i)))
+                for i, mol in enumerate(mapping.mapping_molecules)
+            )
+        num_nodes = {mol: len(molecule_set.molecules[mol]) for identifier in graph_data for mol in identifier[::2]}
+        heterograph = dgl.heterograph(graph_data, num_nodes_dict=num_nodes)
+        self.ntypes: List[str] = list(heterograph.ntypes)
+        graph = dgl.to_homogeneous(heterograph)
+        node_types = graph.ndata[dgl.NTYPE]
+        node_ids = graph.ndata[dgl.NID]
+        graph = dgl.to_bidirected(graph)
+        self.graph = dgl.add_self_loop(graph)
+        self.graph.create_formats_()
+        self.num_nodes = self.graph.num_nodes()
+        self.node_types = node_types.type(torch.float32)
+        self.node_ids = node_ids.type(torch.float32)
+        self.molecule_type = torch.nn.functional.one_hot(node_types, num_classes=len(self.ntypes)).type(torch.float32)
+        # homogeneous node positions of every molecule ordered like the molecule set's index
+        self.positions: Dict[str, np.ndarray] = {}
+        node_types, node_ids = node_types.numpy(), node_ids.numpy()
+        for i, mol in enumerate(self.ntypes):
+            positions = np.nonzero(node_types == i)[0]
+            self.positions[mol] = positions[np.argsort(node_ids[positions])]
+
+    @classmethod
+    def from_molecule_set(cls, molecule_set: MoleculeSet, mappings: List[str]) -> "HomogeneousGraphTemplate":
+        """Returns the template for a molecule set, creating it only once and caching it in the molecule set.
+
+        Args:
+            molecule_set (MoleculeSet): The molecule set defining the nodes.
+            mappings (List[str]): The mappings defining the edges.
+
+        Returns:
+            HomogeneousGraphTemplate: The (cached) template.
+        """
+        key = ("homogeneous_dgl_template", tuple(mappings))
+        if key not in molecule_set.graphs:
+            molecule_set.graphs[key] = cls(molecule_set=molecule_set, mappings=mappings)
+        return molecule_set.graphs[key]
+
+    def create_graph(
+        self, masked_dataset: MaskedDataset, target: str, features: List[str] = [], samples: Optional[List[str]] = None
+    ) -> dgl.DGLGraph:
+        """Creates the homogeneous graph of a masked dataset.
+
+        The resulting node data is the same as with masked_heterograph_to_homogeneous: "features" (all feature
+        columns followed by a one hot encoding of the molecule type), "target", "mask", "hidden" and dgl.NID/dgl.NTYPE.
+
+        Args:
+            masked_dataset (MaskedDataset): The masked dataset to take node values and masks from.
+            target (str): The target column.
+            features (List[str], optional): Feature columns. Defaults to [].
+            samples (Optional[List[str]], optional): Samples to include. Defaults to all samples.
+
+        Returns:
+            dgl.DGLGraph: The homogeneous graph.
+        """
+        dataset = masked_dataset.dataset
+        if samples is None:
+            samples = dataset.sample_names
+        columns = [target] + features
+        values = np.empty((len(columns), self.num_nodes, len(samples)), dtype=np.float32)
+        mask = np.zeros((self.num_nodes, len(samples)), dtype=bool)
+        hidden = np.zeros((self.num_nodes, len(samples)), dtype=bool)
+        for mol, positions in self.positions.items():
+            values[:, positions] = dataset.get_samples_value_tensor(molecule=mol, columns=columns, samples=samples)
+            mol_ids = dataset.molecules[mol].index
+            if mol in masked_dataset.masks:
+                mask[positions] = masked_dataset.masks[mol].loc[mol_ids, samples].to_numpy()
+            if mol in masked_dataset.hidden:
+                hidden[positions] = masked_dataset.hidden[mol].loc[mol_ids, samples].to_numpy()
+        # shares the graph structure (and its sparse formats) with the template, node data is set out of place
+        graph = self.graph.local_var()
+        feature_values = torch.from_numpy(values[1:].transpose(1, 0, 2).reshape(self.num_nodes, -1))
+        graph.ndata["features"] = torch.concat([feature_values, self.molecule_type], axis=-1)
+        graph.ndata["target"] = torch.from_numpy(values[0])
+        graph.ndata["mask"] = torch.from_numpy(mask)
+        graph.ndata["hidden"] = torch.from_numpy(hidden)
+        graph.ndata[dgl.NID] = self.node_ids
+        graph.ndata[dgl.NTYPE] = self.node_types
+        return graph
 
 
 def masked_dataset_to_homogeneous_graph(masked_datasets: List[MaskedDataset], mappings: List[str], target:str, features:List[str]=[],
@@ -15,10 +119,11 @@ def masked_dataset_to_homogeneous_graph(masked_datasets: List[MaskedDataset], ma
         if len(sample_lists) != len(masked_datasets):
             raise ValueError('sample_lists must have the same length as masked_datasets')
     for masked_dataset, samples in zip(masked_datasets, sample_lists):
-        graph = masked_dataset.to_dgl_graph(feature_columns={mol:[target] + features for mol in masked_dataset.dataset.molecules.keys()},
-                                            mappings=mappings, samples=samples)
-        graphs.append(graph)
-    graphs = masked_heterograph_to_homogeneous(masked_heterographs=graphs, target=target, features=features)
+        # the graph topology is only computed once per molecule set, afterwards only node values are filled in
+        template = HomogeneousGraphTemplate.from_molecule_set(
+            molecule_set=masked_dataset.dataset.molecule_set, mappings=mappings
+        )
+        graphs.append(template.create_graph(masked_dataset=masked_dataset, target=target, features=features, samples=samples))
     return graphs
 
 def masked_heterograph_to_homogeneous(masked_heterographs: List[dgl.DGLGraph], target:str, features:List[str]=[])->List[dgl.DGLGraph]:
@@ -41,4 +146,4 @@ def masked_heterograph_to_homogeneous(masked_heterographs: List[dgl.DGLGraph], t
         graph = dgl.to_bidirected(graph, copy_ndata=True)
         graph = dgl.add_self_loop(graph)
         res.append(graph)
-    return res
\ No newline at end of file
+    return res
@@ -1,29 +1,192 @@
-from typing import Optional
+from typing import Iterator, Optional, Tuple, Union
+from pathlib import Path
 from tempfile import TemporaryDirectory
 
+import numpy as np
 import pandas as pd
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
 
-from ..vaep.sklearn.cf_transformer import CollaborativeFilteringTransformer
-
-def impute_collaborative_filtering(dataset, molecule: str, column: str, result_column: Optional[str] = None)->pd.DataFrame:
-    in_df = dataset.values[molecule][column]
-    in_df = pd.DataFrame({'abundance':in_df})
-    in_df_non_na = in_df[~in_df.abundance.isna()]
-    with TemporaryDirectory() as out_dir:
-        cf_model = CollaborativeFilteringTransformer(
-            target_column='abundance',
-            sample_column='sample',
-            item_column='id',
-            out_folder=out_dir,
-            batch_size=min(4096, len(in_df_non_na)))
-        cf_model.fit(in_df_non_na,
-                     cuda=False,
-                     epochs_max=20,
-                     )
-        print(in_df_non_na.shape)
-        df_imputed = cf_model.transform(in_df_non_na)
-        print(df_imputed.shape)
-        if result_column is not None:
-            dataset.values[molecule][result_column] = df_imputed
-        assert df_imputed.isna().sum() == 0
-        return df_imputed
\ No newline at end of file
+from ...data.dataset import Dataset
+
+
+class CollaborativeFilteringModel(nn.Module):
+    """Dot product of molecule (item) and sample (user) embeddings plus biases, scaled into a value range.
+
+    Equivalent to fastai's EmbeddingDotBias but indexed with plain integer codes.
+    """
+
+    def __init__(self, num_items: int, num_samples: int, n_factors: int, y_range: Tuple[float, float]):
+        super().__init__()
+        self.y_range = y_range
+        self.i_weight = nn.Embedding(num_items, n_factors)
+        self.u_weight = nn.Embedding(num_samples, n_factors)
+        self.i_bias = nn.Embedding(num_items, 1)
+        self.u_bias = nn.Embedding(num_samples, 1)
+        for embedding in [self.i_weight, self.u_weight, self.i_bias, self.u_bias]:
+            nn.init.trunc_normal_(embedding.weight, std=0.01)
+
+    def _scale(self, x: torch.Tensor) -> torch.Tensor:
+        low, high = self.y_range
+        return torch.sigmoid(x) * (high - low) + low
+
+    def forward(self, items: torch.Tensor, samples: torch.Tensor) -> torch.Tensor:
+        dot = (self.i_weight(items) * self.u_weight(samples)).sum(dim=1)
+        return self._scale(dot + self.i_bias(items)[:, 0] + self.u_bias(samples)[:, 0])
+
+    @torch.no_grad()
+    def predict_matrix(self, rows_per_block: int = 4096) -> np.ndarray:
+        """Predicts all (item x sample) values, one block of items at a time with a single matrix product.
+
+        Args:
+            rows_per_block (int, optional): Number of items predicted at once. Defaults to 4096.
+
+        Returns:
+            np.ndarray: Predictions of shape (number of items, number of samples).
+        """
+        i_weight, i_bias = self.i_weight.weight, self.i_bias.weight
+        u_weight, u_bias = self.u_weight.weight, self.u_bias.weight
+        res = np.empty((i_weight.shape[0], u_weight.shape[0]), dtype=np.float32)
+        for start in range(0, i_weight.shape[0], rows_per_block):
+            end = start + rows_per_block
+            block = i_weight[start:end] @ u_weight.T + i_bias[start:end] + u_bias.T
+            res[start:end] = self._scale(block).cpu().numpy()
+        return res
+
+
+def _write_ratings(
+    matrix: np.ndarray, out_dir: Path, rng: np.random.Generator, chunksize: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Writes the observed values of a (molecule x sample) matrix as integer coded ratings to memory mapped arrays.
+
+    Molecules are written in random order, so every chunk of ratings covers a random subset of molecules.
+    """
+    rows_per_chunk = max(1, chunksize // max(1, matrix.shape[1]))
+    row_order = rng.permutation(matrix.shape[0])
+    row_chunks = [row_order[start : start + rows_per_chunk] for start in range(0, len(row_order), rows_per_chunk)]
+    num_ratings = int(sum((~np.isnan(matrix[rows])).sum() for rows in row_chunks))
+    items = np.lib.format.open_memmap(out_dir / "items.npy", mode="w+", dtype=np.int32, shape=(num_ratings,))
+    samples = np.lib.format.open_memmap(out_dir / "samples.npy", mode="w+", dtype=np.int32, shape=(num_ratings,))
+    values = np.lib.format.open_memmap(out_dir / "values.npy", mode="w+", dtype=np.float32, shape=(num_ratings,))
+    pos = 0
+    for rows in row_chunks:
+        chunk = matrix[rows]
+        chunk_rows, chunk_cols = np.nonzero(~np.isnan(chunk))
+        end = pos + len(chunk_rows)
+        items[pos:end] = rows[chunk_rows]
+        samples[pos:end] = chunk_cols
+        values[pos:end] = chunk[chunk_rows, chunk_cols]
+        pos = end
+    for array in [items, samples, values]:
+        array.flush()
+    return items, samples, values
+
+
+def _iter_batches(
+    ratings: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    batch_size: int,
+    chunksize: int,
+    rng: np.random.Generator,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    # chunks are visited in random order and shuffled in memory, only one chunk is loaded at a time
+    num_ratings = len(ratings[0])
+    starts = np.arange(0, num_ratings, chunksize)
+    for start in rng.permutation(starts):
+        perm = rng.permutation(min(chunksize, num_ratings - start))
+        items, samples, values = [np.asarray(r[start : start + chunksize])[perm] for r in ratings]
+        for batch_start in range(0, len(perm), batch_size):
+            batch = slice(batch_start, batch_start + batch_size)
+            yield items[batch], samples[batch], values[batch]
+
+
+def impute_collaborative_filtering(
+    dataset: Dataset,
+    molecule: str,
+    column: str,
+    result_column: Optional[str] = None,
+    n_factors: int = 15,
+    batch_size: int = 4096,
+    epochs: int = 20,
+    lr: float = 0.005,
+    weight_decay: float = 0.01,
+    chunksize: int = 2**22,
+    cache_dir: Optional[Union[str, Path]] = None,
+    cuda: Optional[bool] = None,
+    random_seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """Imputes missing values with a collaborative filtering model (samples as users, molecules as items).
+
+    Samples and molecules are encoded as integer codes straight from the (molecule x sample) value matrix. The observed
+    values are written to memory mapped arrays and streamed in shuffled mini-batches, so only the value matrix
+    and one chunk of ratings need to be held in memory. Missing values are predicted with one matrix product of
+    molecule and sample embeddings per block of molecules.
+
+    Args:
+        dataset (Dataset): Dataset to impute.
+        molecule (str): Molecule type to impute.
+        column (str): Value column to impute.
+        result_column (Optional[str], optional): If given, the imputed values are stored under this column.
+            Defaults to None.
+        n_factors (int, optional): Embedding dimension. Defaults to 15.
+        batch_size (int, optional): Number of ratings per mini-batch. Defaults to 4096.
+        epochs (int, optional): Number of training epochs (one cycle learning rate schedule). Defaults to 20.
+        lr (float, optional): Maximum learning rate. Defaults to 0.005.
+        weight_decay (float, optional): Weight decay of the AdamW optimizer. Defaults to 0.01.
+        chunksize (int, optional): Number of ratings loaded into memory and shuffled at once. Defaults to 2**22.
+        cache_dir (Optional[Union[str, Path]], optional): Directory for the memory mapped ratings.
+            Defaults to a temporary directory.
+        cuda (Optional[bool], optional): Whether to train on the GPU. Defaults to using it if available.
+        random_seed (Optional[int], optional): Seed for shuffling and initialization. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The imputed (molecule x sample) value matrix. Unlike most other imputation functions, which
+            return the flat (sample, id) indexed values, the matrix is returned as it is the natural result of the
+            model and avoids another long format copy. The result column is still written like any other value column.
+    """
+    if cuda is None:
+        cuda = torch.cuda.is_available()
+    device = torch.device("cuda" if cuda else "cpu")
+    rng = np.random.default_rng(random_seed)
+    if random_seed is not None:
+        torch.manual_seed(random_seed)
+    matrix = dataset.get_samples_value_tensor(molecule=molecule, columns=[column])[0]
+    if not np.isnan(dataset.missing_value):
+        matrix[matrix == dataset.missing_value] = np.nan
+    if np.isnan(matrix).all():
+        raise ValueError(f"Column {column} of molecule {molecule} has no observed values to learn from.")
+    y_range = (int(np.nanmin(matrix)), int(np.nanmax(matrix)) + 1)
+    with TemporaryDirectory(dir=cache_dir) as out_dir:
+        ratings = _write_ratings(matrix, out_dir=Path(out_dir), rng=rng, chunksize=chunksize)
+        num_ratings = len(ratings[0])
+        batches_per_epoch = sum(
+            -(-min(chunksize, num_ratings - start) // batch_size) for start in range(0, num_ratings, chunksize)
+        )
+        model = CollaborativeFilteringModel(
+            num_items=matrix.shape[0], num_samples=matrix.shape[1], n_factors=n_factors, y_range=y_range
+        ).to(device)
+        optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=weight_decay)
+        scheduler = torch.optim.lr_scheduler.OneCycleLR(
+            optimizer, max_lr=lr, total_steps=max(1, epochs * batches_per_epoch)
+        )
+        model.train()
+        for _ in range(epochs):
+            for items, samples, values in _iter_batches(ratings, batch_size=batch_size, chunksize=chunksize, rng=rng):
+                pred = model(
+                    torch.from_numpy(items).to(device, dtype=torch.long),
+                    torch.from_numpy(samples).to(device, dtype=torch.long),
+                )
+                loss = F.mse_loss(pred, torch.from_numpy(values).to(device))
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                scheduler.step()
+        del ratings
+    model.eval()
+    pred = model.predict_matrix()
+    missing = np.isnan(matrix)
+    matrix[missing] = pred[missing]
+    df_imputed = pd.DataFrame(matrix, index=dataset.molecules[molecule].index, columns=dataset.sample_names)
+    if result_column is not None:
+        dataset.set_samples_value_matrix(matrix=df_imputed, molecule=molecule, column=result_column)
+    return df_imputed
@@ -124,7 +124,7 @@ class ImputationModule(L.LightningModule):
         # if self.embedding is not None:
         #     molecule_inputs = torch.cat((self.embedding(graph.nodes(self.molecule).int()), molecule_inputs), dim=-1)
         partner_fc_vec = self.partner_fc_model(partner_inputs)
-        molecule_fc_vec = self.molecule_fc_model(self.embedding(graph.nodes(self.molecule).int()))
+        molecule_fc_vec = self.molecule_fc_model(self.embedding(self._molecule_ids(graph).int()))
         mol_vec = nn.functional.leaky_relu(
             self.molecule_gat(graph, ({self.partner_molecule:partner_fc_vec}, {self.molecule:molecule_fc_vec}))[self.molecule].mean(dim=-2)
         )
@@ -149,6 +149,12 @@ class ImputationModule(L.LightningModule):
         partner_vec = partner_vec.reshape(*partner_shape, 2)
         return mol_vec, partner_vec
 
+    def _molecule_ids(self, graph) -> torch.tensor:
+        # node ids relative to every graph of a batch, so batched graphs of several samples share the embedding
+        num_nodes = graph.batch_num_nodes(self.molecule)
+        offsets = torch.repeat_interleave(torch.cumsum(num_nodes, dim=0) - num_nodes, num_nodes)
+        return graph.nodes(self.molecule) - offsets
+
     def compute_loss(self, graph, partner_loss: bool = True) -> torch.tensor:
         abundance = graph.ndata["abundance"]
         masks = graph.ndata["mask"]
@@ -226,6 +232,10 @@ class ImputationModule(L.LightningModule):
         return torch.optim.Adam(self.parameters(), lr=self.lr)
 
 
+def _unbatch_samples(values: torch.tensor, num_nodes: int) -> torch.tensor:
+    return values.reshape(-1, num_nodes).T
+
+
 def impute_heterogeneous_gnn(
     dataset: Dataset,
     molecule: str,
@@ -248,6 +258,7 @@ def impute_heterogeneous_gnn(
     logger: Optional[Logger] = None,
     epoch_size: int = 10,
     masking_seed: Optional[int] = None,
+    prediction_batch_size: int = 64,
 ) -> pd.Series:
     molecule, mapping, partner_molecule = dataset.infer_mapping(
         molecule=molecule, mapping=mapping
@@ -417,14 +428,27 @@ def impute_heterogeneous_gnn(
         mask_ids={molecule: missing_molecule, partner_molecule: missing_partner},
     )
     if train_sample_wise:
-        sample_names = [[s] for s in ds.sample_names]
-        pred_dl = DataLoader([(missing_mds, s) for s in sample_names], batch_size=1, collate_fn=collate)
+        # samples are independent at inference, so prediction_batch_size single sample graphs are batched into one
+        # graph and predicted with a single forward pass
+        pred_dl = DataLoader([(missing_mds, [s]) for s in ds.sample_names], batch_size=prediction_batch_size,
+                             collate_fn=collate)
+        sample_names = [
+            ds.sample_names[i : i + prediction_batch_size] for i in range(0, ds.num_samples, prediction_batch_size)
+        ]
     else:
         sample_names = [None]
         pred_dl = DataLoader([(missing_mds, None)], batch_size=1, collate_fn=collate)
+    num_molecules = ds.molecules[molecule].shape[0]
+    num_partners = ds.molecules[partner_molecule].shape[0]
     for (pred_mol, uncertainty_mol, pred_partner, uncertainty_partner), s in zip(trainer.predict(
         model=model, dataloaders=pred_dl, ckpt_path=None
     ), sample_names):
+        # (num graphs * num molecules) x 1 predictions of a batch to a (num molecules x num graphs) matrix
+        if s is not None:
+            pred_mol, uncertainty_mol = [_unbatch_samples(v, num_molecules) for v in (pred_mol, uncertainty_mol)]
+            pred_partner, uncertainty_partner = [
+                _unbatch_samples(v, num_partners) for v in (pred_partner, uncertainty_partner)
+            ]
         pred_mol, uncertainty_mol = pred_mol.numpy(), uncertainty_mol.numpy()
         pred_partner, uncertainty_partner = (
             pred_partner.numpy(),
@@ -32,6 +32,7 @@ from ....masking.train_eval import (
     train_eval_full_molecule_some_mapped,
 )
 from ....dgl.collate import (
+    HomogeneousGraphTemplate,
     masked_dataset_to_homogeneous_graph,
     masked_heterograph_to_homogeneous,
 )
@@ -244,7 +245,8 @@ def impute_homogeneous_gnn(
     embedding_dim: Optional[int] = None,
     train_sample_wise: bool = False,
     molecule_gt_column: Optional[str] = None,
-    epoch_size: int = 1
+    epoch_size: int = 1,
+    prediction_batch_size: int = 64,
 ):
     molecule, mapping, partner_molecule = dataset.infer_mapping(
         molecule=molecule, mapping=mapping
@@ -526,64 +528,43 @@ def impute_homogeneous_gnn(
     else:
         predict_ds = mask_missing(dataset=in_dataset, molecule_columns={molecule:'abundance'})
 
-    # pred_dl = DataLoader([(predict_ds, s) for s in in_dataset.sample_names], batch_size=1, collate_fn=collate_fn)
-    # predictions = trainer.predict(
-    #     module, dataloaders=pred_dl, ckpt_path=None
-    # )
-    pred_graphs = []
+    # all prediction graphs share the cached topology, in sample wise mode prediction_batch_size samples are packed
+    # into one batched graph and predicted in a single forward pass
     if train_sample_wise:
         sample_lists = [[s] for s in in_dataset.sample_names]
     else:
         sample_lists = [in_dataset.sample_names]
-    for s in sample_lists:
-        pred_graphs.append(
-            predict_ds.to_dgl_graph(
-                feature_columns={
-                    mol: ["abundance"] + feature_names for mol in predict_ds.dataset.molecules.keys()
-                },
-                mappings=[mapping],
-                samples=s,
-            )
-        )
-    ntypes = [pred_graph.ntypes for pred_graph in pred_graphs]
-    pred_graphs = masked_heterograph_to_homogeneous(
-        masked_heterographs=pred_graphs, target="abundance", features=feature_names,
+    pred_graphs = masked_dataset_to_homogeneous_graph(
+        masked_datasets=[predict_ds] * len(sample_lists),
+        mappings=[mapping],
+        target="abundance",
+        features=feature_names,
+        sample_lists=sample_lists,
     )
     results = trainer.predict(
-        module, DataLoader(pred_graphs, batch_size=1, collate_fn=collator.collate, shuffle=False)
+        module,
+        DataLoader(pred_graphs, batch_size=prediction_batch_size if train_sample_wise else 1,
+                   collate_fn=collator.collate, shuffle=False),
     )
-    for predict_graph, res, s, nt in zip(pred_graphs, results, sample_lists, ntypes):
-        molecule_index = nt.index(molecule)
-        molecule_mask = (predict_graph.ndata[dgl.NTYPE] == molecule_index).type(torch.bool)
-        molecule_res = res[molecule_mask]
-        masked_molecules = predict_graph.ndata["mask"][molecule_mask].type(torch.bool)
-        molecule_ids = predict_graph.ndata[dgl.NID][molecule_mask].type(torch.int64)
-        molecule_res = molecule_res[molecule_ids, :]
-        masked_molecules = masked_molecules[molecule_ids, :]
-        mat_pd = in_dataset.get_samples_value_matrix(molecule=molecule, column="abundance", samples=s)
+    # (num nodes x num samples x (prediction, uncertainty)) predictions and (num nodes x num samples) mask
+    num_nodes = pred_graphs[0].num_nodes()
+    res = torch.cat(
+        [r.reshape(-1, num_nodes, module.out_dim, 2).permute(1, 0, 2, 3).reshape(num_nodes, -1, 2) for r in results],
+        dim=1,
+    )
+    mask = torch.cat([g.ndata["mask"] for g in pred_graphs], dim=1).type(torch.bool)
+    template = HomogeneousGraphTemplate.from_molecule_set(molecule_set=predict_ds.dataset.molecule_set, mappings=[mapping])
+    result_molecules = [molecule]
+    if train_on_partner and partner_result_column is not None:
+        result_molecules.append(partner_molecule)
+    for mol in result_molecules:
+        positions = template.positions[mol]
+        masked_molecules = mask[positions].numpy()
+        mat_pd = in_dataset.get_samples_value_matrix(molecule=mol, column="abundance")
         mat = mat_pd.to_numpy()
-        mat[masked_molecules.numpy()] = molecule_res[masked_molecules].numpy()[:, 0]
-        # mat[:, :] = prot_res[:, :].numpy()
+        mat[masked_molecules] = res[positions, :, 0].numpy()[masked_molecules]
         mat_pd.loc[:, :] = mat
-        in_dataset.set_samples_value_matrix(
-            matrix=mat_pd, molecule=molecule, column="abundance"
-        )
-        if train_on_partner and partner_result_column is not None:
-            partner_index = nt.index(partner_molecule)
-            partner_mask = (predict_graph.ndata[dgl.NTYPE] == partner_index).type(torch.bool)
-            partner_res = res[partner_mask]
-            masked_partner_mols = predict_graph.ndata["mask"][partner_mask].type(torch.bool)
-            partner_ids = predict_graph.ndata[dgl.NID][partner_mask].type(torch.int64)
-            partner_res = partner_res[partner_ids, :]
-            masked_partner_mols = masked_partner_mols[partner_ids, :]
-            mat_pd = in_dataset.get_samples_value_matrix(molecule=partner_molecule, column="abundance", samples=s)
-            mat = mat_pd.to_numpy()
-            mat[masked_partner_mols.numpy()] = partner_res[masked_partner_mols].numpy()[:, 0]
-            # mat[:, :] = prot_res[:, :].numpy()
-            mat_pd.loc[:, :] = mat
-            in_dataset.set_samples_value_matrix(
-                matrix=mat_pd, molecule=partner_molecule, column="abundance"
-            )
+        in_dataset.set_samples_value_matrix(matrix=mat_pd, molecule=mol, column="abundance")
     normalizer.unnormalize(dataset=in_dataset, inplace=True)
     vals = dataset.values[molecule][column]
     res_vals = in_dataset.values[molecule]["abundance"]
@@ -596,8 +577,11 @@ def impute_homogeneous_gnn(
         vals.loc[vals.isna(), :] = res_vals.loc[vals.isna(), :]
         dataset.values[partner_molecule][partner_result_column] = vals
     if uncertainty_column is not None:
-        mat[:, :] = np.nan
-        mat[masked_molecules.numpy()] = molecule_res[masked_molecules].numpy()[:, 1]
+        positions = template.positions[molecule]
+        masked_molecules = mask[positions].numpy()
+        mat_pd = in_dataset.get_samples_value_matrix(molecule=molecule, column="abundance")
+        mat = np.full(mat_pd.shape, np.nan)
+        mat[masked_molecules] = res[positions, :, 1].numpy()[masked_molecules]
         mat_pd.loc[:, :] = mat
         dataset.set_samples_value_matrix(
             matrix=mat_pd, molecule=molecule, column=uncertainty_column
@@ -1,24 +1,15 @@
 from typing import Optional, Literal
 import multiprocessing
 
-from rpy2 import robjects
-from rpy2.robjects.packages import importr
-from rpy2.robjects import pandas2ri
-from rpy2.robjects import numpy2ri
-
 import numpy as np
 import pandas as pd
 from ...data.dataset import Dataset
+from .r_packages import load_r_packages
+
 
-if not robjects.r('"missForest" %in% rownames(installed.packages())')[0]:
-    robjects.r('install.packages("missForest", repos = "https://cloud.r-project.org")')
-miss_forest = importr("missForest")
-if not robjects.r('"doParallel" %in% rownames(installed.packages())')[0]:
-    robjects.r('install.packages("doParallel", repos = "https://cloud.r-project.org")')
-do_parallel = importr("doParallel")
-if not robjects.r('"doRNG" %in% rownames(installed.packages())')[0]:
-    robjects.r('install.packages("doRNG", repos = "https://cloud.r-project.org")')
-do_rng = importr("doRNG")
+def _load_miss_forest():
+    miss_forest, _, _ = load_r_packages(cran=("missForest", "doParallel", "doRNG"))
+    return miss_forest
 
 
 def impute_miss_forest(
@@ -30,6 +21,10 @@ def impute_miss_forest(
     ntree=100,
     **kwds
 ):
+    from rpy2 import robjects
+    from rpy2.robjects import numpy2ri
+
+    miss_forest = _load_miss_forest()
     matrix = dataset.get_samples_value_matrix(molecule=molecule, column=column)
     mat = matrix.to_numpy()
     if molecules_as_variables:
@@ -1,31 +1,26 @@
 from typing import Optional, Literal
+import functools
 
 import numpy as np
-from rpy2 import robjects
-from rpy2.robjects.packages import importr
-from rpy2.robjects import pandas2ri
-from rpy2.robjects import numpy2ri
-
 import pandas as pd
 from ...data.dataset import Dataset
+from .r_packages import load_r_packages
+
 
-if not robjects.r('"BiocManager" %in% rownames(installed.packages())')[0]:
-    robjects.r('install.packages("BiocManager", repos = "https://cloud.r-project.org")')
-bioc_manager = importr("BiocManager")
-if not robjects.r('"MsCoreUtils" %in% rownames(installed.packages())')[0]:
-    bioc_manager.install("MsCoreUtils", ask=False)
-if not robjects.r('"pcaMethods" %in% rownames(installed.packages())')[0]:
-    bioc_manager.install("pcaMethods", ask=False)
-pca_methods = importr("pcaMethods")
-ms_core_utils = importr("MsCoreUtils")
-base = importr("base")
-r_mat_mul = robjects.r['%*%']
+@functools.lru_cache(maxsize=None)
+def _load_pca_methods():
+    from rpy2 import robjects
+    from rpy2.robjects.packages import importr
 
-nan_to_na = robjects.r(
-"""function(mat){
-    replace(mat, is.na(mat), NA)
-}"""
-)
+    _, pca_methods = load_r_packages(bioconductor=("MsCoreUtils", "pcaMethods"))
+    base = importr("base")
+    r_mat_mul = robjects.r['%*%']
+    nan_to_na = robjects.r(
+    """function(mat){
+        replace(mat, is.na(mat), NA)
+    }"""
+    )
+    return pca_methods, base, r_mat_mul, nan_to_na
 
 
 def impute_pca_method(
@@ -39,6 +34,10 @@ def impute_pca_method(
     only_transform_missing: bool = True
 
 ):
+    from rpy2 import robjects
+    from rpy2.robjects import numpy2ri
+
+    pca_methods, base, r_mat_mul, nan_to_na = _load_pca_methods()
     mat = dataset.get_samples_value_matrix(molecule=molecule, column=column)
     if n_pcs is None:
         n_pcs = mat.shape[1] - 1
@@ -78,6 +77,10 @@ def impute_local_least_squares(
     maxSteps = 100,
     result_column: Optional[str] = None,
 ):
+    from rpy2 import robjects
+    from rpy2.robjects import numpy2ri
+
+    pca_methods, _, _, nan_to_na = _load_pca_methods()
     mat = dataset.get_samples_value_matrix(molecule=molecule, column=column)
     input = mat.to_numpy().T
     with (robjects.default_converter + numpy2ri.converter).context():
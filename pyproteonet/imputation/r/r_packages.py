@@ -0,0 +1,39 @@
+from typing import Tuple
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def load_r_packages(cran: Tuple[str, ...] = (), bioconductor: Tuple[str, ...] = ()) -> Tuple:
+    """Installs (if missing), attaches and imports R packages via rpy2.
+
+    Importing rpy2 starts an embedded R and installing packages can take minutes, so this is only done on the first
+    use of an R based imputation method and cached afterwards.
+
+    Args:
+        cran (Tuple[str, ...], optional): Packages installed from CRAN. Defaults to ().
+        bioconductor (Tuple[str, ...], optional): Packages installed with BiocManager. Defaults to ().
+
+    Returns:
+        Tuple: The imported packages (rpy2 Package objects), CRAN packages first.
+    """
+    from rpy2 import robjects
+    from rpy2.robjects.packages import importr
+
+    def is_installed(package: str) -> bool:
+        return robjects.r(f'"{package}" %in% rownames(installed.packages())')[0]
+
+    for package in cran:
+        if not is_installed(package):
+            robjects.r(f'install.packages("{package}", repos = "https://cloud.r-project.org")')
+    if bioconductor:
+        if not is_installed("BiocManager"):
+            robjects.r('install.packages("BiocManager", repos = "https://cloud.r-project.org")')
+        bioc_manager = importr("BiocManager")
+        for package in bioconductor:
+            if not is_installed(package):
+                bioc_manager.install(package, ask=False)
+    packages = []
+    for package in cran + bioconductor:
+        robjects.r(f'library("{package}")')
+        packages.append(importr(package))
+    return tuple(packages)
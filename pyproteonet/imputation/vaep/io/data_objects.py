@@ -1,12 +1,16 @@
 from collections import Counter
+from contextlib import contextmanager
+import functools
 import os
 import sys
 import logging
 import json
+import re
+import sqlite3
 from pathlib import Path
 import multiprocessing
 from types import SimpleNamespace
-from typing import Callable, Iterable, List, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from tqdm.notebook import tqdm
 import numpy as np
@@ -72,6 +76,149 @@ def calc_chunksize(n_workers, len_iterable, factor=4):
     return chunksize
 
 
+# state files with these suffixes are persistent SQLite catalogs instead of json dumps
+CATALOG_SUFFIXES = ('.sqlite', '.db')
+
+
+def is_catalog(fp: Union[str, Path]) -> bool:
+    return Path(fp).suffix in CATALOG_SUFFIXES
+
+
+def _json_default(o):
+    # numpy scalars (e.g. charges in evidence keys or summary values)
+    if hasattr(o, 'item'):
+        return o.item()
+    return str(o)
+
+
+def _encode_key(key) -> str:
+    if isinstance(key, tuple):
+        key = list(key)
+    return json.dumps(key, default=_json_default)
+
+
+def _decode_key(key: str):
+    key = json.loads(key)
+    if isinstance(key, list):
+        key = tuple(key)
+    return key
+
+
+class FolderCatalog():
+    """Persistent, append-only catalog of processed MaxQuant folders.
+
+    Stored in a local SQLite database: every processed folder is added once
+    together with a json record (e.g. its summary or dump location), and
+    feature counts are incremented in the same transaction. Runs therefore
+    only parse new folders and an interrupted run keeps everything committed
+    so far.
+
+    Parameters
+    ----------
+    fp : Union[str, Path]
+        Path of the SQLite database, several catalogs can share one file.
+    name : str, optional
+        Name of the catalog (prefix of its tables), by default 'catalog'
+    """
+
+    def __init__(self, fp: Union[str, Path], name: str = 'catalog'):
+        self.fp = Path(fp)
+        if not self.fp.parent.exists():
+            raise FileNotFoundError(
+                f'Folder of filename not found: {self.fp.parent}')
+        self.name = name
+        self._folders = f'"{name}_folders"'
+        self._counts = f'"{name}_counts"'
+        with self._transaction() as con:
+            con.execute(
+                f'CREATE TABLE IF NOT EXISTS {self._folders} (folder TEXT PRIMARY KEY, record TEXT)')
+            con.execute(
+                f'CREATE TABLE IF NOT EXISTS {self._counts} (feature TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(fp={str(self.fp)}, name={self.name})"
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.fp)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def __len__(self):
+        with self._transaction() as con:
+            return con.execute(f'SELECT COUNT(*) FROM {self._folders}').fetchone()[0]
+
+    def folders(self) -> set:
+        """Names (stems) of all cataloged folders."""
+        with self._transaction() as con:
+            return set(row[0] for row in con.execute(f'SELECT folder FROM {self._folders}'))
+
+    def get_new_folders(self, folders: Iterable[Union[str, Path]]) -> List[Path]:
+        """Folders (in the passed order) which are not cataloged yet."""
+        loaded = self.folders()
+        return [Path(folder) for folder in folders if Path(folder).stem not in loaded]
+
+    def records(self) -> Dict[str, dict]:
+        """Records of all cataloged folders."""
+        with self._transaction() as con:
+            return {folder: json.loads(record)
+                    for folder, record in con.execute(f'SELECT folder, record FROM {self._folders}')}
+
+    def counter(self) -> Counter:
+        """Feature counts aggregated over all cataloged folders."""
+        with self._transaction() as con:
+            return Counter({_decode_key(feature): count
+                            for feature, count in con.execute(f'SELECT feature, count FROM {self._counts}')})
+
+    def append(self, records: Dict[str, dict],
+               counters: Optional[Dict[str, Counter]] = None) -> List[str]:
+        """Adds new folders and increments the feature counts in one transaction.
+
+        Feature counts are only incremented for folders which are actually
+        added, so a folder cataloged before (e.g. a duplicate folder name or
+        an overlapping run) is never counted twice.
+
+        Parameters
+        ----------
+        records : Dict[str, dict]
+            Json serializable record per folder name. Already cataloged
+            folders are ignored.
+        counters : Optional[Dict[str, Counter]], optional
+            Feature counts per folder name, by default None
+
+        Returns
+        -------
+        List[str]
+            Names of the added folders.
+        """
+        added = []
+        with self._transaction() as con:
+            for folder, record in records.items():
+                cursor = con.execute(
+                    f'INSERT OR IGNORE INTO {self._folders} (folder, record) VALUES (?, ?)',
+                    (folder, json.dumps(record, default=_json_default)))
+                if cursor.rowcount != 1:
+                    continue
+                added.append(folder)
+                counter = counters.get(folder) if counters else None
+                if counter:
+                    con.executemany(
+                        f'INSERT INTO {self._counts} (feature, count) VALUES (?, ?) '
+                        'ON CONFLICT(feature) DO UPDATE SET count = count + excluded.count',
+                        ((_encode_key(feature), int(count)) for feature, count in counter.items()))
+        return added
+
+    def drop(self) -> None:
+        """Removes all folders and counts of this catalog, other catalogs in
+        the same file are kept."""
+        with self._transaction() as con:
+            con.execute(f'DELETE FROM {self._folders}')
+            con.execute(f'DELETE FROM {self._counts}')
+
+
 class col_summary:
     MS = 'MS'
     MS2 = 'MS/MS Identified'
@@ -81,7 +228,16 @@ class MqAllSummaries():
 
     def __init__(self, fp_summaries=DEFAULTS.ALL_SUMMARIES):
         fp_summaries = Path(fp_summaries)
-        if fp_summaries.exists():
+        self.catalog = None
+        if is_catalog(fp_summaries):
+            # summaries are appended to a persistent catalog instead of rewriting a json dump
+            self.catalog = FolderCatalog(fp_summaries, name='summaries')
+            d_summaries = self.catalog.records()
+            self.df = _convert_dtypes(pd.DataFrame.from_dict(
+                d_summaries, orient='index')) if d_summaries else None
+            print(
+                f"{self.__class__.__name__}: Load summaries of {len(d_summaries)} folders.")
+        elif fp_summaries.exists():
             self.df = _convert_dtypes(
                 pd.read_json(fp_summaries, orient='index'))
             print(
@@ -153,13 +309,23 @@ class MqAllSummaries():
 
             self.df = _convert_dtypes(
                 pd.DataFrame.from_dict(d_summaries, orient='index'))
-            self.save_state()
+            if self.catalog is not None:
+                # only the new summaries are written
+                self.catalog.append(
+                    {k: v for d in list_of_updates for k, v in d.items()})
+            else:
+                self.save_state()
         else:
             print("No new sample added.")
         return self.df
 
     def save_state(self):
-        """Save summaries DataFrame as json and pickled object."""
+        """Save summaries DataFrame as json and pickled object.
+
+        Nothing to do for a catalog, summaries are committed when loaded."""
+        if self.catalog is not None:
+            logger.info(f"Summaries are kept in catalog: {self.fp_summaries}")
+            return
         self.df.to_json(self.fp_summaries, orient='index')
         self.df.to_pickle(self.fp_summaries.parent /
                           f"{self.fp_summaries.stem}.pkl")
@@ -223,6 +389,40 @@ def collect_in_chuncks(paths: Iterable[Union[str, Path]],
     return collected
 
 
+def _process_chunk_with_paths(process_chunk_fct: Callable, paths) -> Tuple[List, object]:
+    return paths, process_chunk_fct(paths)
+
+
+def iter_chunks_completed(paths: Iterable[Union[str, Path]],
+                          process_chunk_fct: Callable,
+                          n_workers: int = N_WORKERS_DEFAULT,
+                          chunks=10,
+                          desc='Run chunks in parallel') -> Iterator[Tuple[List, object]]:
+    """Like collect_in_chuncks, but yields (chunk of paths, result) pairs as
+    soon as a chunk is processed (in order of completion), so results can be
+    persisted incrementally.
+    """
+    paths_splits = np.array_split(paths, min(chunks, len(paths)))
+    fct = functools.partial(_process_chunk_with_paths, process_chunk_fct)
+    if n_workers > 1:
+        with multiprocessing.Pool(n_workers) as p:
+            yield from tqdm(p.imap_unordered(fct, paths_splits),
+                            total=len(paths_splits),
+                            desc=desc)
+    else:
+        yield from map(fct, paths_splits)
+
+
+def catalog_name(feature_name: str) -> str:
+    """Catalog (table prefix) name of a feature counter."""
+    return 'counter_' + re.sub(r'\W+', '_', feature_name.strip().lower())
+
+
+def _count_per_folder(counting_fct: Callable, paths) -> Dict[str, dict]:
+    # results of counting_fct for every folder of a chunk separately, keyed by folder name
+    return {Path(folder).stem: counting_fct([folder]) for folder in paths}
+
+
 class FeatureCounter():
     def __init__(self, fp_counter: str, counting_fct: Callable[[List], Counter],
                 idx_names:Union[List, None]=None,
@@ -232,7 +432,19 @@ class FeatureCounter():
         self.counting_fct = counting_fct
         self.idx_names = idx_names
         self.feature_name = feature_name
-        if self.fp.exists() and not overwrite:
+        self.catalog = None
+        if is_catalog(self.fp):
+            # folders and counts are kept in a persistent catalog and updated incrementally,
+            # one pair of tables per feature, so several counters can share a database
+            self.catalog = FolderCatalog(self.fp, name=catalog_name(feature_name))
+            if overwrite:
+                self.catalog.drop()
+            records = self.catalog.records()
+            self.counter = self.catalog.counter()
+            self.loaded = set(records.keys())
+            self.dumps = {k: Path(v['dump']) for k, v in records.items()
+                          if v.get('dump') is not None}
+        elif self.fp.exists() and not overwrite:
             d = self.load(self.fp)
             self.counter = d['counter']
             self.loaded = set(folder for folder in d['based_on'])
@@ -260,7 +472,9 @@ class FeatureCounter():
             else:
                 folders = []
 
-        if folders:
+        if folders and self.catalog is not None:
+            self._sum_over_files_into_catalog(folders, n_workers=n_workers)
+        elif folders:
             list_of_sample_dicts = collect_in_chuncks(folders,
                        process_chunk_fct=self.counting_fct,
                        n_workers = n_workers,
@@ -283,6 +497,24 @@ class FeatureCounter():
             logger.info('Nothing to process.')
         return self.counter
 
+    def _sum_over_files_into_catalog(self, folders: List[Path], n_workers=N_WORKERS_DEFAULT):
+        # every processed chunk is committed to the catalog right away,
+        # folders are counted separately so that only newly cataloged folders add to the counts
+        for _, per_folder in iter_chunks_completed(folders,
+                                                   process_chunk_fct=functools.partial(
+                                                       _count_per_folder, self.counting_fct),
+                                                   n_workers=n_workers,
+                                                   chunks=n_workers*3,
+                                                   desc='Count features in chunks'):
+            records = {folder: {'dump': str(d['dumps'][folder]) if folder in d['dumps'] else None}
+                       for folder, d in per_folder.items()}
+            added = self.catalog.append(
+                records, counters={folder: d['counter'] for folder, d in per_folder.items()})
+            for folder in added:
+                self.counter += per_folder[folder]['counter']
+                self.dumps.update(per_folder[folder]['dumps'])
+            self.loaded |= set(added)
+
     @property
     def n_samples(self):
         return len(self.loaded)
@@ -346,7 +578,12 @@ class FeatureCounter():
          'based_on': list,
          'dumps: dict,
          }
+
+        Nothing to do for a catalog, counts are committed per processed chunk.
         """
+        if self.catalog is not None:
+            logger.info(f"Counts are kept in catalog: {self.fp}")
+            return
         d = {'counter': self.counter,
             'based_on': list(self.loaded),
             'dumps': {k: str(v) for k, v in self.dumps.items()}}
@@ -527,7 +764,12 @@ class EvidenceCounter(FeatureCounter):
          'counter': Counter with tuple keys,
          'based_on': list
          }
+
+        Nothing to do for a catalog, counts are committed per processed chunk.
         """
+        if self.catalog is not None:
+            logger.info(f"Counts are kept in catalog: {self.fp}")
+            return
         d = {'counter': vaep.pandas.create_dict_of_dicts(self.counter),
              'based_on': list(self.loaded), 
              'dumps': {k: str(v) for k, v in self.dumps.items()}}
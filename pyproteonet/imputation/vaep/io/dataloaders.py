@@ -12,6 +12,26 @@ from ..io.datasets import DatasetWithTarget
 from ..transform import VaepPipeline
 
 
+class TensorBatchDL(TfmdDL):
+    """fastai DataLoader for tensor backed datasets (see `datasets.DatasetWithMaskAndNoTarget`).
+
+    Whole mini-batches are fetched with a single `__getitem__` call by slicing
+    the dataset's tensors instead of collating items one by one. Batches still
+    pass through `retain`, `after_batch` and the device transfer. If per item
+    (`after_item`) or `before_batch` transforms are set, the default item wise
+    collation of fastai is used.
+    """
+
+    def create_batches(self, samps):
+        if self.after_item.fs or self.before_batch.fs:
+            yield from super().create_batches(samps)
+            return
+        # samps are the (shuffled) item indices, chunked with fastai's chunkify (handles drop_last)
+        for b in self.chunkify(samps):
+            idxs = torch.as_tensor(list(b), dtype=torch.long)
+            yield self.retain(self.dataset[idxs], [self.dataset[int(idxs[0])]])
+
+
 class DataLoadersCreator():
     """DataLoader creator. For training or evaluation."""
 
@@ -116,7 +136,7 @@ def get_dls(train_X: pandas.DataFrame,
     # ! Need for script exection (as plain python file)
     # https://pytorch.org/docs/stable/notes/windows.html#multiprocessing-error-without-if-clause-protection
     return DataLoaders.from_dsets(train_ds, valid_ds, bs=bs, drop_last=False,
-                                  num_workers=num_workers)
+                                  num_workers=num_workers, dl_type=TensorBatchDL)
 
 
 # dls.test_dl
@@ -140,8 +160,8 @@ def get_test_dl(df: pandas.DataFrame,
 
     Returns
     -------
-    fastai.data.load.DataLoader
+    TensorBatchDL
         DataLoader from fastai for test data.
     """
     ds = dataset(df, transformer)
-    return DataLoader(ds, bs=bs, shuffle=False)
+    return TensorBatchDL(ds, bs=bs, shuffle=False)
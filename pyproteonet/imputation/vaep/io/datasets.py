@@ -4,8 +4,8 @@ import pandas as pd
 import sklearn.pipeline
 
 import torch
-from torch.utils.data import Dataset
-from typing import Tuple
+from torch.utils.data import Dataset, Sampler
+from typing import Iterator, Optional, Tuple
 
 DEFAULT_DTYPE = torch.get_default_dtype()
 
@@ -55,6 +55,43 @@ def to_tensor(s: pd.Series) -> torch.Tensor:
     return torch.from_numpy(s.values).type(DEFAULT_DTYPE)
 
 
+def to_contiguous_tensor(df: pd.DataFrame) -> torch.Tensor:
+    """Converts a DataFrame once into a row major tensor, so rows and batches
+    of rows are served by slicing."""
+    return torch.from_numpy(np.ascontiguousarray(df.to_numpy())).type(DEFAULT_DTYPE).contiguous()
+
+
+class MiniBatchSampler(Sampler):
+    """Sampler yielding whole mini-batches of indices.
+
+    Use it with tensor backed datasets and ``batch_size=None``, e.g.
+    ``torch.utils.data.DataLoader(ds, sampler=MiniBatchSampler(len(ds), 64), batch_size=None)``,
+    so every ``__getitem__`` call returns a complete batch by slicing instead of
+    collating single items.
+    """
+
+    def __init__(self, num_items: int, batch_size: int, shuffle: bool = False,
+                 drop_last: bool = False, generator: Optional[torch.Generator] = None):
+        self.num_items = num_items
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        if self.shuffle:
+            idxs = torch.randperm(self.num_items, generator=self.generator)
+        else:
+            idxs = torch.arange(self.num_items)
+        for i in range(len(self)):
+            yield idxs[i * self.batch_size:(i + 1) * self.batch_size]
+
+    def __len__(self) -> int:
+        if self.drop_last:
+            return self.num_items // self.batch_size
+        return (self.num_items + self.batch_size - 1) // self.batch_size
+
+
 class DatasetWithMaskAndNoTarget(Dataset):
 
     # nan = torch.tensor(np.float32('NaN'))
@@ -75,15 +112,20 @@ class DatasetWithMaskAndNoTarget(Dataset):
                     f'{type(transformer)} is not sklearn compatible, has no inverse_transform.')
         self.data = df
         self.length_ = len(self.data)
+        self.to_tensors()
+
+    def to_tensors(self):
+        """(Re)builds the tensors items are served from, needs to be called
+        after the DataFrames are modified."""
+        self.mask_isna_tensor = to_contiguous_tensor(self.mask_isna)
+        self.data_tensor = to_contiguous_tensor(self.data)
 
     def __len__(self):
         return self.length_
 
     def __getitem__(self, idx) -> Tuple[torch.Tensor, torch.Tensor]:
-        mask_isna = self.mask_isna.iloc[idx]
-        data = self.data.iloc[idx]
-        mask_isna, data = to_tensor(mask_isna), to_tensor(data)
-        return  mask_isna, data
+        # idx can be a single position or a whole batch (slice or index tensor)
+        return self.mask_isna_tensor[idx], self.data_tensor[idx]
 
 class DatasetWithTarget(DatasetWithMaskAndNoTarget):
 
@@ -125,12 +167,15 @@ class DatasetWithTargetSpecifyTarget(DatasetWithMaskAndNoTarget):
 
         self.data = df
         self.length_ = len(self.data)
-        
+        self.to_tensors()
+
+    def to_tensors(self):
+        super().to_tensors()
+        self.target_tensor = to_contiguous_tensor(self.target)
 
     def __getitem__(self, idx) -> Tuple[torch.Tensor, torch.Tensor]:
         mask_isna, data =  super().__getitem__(idx)
-        target =  to_tensor(self.target.iloc[idx])
-        return mask_isna, data, target
+        return mask_isna, data, self.target_tensor[idx]
 
 class PeptideDatasetInMemoryMasked(DatasetWithMaskAndNoTarget):
     """Peptide Dataset fully in memory.
@@ -150,7 +195,10 @@ class PeptideDatasetInMemoryMasked(DatasetWithMaskAndNoTarget):
         """
         self.fill_na = fill_na
         super().__init__(*args, **kwargs)
+
+    def to_tensors(self):
         self.data.fillna(self.fill_na, inplace=True)
+        super().to_tensors()
 
 
 class PeptideDatasetInMemoryNoMissings(Dataset):
@@ -1,7 +1,9 @@
 import io
+from collections import Counter
 from tokenize import group
 import pandas as pd
 from vaep.pandas import select_max_by
+from vaep.io.data_objects import FeatureCounter, FolderCatalog
 
 #                         m/z Protein group IDs         Intensity   Score
 # Sequence     Charge
@@ -42,3 +44,30 @@ def test_select_max_by():
 
     desired = pd.read_csv(io.StringIO(expected), index_col=index_columns)
     assert desired.equals(actual)
+
+
+def test_FolderCatalog_append_same_folder_twice(tmp_path):
+    catalog = FolderCatalog(tmp_path / 'catalog.sqlite', name='counter_feature')
+    counters = {'folder_a': Counter({'PEPTIDE': 2, 'PEPTIDEK': 1})}
+    assert catalog.append({'folder_a': {'dump': None}}, counters=counters) == ['folder_a']
+    assert catalog.append({'folder_a': {'dump': None}}, counters=counters) == []
+    assert catalog.folders() == {'folder_a'}
+    assert catalog.counter() == Counter({'PEPTIDE': 2, 'PEPTIDEK': 1})
+
+
+def test_FeatureCounter_catalogs_share_file(tmp_path):
+    fp = tmp_path / 'counts.sqlite'
+    summaries = FolderCatalog(fp, name='summaries')
+    summaries.append({'folder_a': {'MS': 1}})
+    peptides = FeatureCounter(fp, counting_fct=None, feature_name='aggregated peptide')
+    peptides.catalog.append({'folder_a': {}}, counters={'folder_a': Counter({'PEPTIDE': 1})})
+    evidence = FeatureCounter(fp, counting_fct=None, feature_name='charged peptide')
+    evidence.catalog.append({'folder_a': {}}, counters={'folder_a': Counter({('PEPTIDE', 2): 3})})
+    evidence.save()  # no-op for catalogs, must not replace the database
+
+    assert FeatureCounter(fp, counting_fct=None, feature_name='aggregated peptide').counter == Counter({'PEPTIDE': 1})
+    assert FeatureCounter(fp, counting_fct=None, feature_name='charged peptide').counter == Counter({('PEPTIDE', 2): 3})
+    # overwriting drops only the tables of this counter
+    assert FeatureCounter(fp, counting_fct=None, feature_name='charged peptide', overwrite=True).counter == Counter()
+    assert FeatureCounter(fp, counting_fct=None, feature_name='aggregated peptide').counter == Counter({'PEPTIDE': 1})
+    assert summaries.folders() == {'folder_a'}
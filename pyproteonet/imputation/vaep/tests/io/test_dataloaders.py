@@ -1,9 +1,15 @@
+import random
+
+import pytest
 import sklearn
+import torch
+from fastai.data.core import TfmdDL
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler
 
 from vaep.transform import VaepPipeline
-from vaep.io.dataloaders import get_dls
+from vaep.io.dataloaders import TensorBatchDL, get_dls
+from vaep.io.datasets import DatasetWithTarget
 from vaep.utils import create_random_df
 
 
@@ -28,3 +34,28 @@ def test_get_dls():
     assert batch[0].shape == (BS, M)
 
 
+
+def _batches(dl, seed=0):
+    dl.rng = random.Random(seed)
+    return list(dl)
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_TensorBatchDL_matches_item_wise_collation(num_workers):
+    N, M = 23, 11
+    X = create_random_df(N, M, prop_na=.2)
+    ds = DatasetWithTarget(X)
+    kwargs = dict(bs=4, shuffle=True, drop_last=True,
+                  num_workers=num_workers, after_batch=lambda t: t * 2,
+                  device=torch.device('cpu'))
+    dl_tensor = TensorBatchDL(ds, **kwargs)
+    dl_items = TfmdDL(ds, **kwargs)
+    assert dl_tensor.n_inp == dl_items.n_inp == 2
+    expected = _batches(dl_items)
+    actual = _batches(dl_tensor)
+    assert len(actual) == len(expected) == len(dl_tensor) == N // 4
+    for batch, batch_expected in zip(actual, expected):
+        assert len(batch) == len(batch_expected) == 3
+        for t, t_expected in zip(batch, batch_expected):
+            assert t.dtype == t_expected.dtype
+            assert torch.equal(t.nan_to_num(-1), t_expected.nan_to_num(-1))
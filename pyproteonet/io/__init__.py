@@ -1,3 +1,4 @@
 from .io import read_dataset_pandas
 from .maxquant import load_maxquant
-from .alphapept import load_alphapept_result
\ No newline at end of file
+from .alphapept import load_alphapept_result
+from .parquet import read_parquet, write_parquet, dataset_to_arrow, dataset_from_arrow
@@ -3,7 +3,6 @@ from typing import Union, List, Dict, Tuple, Optional
 
 import pandas as pd
 import numpy as np
-import h5py
 
 from ..data import MoleculeSet, Dataset
 
@@ -15,6 +14,8 @@ def load_alphapept_result(
     skip_decoys: bool=True,
     keep_razor_mapping: bool=True,
 )->Dataset:
+    import h5py
+
     base_path = Path(base_path)
     database = h5py.File(base_path / "database.hdf", "r")
     protein_fdr = pd.read_hdf(base_path / "results.hdf", "protein_fdr")
@@ -51,6 +52,7 @@ def load_alphapept_result(
     keep_razor_mapping: bool=True,
     keep_spectra: bool = True,
     samples: Optional[List[str]] = None,
+    pbar: bool = False,
 )->Dataset:
     """Reads a Dataset from a directory containing results of the Alphapept analysis pipeline.
 
@@ -70,26 +72,28 @@ def load_alphapept_result(
           the peptide is assigned the group with the most found peptides (razor peptide). Defaults to True.
         keep_sptectra (bool, optional): Keep all spectra information as values under the key 'spectra'. Defaults to True.
         samples: (List[str], optional): Only load certain samples, if None load all samples. Defaults to None.
+        pbar (bool, optional): Whether to show a progress bar reporting the throughput in samples/s while creating samples. Defaults to False.
 
     Returns:
         Dataset: The loaded dataset
     """    
+    import h5py
+    from tqdm.auto import tqdm
+
     base_path = Path(base_path)
-    database = h5py.File(base_path / "database.hdf", "r")
+    # both files are read from disk, database.hdf can be much larger than the few arrays needed from it
     protein_fdr = pd.read_hdf(base_path / "results.hdf", "protein_fdr")
     if samples is not None:
         protein_fdr = protein_fdr[protein_fdr.sample_group.isin(samples)]
     if skip_decoys:
         protein_fdr = protein_fdr[~protein_fdr.decoy]
-    sequences = np.array(database["peptides"]["sequences"])
-    prot_indices = np.array(database["peptides"]["protein_indices"])
-    db_pointers = np.array(database["peptides"]["protein_indptr"])
-    prots = pd.Series(database["proteins"]["name"]).iloc[prot_indices].astype(str).reset_index(drop=True)
-    pep_pointers, prot_pointers = [], []
-    for i in range(len(sequences)):
-        target_prots = range(db_pointers[i], db_pointers[i + 1])
-        prot_pointers.extend(target_prots)
-        pep_pointers.extend([i] * len(target_prots))
+    with h5py.File(base_path / "database.hdf", "r") as database:
+        sequences = np.array(database["peptides"]["sequences"])
+        prot_indices = np.array(database["peptides"]["protein_indices"])
+        db_pointers = np.array(database["peptides"]["protein_indptr"])
+        prots = pd.Series(np.array(database["proteins"]["name"])).iloc[prot_indices].astype(str).reset_index(drop=True)
+    prot_pointers = np.arange(db_pointers[0], db_pointers[len(sequences)])
+    pep_pointers = np.repeat(np.arange(len(sequences)), np.diff(db_pointers[: len(sequences) + 1]))
     pep_prot_mapping = pd.DataFrame({"id": sequences[pep_pointers].astype(str), "map_id": prots.iloc[prot_pointers]})
 
     protein_groups = pd.Series(protein_fdr.protein_group.unique())
@@ -139,7 +143,7 @@ def load_alphapept_result(
     spec_groups = {}
     if keep_spectra:
         spec_groups = {sample:vals for sample, vals in protein_fdr.groupby('sample_group')}
-    for name, values in sample_peptides.groupby("sample_group"):
+    for name, values in tqdm(sample_peptides.groupby("sample_group"), unit="sample", disable=not pbar):
         values.reset_index(level=["sample_group"], drop=True, inplace=True)
         values = {"peptide": values}
         if keep_spectra:
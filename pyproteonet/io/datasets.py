@@ -5,7 +5,7 @@ import zipfile
 from ..data.dataset import Dataset
 from .maxquant import load_maxquant
 
-def load_maxlfq_benchmark(path: Path)->Dataset:
+def load_maxlfq_benchmark(path: Path, num_workers: int = 2)->Dataset:
     if not path.exists():
         path.mkdir(parents=True)
         url = "https://ftp.pride.ebi.ac.uk/pride/data/archive/2014/09/PXD000279/proteomebenchmark.zip"
@@ -14,6 +14,6 @@ def load_maxlfq_benchmark(path: Path)->Dataset:
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             zip_ref.extractall(path)
     ds = load_maxquant(peptides_table=path/'peptides.txt', protein_groups_table=path/'proteinGroups.txt',
-                       samples=['L1','L2','L3','H1','H2','H3'],
+                       samples=['L1','L2','L3','H1','H2','H3'], num_workers=num_workers,
                       )
     return ds
\ No newline at end of file
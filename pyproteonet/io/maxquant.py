@@ -1,10 +1,57 @@
-from typing import List, Union, Optional
+from typing import Dict, Iterator, List, Union, Optional
 from pathlib import Path
+import re
 
 import pandas as pd
 import numpy as np
 
 from pyproteonet.data import MoleculeSet, Dataset
+from ..utils.parallel import thread_map
+
+
+def _read_header(table: Union[pd.DataFrame, str, Path]) -> List[str]:
+    if isinstance(table, pd.DataFrame):
+        return list(table.columns)
+    return list(pd.read_csv(table, sep="\t", nrows=0).columns)
+
+
+def _iter_chunks(
+    table: Union[pd.DataFrame, str, Path], usecols: List[str], dtype: Dict[str, type], chunksize: int
+) -> Iterator[pd.DataFrame]:
+    # yields row chunks of only the needed columns, the row index continues across chunks
+    if isinstance(table, pd.DataFrame):
+        for start in range(0, table.shape[0], chunksize):
+            yield table.iloc[start : start + chunksize].loc[:, usecols]
+    else:
+        yield from pd.read_csv(table, sep="\t", usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+
+def _read_value_table(
+    table: Union[pd.DataFrame, str, Path],
+    molecule_columns: List[str],
+    value_columns: Dict[str, List[str]],
+    missing_value: float,
+    chunksize: int,
+    extra_columns: List[str] = [],
+):
+    # collects molecule columns, extra columns and one (molecule x sample) matrix per value column, the matrices are
+    # transposes of sample major arrays (the layout of the dataset samples) so they are not copied again
+    text_columns = list(dict.fromkeys(molecule_columns + extra_columns))
+    text = pd.concat(_iter_chunks(table, usecols=text_columns, dtype={c: str for c in extra_columns}, chunksize=chunksize))
+    molecules = text.loc[:, molecule_columns].rename_axis("id")
+    extra = text.loc[:, extra_columns]
+    # the row count is known after the first pass, so the value columns are parsed straight into preallocated arrays
+    # and only one chunk of values is held in memory besides the final arrays
+    sample_columns = list(dict.fromkeys(c for columns in value_columns.values() for c in columns))
+    values = {v: np.empty((len(columns), text.shape[0]), dtype=np.float64) for v, columns in value_columns.items()}
+    pos = 0
+    for chunk in _iter_chunks(table, usecols=sample_columns, dtype={c: np.float64 for c in sample_columns}, chunksize=chunksize):
+        for v, columns in value_columns.items():
+            vals = chunk.loc[:, columns].to_numpy(dtype=np.float64)
+            vals[vals == missing_value] = np.nan
+            values[v][:, pos : pos + chunk.shape[0]] = vals.T
+        pos += chunk.shape[0]
+    return molecules, extra, {v: m.T for v, m in values.items()}
 
 
 def load_maxquant(
@@ -15,68 +62,80 @@ def load_maxquant(
     peptide_value_columns: List[str] = ["Intensity"],
     peptide_columns: List[str] = ["Sequence"],
     protein_group_columns: List[str] = ["Fasta headers"],
-    missing_value: float = 0
+    missing_value: float = 0,
+    chunksize: int = 100000,
+    num_workers: int = 2,
 ) -> Dataset:
     """Loads a dataset given in MaxQuant format (experimental for now). Might not support all datsets.
 
+    Tables are streamed in chunks and only the columns needed for the requested samples are parsed,
+    so wide tables with thousands of columns never have to be held in memory as a whole. Files are read in two passes
+    (text columns, then value columns), which allows parsing the values straight into the arrays backing the dataset,
+    so the peak memory is about the size of the loaded values plus one chunk.
+
     Args:
         protein_groups_table (Union[pd.DataFrame, str, Path]): Pandas dataframe or path to proteinGroups.txt.
         peptides_table (Union[pd.DataFrame, str, Path]): Pandas dataframe or path to peptides.txt.
         samples (List[str], optional): List of sample names to load (must be present as columns in peptides.txt and proteinGroups.txt).
-        protein_group_value_columns (List[str], optional): Values to load for every protein group and sample. 
+        protein_group_value_columns (List[str], optional): Values to load for every protein group and sample.
             Sample name and value column will be concatenated to a column name which is then looked up n the peptides table.
             Defaults to ["Intensity", "iBAQ", "LFQ intensity"].
-        peptide_value_columns (List[str], optional): Values to load for every protein group and sample. 
+        peptide_value_columns (List[str], optional): Values to load for every protein group and sample.
             Sample name and value column will be concatenated to a column name which is then looked up in the protein groups table.
             Defaults to ["Intensity"].
         peptide_columns (List[str], optional): Columns from the peptides table to keep as meta info per molecule. Defaults to ["Sequence"].
         protein_group_columns (List[str], optional): Columns from the protein group table to keep as meta info per molecule.
             Defaults to ["Fasta headers"].
         missing_vlue (float, optional): Value interpreted as missing, Defaults to 0.
+        chunksize (int, optional): Number of table rows parsed at once. Defaults to 100000.
+        num_workers (int, optional): Number of threads, with more than one worker both tables are parsed concurrently. Defaults to 2.
 
     Returns:
         Dataset: The loaded Dataset.
-    """    
-    if isinstance(peptides_table, (str, Path)):
-        peptides_table = pd.read_csv(peptides_table, sep="\t")
+    """
     if samples is None:
+        header = _read_header(peptides_table)
         samples = []
         for value_column in ['Intensity']:
-            value_samples = peptides_table.columns.str.extract(f'{value_column} (.+)')
-            samples.append(set(value_samples.loc[~value_samples.loc[:,0].isna(), 0]))
+            pattern = re.compile(f'{value_column} (.+)')
+            matches = [pattern.search(c) for c in header]
+            samples.append({m.group(1) for m in matches if m is not None})
         samples = list(set.intersection(*samples))
         samples.sort()
-    if protein_groups_table is None:
-        protein_groups = peptides_table.loc[:, 'Protein group IDs'].astype(str).str.split(';').explode().unique().astype(int)
-        protein_groups = pd.DataFrame(index=pd.Index(protein_groups, name='id')) 
-    elif isinstance(protein_groups_table, (str, Path, pd.DataFrame)):
-        if isinstance(protein_groups_table, (str, Path)):
-            protein_groups_table = pd.read_csv(protein_groups_table, sep="\t")
-        protein_groups = protein_groups_table.loc[:, protein_group_columns]
-    peptides = peptides_table.loc[:, peptide_columns].copy()
-    map = peptides_table["Protein group IDs"].astype(str).str.split(";").explode().astype(int)
+    tables = [
+        dict(
+            table=peptides_table,
+            molecule_columns=list(peptide_columns),
+            value_columns={v: [f"{v} {sample}" for sample in samples] for v in peptide_value_columns},
+            missing_value=missing_value,
+            chunksize=chunksize,
+            extra_columns=["Protein group IDs"],
+        )
+    ]
+    if protein_groups_table is not None:
+        tables.append(
+            dict(
+                table=protein_groups_table,
+                molecule_columns=list(protein_group_columns),
+                value_columns={v: [f"{v} {sample}" for sample in samples] for v in protein_group_value_columns},
+                missing_value=missing_value,
+                chunksize=chunksize,
+            )
+        )
+    # the peptide and protein group tables are parsed concurrently
+    tables = list(thread_map(lambda kwargs: _read_value_table(**kwargs), tables, num_workers=num_workers))
+    peptides, peptide_groups, peptide_values = tables[0]
+    map = peptide_groups["Protein group IDs"].astype(str).str.split(";").explode().astype(int)
     map = map.reset_index().rename(columns={"index": "peptide", "Protein group IDs": "protein_group"})
-    #import pdb; pdb.set_trace()
     map.set_index(['peptide', 'protein_group'], inplace=True, drop=True)
-    # mapping_protein_group = {
-    #     "protein_group": pd.DataFrame({"id": protein_groups.index, "map_id": protein_groups.index}),
-    #     "peptide": map,
-    # }
+    values = {"peptide": peptide_values}
+    if protein_groups_table is None:
+        protein_groups = map.index.get_level_values('protein_group').unique()
+        protein_groups = pd.DataFrame(index=pd.Index(protein_groups, name='id'))
+    else:
+        protein_groups, _, values["protein_group"] = tables[1]
     ms = MoleculeSet(
         molecules={"peptide": peptides, "protein_group": protein_groups},
         mappings={"peptide-protein_group": map},
     )
-    ds = Dataset(molecule_set=ms)
-    for sample in samples:
-        values = dict()
-        columns = {f"{v} {sample}":v for v in peptide_value_columns}
-        peptide_values = peptides_table.loc[:, columns.keys()].rename(columns=columns)
-        peptide_values[peptide_values==missing_value] = np.nan
-        values['peptide'] = peptide_values
-        if protein_groups_table is not None:
-            columns = {f"{v} {sample}":v for v in protein_group_value_columns}
-            protein_group_values = protein_groups_table.loc[:, columns.keys()].rename(columns=columns)
-            protein_group_values[protein_group_values==missing_value] = np.nan
-            values['protein_group'] = protein_group_values
-        ds.create_sample(name=sample, values=values)
-    return ds
+    return Dataset.from_value_matrices(molecule_set=ms, sample_names=samples, values=values, copy=False)
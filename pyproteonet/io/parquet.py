@@ -0,0 +1,376 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
+from pathlib import Path
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from ..data.dataset import Dataset
+from ..data.molecule_set import MoleculeSet, MoleculeMapping, _check_name
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+LAYOUTS = ("long", "wide")
+
+
+def _check_layout(layout: str):
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', must be one of {LAYOUTS}.")
+
+
+def _dataset_columns(dataset: Dataset, molecule: str) -> List[str]:
+    columns = {}
+    for sample in dataset.samples:
+        columns.update(dict.fromkeys(sample.values[molecule].columns))
+    return list(columns)
+
+
+def dataset_to_arrow(
+    dataset: Dataset,
+    molecule: str,
+    columns: Optional[Union[str, List[str]]] = None,
+    layout: str = "long",
+    samples: Optional[List[str]] = None,
+) -> "pa.Table":
+    """Converts the values of one molecule type into an Arrow table.
+
+    In the long layout the table has one row per (sample, molecule) pair with the columns "sample", "id" and one column per
+    value column. Rows are ordered sample by sample, so row group statistics allow skipping samples when reading Parquet.
+    In the wide layout the table has one row per molecule with the column "id" and one column per sample,
+    which is the same layout as written by Dataset.write_tsvs and requires exactly one value column.
+    Value columns are float64 and missing values are kept as they are (no Arrow nulls), so they are not copied again
+    when converting back to numpy.
+
+    Args:
+        dataset (Dataset): The dataset to convert.
+        molecule (str): The molecule type.
+        columns (Optional[Union[str, List[str]]], optional): Value column(s) to include. Defaults to all value columns.
+        layout (str, optional): Either "long" or "wide". Defaults to "long".
+        samples (Optional[List[str]], optional): Samples to include. Defaults to all samples.
+
+    Returns:
+        pa.Table: The values as Arrow table.
+    """
+    import pyarrow as pa
+
+    _check_layout(layout)
+    if samples is None:
+        samples = dataset.sample_names
+    if columns is None:
+        columns = _dataset_columns(dataset, molecule)
+    elif isinstance(columns, str):
+        columns = [columns]
+    ids = dataset.molecules[molecule].index
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=columns, samples=samples)
+    if layout == "wide":
+        if len(columns) != 1:
+            raise ValueError("The wide layout requires exactly one value column.")
+        arrays = [pa.array(ids)] + [pa.array(values[0, :, i]) for i in range(len(samples))]
+        return pa.Table.from_arrays(arrays, names=["id"] + [str(s) for s in samples])
+    sample_codes = np.repeat(np.arange(len(samples), dtype=np.int32), len(ids))
+    arrays = [
+        pa.DictionaryArray.from_arrays(sample_codes, pa.array([str(s) for s in samples], type=pa.string())),
+        pa.array(np.tile(ids.to_numpy(), len(samples))),
+    ]
+    # (column, molecule, sample) -> (column, sample, molecule) so every column is flattened sample by sample
+    values = np.ascontiguousarray(values.transpose(0, 2, 1)).reshape(len(columns), -1)
+    arrays += [pa.array(values[i]) for i in range(len(columns))]
+    return pa.Table.from_arrays(arrays, names=["sample", "id"] + list(columns))
+
+
+def _column_to_numpy(table: "pa.Table", column: str) -> np.ndarray:
+    # zero copy for single chunk columns without nulls
+    return table.column(column).combine_chunks().to_numpy(zero_copy_only=False)
+
+
+def _arrow_long_to_matrices(
+    table: "pa.Table", ids: pd.Index, samples: Optional[List[str]] = None, missing_value: float = np.nan
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    sample_col = table.column("sample").combine_chunks()
+    if not pa.types.is_dictionary(sample_col.type):
+        sample_col = pc.dictionary_encode(sample_col)
+    sample_names = [str(s) for s in sample_col.dictionary.to_pylist()]
+    sample_codes = sample_col.indices.to_numpy(zero_copy_only=False)
+    if samples is None:
+        # keep the order in which samples first appear
+        _, first = np.unique(sample_codes, return_index=True)
+        samples = [sample_names[sample_codes[i]] for i in np.sort(first)]
+    sample_pos = pd.Index(samples).get_indexer(sample_names)[sample_codes]
+    id_pos = ids.get_indexer(_column_to_numpy(table, "id"))
+    keep = (sample_pos >= 0) & (id_pos >= 0)
+    sample_pos, id_pos = sample_pos[keep], id_pos[keep]
+    matrices = {}
+    for column in table.column_names:
+        if column in ("sample", "id"):
+            continue
+        matrix = np.full((len(ids), len(samples)), missing_value, dtype=np.float64)
+        matrix[id_pos, sample_pos] = _column_to_numpy(table, column)[keep]
+        matrices[column] = matrix
+    return list(samples), matrices
+
+
+def _arrow_wide_to_matrix(
+    table: "pa.Table", ids: pd.Index, samples: Optional[List[str]] = None, missing_value: float = np.nan
+) -> Tuple[List[str], np.ndarray]:
+    if samples is None:
+        samples = [c for c in table.column_names if c != "id"]
+    id_pos = ids.get_indexer(_column_to_numpy(table, "id"))
+    keep = id_pos >= 0
+    matrix = np.full((len(ids), len(samples)), missing_value, dtype=np.float64)
+    for i, sample in enumerate(samples):
+        matrix[id_pos[keep], i] = _column_to_numpy(table, sample)[keep]
+    return list(samples), matrix
+
+
+def dataset_from_arrow(
+    molecule_set: MoleculeSet,
+    tables: Dict[str, Union["pa.Table", Dict[str, "pa.Table"]]],
+    layout: str = "long",
+    samples: Optional[List[str]] = None,
+    missing_value: float = np.nan,
+) -> Dataset:
+    """Creates a dataset from Arrow tables as created by dataset_to_arrow.
+
+    Args:
+        molecule_set (MoleculeSet): The MoleculeSet the dataset is based on.
+        tables (Dict[str, Union[pa.Table, Dict[str, pa.Table]]]): In the long layout one table per molecule type,
+            in the wide layout a dictionary mapping value columns to tables for every molecule type.
+            Rows with ids not in the molecule set are ignored.
+        layout (str, optional): Either "long" or "wide". Defaults to "long".
+        samples (Optional[List[str]], optional): Samples to create. Defaults to all samples found in the tables.
+        missing_value (float, optional): Value used for missing values. Defaults to np.nan.
+
+    Returns:
+        Dataset: The created Dataset.
+    """
+    _check_layout(layout)
+    values = {}
+    sample_names = samples
+    for molecule, mol_tables in tables.items():
+        ids = molecule_set.molecules[molecule].index
+        if layout == "long":
+            mol_samples, values[molecule] = _arrow_long_to_matrices(
+                mol_tables, ids=ids, samples=sample_names, missing_value=missing_value
+            )
+        else:
+            values[molecule] = {}
+            for column, table in mol_tables.items():
+                mol_samples, values[molecule][column] = _arrow_wide_to_matrix(
+                    table, ids=ids, samples=sample_names, missing_value=missing_value
+                )
+        if sample_names is None:
+            sample_names = mol_samples
+    if sample_names is None:
+        sample_names = []
+    return Dataset.from_value_matrices(
+        molecule_set=molecule_set, sample_names=sample_names, values=values, missing_value=missing_value
+    )
+
+
+def _id_filters(columns: Iterable[str], molecule_ids: Dict[str, pd.Index]) -> Optional[List[Tuple]]:
+    filters = [(column, "in", list(molecule_ids[molecule])) for column, molecule in columns if molecule in molecule_ids]
+    return filters if filters else None
+
+
+def write_molecule_set_parquet(molecule_set: MoleculeSet, dir_path: Union[str, Path], overwrite: bool = False):
+    """Writes a MoleculeSet as one Parquet file per molecule type and mapping.
+
+    Args:
+        molecule_set (MoleculeSet): The MoleculeSet to write.
+        dir_path (Union[str, Path]): Directory to write to.
+        overwrite (bool, optional): Whether to overwrite existing files. Defaults to False.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dir_path = Path(dir_path)
+    if dir_path.exists():
+        if overwrite:
+            shutil.rmtree(dir_path)
+        else:
+            raise FileExistsError(f"{dir_path} already exists!")
+    (dir_path / "molecules").mkdir(parents=True)
+    (dir_path / "mappings").mkdir()
+    info = {"molecules": list(molecule_set.molecules.keys()), "mappings": {}}
+    for molecule, df in molecule_set.molecules.items():
+        _check_name(molecule)
+        table = pa.Table.from_pandas(df.rename_axis(index="id").reset_index(), preserve_index=False)
+        pq.write_table(table, dir_path / "molecules" / f"{molecule}.parquet")
+    for mapping_name, mapping in molecule_set.mappings.items():
+        _check_name(mapping_name)
+        index_names = list(mapping.df.index.names)
+        table = pa.Table.from_pandas(mapping.df.reset_index(), preserve_index=False)
+        pq.write_table(table, dir_path / "mappings" / f"{mapping_name}.parquet")
+        info["mappings"][mapping_name] = {
+            "mapping_molecules": list(mapping.mapping_molecules),
+            "index_names": index_names,
+        }
+    with open(dir_path / "molecule_set.json", "w") as f:
+        json.dump(info, f)
+
+
+def read_molecule_set_parquet(
+    dir_path: Union[str, Path], molecule_ids: Dict[str, Iterable] = {}
+) -> MoleculeSet:
+    """Reads a MoleculeSet written by write_molecule_set_parquet.
+
+    Args:
+        dir_path (Union[str, Path]): Directory the MoleculeSet was written to.
+        molecule_ids (Dict[str, Iterable], optional): Only load the given ids for these molecule types. The filter is pushed
+            down into the Parquet reader and also applied to all mappings involving the molecule types. Defaults to {}.
+
+    Returns:
+        MoleculeSet: The loaded MoleculeSet.
+    """
+    import pyarrow.parquet as pq
+
+    dir_path = Path(dir_path)
+    with open(dir_path / "molecule_set.json") as f:
+        info = json.load(f)
+    molecule_ids = {m: pd.Index(ids) for m, ids in molecule_ids.items()}
+    molecules = {}
+    for molecule in info["molecules"]:
+        table = pq.read_table(
+            dir_path / "molecules" / f"{molecule}.parquet", filters=_id_filters([("id", molecule)], molecule_ids)
+        )
+        molecules[molecule] = table.to_pandas().set_index("id")
+    mappings = {}
+    for mapping_name, mapping_info in info["mappings"].items():
+        index_names = mapping_info["index_names"]
+        table = pq.read_table(
+            dir_path / "mappings" / f"{mapping_name}.parquet",
+            filters=_id_filters(zip(index_names, mapping_info["mapping_molecules"]), molecule_ids),
+        )
+        mappings[mapping_name] = MoleculeMapping(
+            name=mapping_name,
+            df=table.to_pandas().set_index(index_names),
+            mapping_molecules=tuple(mapping_info["mapping_molecules"]),
+        )
+    return MoleculeSet(molecules=molecules, mappings=mappings)
+
+
+def write_parquet(
+    dataset: Dataset,
+    dir_path: Union[str, Path],
+    layout: str = "long",
+    molecules: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+    overwrite: bool = False,
+):
+    """Writes a dataset (molecule set, mappings and values) as Parquet files.
+
+    The long layout writes one file per molecule type (values/<molecule>.parquet), the wide layout one file per molecule
+    type and value column (values/<molecule>/<column>.parquet), see dataset_to_arrow for the table layouts.
+
+    Args:
+        dataset (Dataset): The dataset to write.
+        dir_path (Union[str, Path]): Directory to write to.
+        layout (str, optional): Either "long" or "wide". Defaults to "long".
+        molecules (Optional[List[str]], optional): Molecule types to write values for. Defaults to all molecule types.
+        columns (Optional[List[str]], optional): Value columns to write. Defaults to all value columns.
+        overwrite (bool, optional): Whether to overwrite existing files. Defaults to False.
+    """
+    import pyarrow.parquet as pq
+
+    _check_layout(layout)
+    dir_path = Path(dir_path)
+    dir_path.mkdir(parents=True, exist_ok=overwrite)
+    values_dir = dir_path / "values"
+    if values_dir.exists():
+        if overwrite:
+            shutil.rmtree(values_dir)
+        else:
+            raise FileExistsError(f"{values_dir} already exists")
+    values_dir.mkdir()
+    write_molecule_set_parquet(dataset.molecule_set, dir_path / "molecule_set", overwrite=overwrite)
+    if molecules is None:
+        molecules = list(dataset.molecules.keys())
+    info = {"missing_value": dataset.missing_value, "layout": layout, "samples": dataset.sample_names, "values": {}}
+    for molecule in molecules:
+        _check_name(molecule)
+        mol_columns = _dataset_columns(dataset, molecule) if columns is None else columns
+        info["values"][molecule] = mol_columns
+        if layout == "long":
+            table = dataset_to_arrow(dataset, molecule=molecule, columns=mol_columns, layout="long")
+            pq.write_table(table, values_dir / f"{molecule}.parquet")
+        else:
+            (values_dir / molecule).mkdir()
+            for column in mol_columns:
+                _check_name(column)
+                table = dataset_to_arrow(dataset, molecule=molecule, columns=column, layout="wide")
+                pq.write_table(table, values_dir / molecule / f"{column}.parquet")
+    with open(dir_path / "dataset_info.json", "w") as f:
+        json.dump(info, f)
+
+
+def read_parquet(
+    dir_path: Union[str, Path],
+    samples: Optional[List[str]] = None,
+    molecule_ids: Dict[str, Iterable] = {},
+    molecules: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> Dataset:
+    """Reads a dataset written by write_parquet.
+
+    Sample and molecule selections are pushed down into the Parquet reader, so only the required row groups and
+    columns are read from disk.
+
+    Args:
+        dir_path (Union[str, Path]): Directory the dataset was written to.
+        samples (Optional[List[str]], optional): Samples to load. Defaults to all samples.
+        molecule_ids (Dict[str, Iterable], optional): Only load the given ids for these molecule types
+            (also restricts the molecule set and its mappings). Defaults to {}.
+        molecules (Optional[List[str]], optional): Molecule types to load values for. Defaults to all written molecule types.
+        columns (Optional[List[str]], optional): Value columns to load. Defaults to all written value columns.
+
+    Returns:
+        Dataset: The loaded Dataset.
+    """
+    import pyarrow.parquet as pq
+
+    dir_path = Path(dir_path)
+    with open(dir_path / "dataset_info.json") as f:
+        info = json.load(f)
+    layout = info["layout"]
+    if samples is None:
+        samples = info["samples"]
+    else:
+        unknown = set(samples) - set(info["samples"])
+        if unknown:
+            raise KeyError(f"Samples {sorted(unknown)} are not part of the dataset.")
+    molecule_set = read_molecule_set_parquet(dir_path / "molecule_set", molecule_ids=molecule_ids)
+    molecule_ids = {m: pd.Index(ids) for m, ids in molecule_ids.items()}
+    if molecules is None:
+        molecules = list(info["values"].keys())
+    tables = {}
+    for molecule in molecules:
+        mol_columns = info["values"][molecule]
+        if columns is not None:
+            mol_columns = [c for c in mol_columns if c in columns]
+        id_filters = _id_filters([("id", molecule)], molecule_ids)
+        if layout == "long":
+            filters = [("sample", "in", list(samples))] + (id_filters or [])
+            tables[molecule] = pq.read_table(
+                dir_path / "values" / f"{molecule}.parquet", columns=["sample", "id"] + mol_columns, filters=filters
+            )
+        else:
+            tables[molecule] = {
+                column: pq.read_table(
+                    dir_path / "values" / molecule / f"{column}.parquet",
+                    columns=["id"] + list(samples),
+                    filters=id_filters,
+                )
+                for column in mol_columns
+            }
+    return dataset_from_arrow(
+        molecule_set=molecule_set,
+        tables=tables,
+        layout=layout,
+        samples=list(samples),
+        missing_value=info["missing_value"],
+    )
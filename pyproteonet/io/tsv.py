@@ -0,0 +1,174 @@
+from typing import BinaryIO, List, Optional, Union
+from pathlib import Path
+import gzip
+
+import numpy as np
+import pandas as pd
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+# scaled values below 2**50 are integers in float64 with enough headroom to round to the decimals reliably
+_MAX_EXACT_SCALED = 2**50
+_MAX_DIGITS = 16
+
+
+def _open_output(path: Path, compression: Optional[str] = None, compression_level: Optional[int] = None) -> BinaryIO:
+    if compression is None:
+        return open(path, "wb")
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6 if compression_level is None else compression_level)
+    if compression == "zstd":
+        import zstandard
+
+        level = 3 if compression_level is None else compression_level
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(path, "wb"), closefd=True)
+    raise ValueError(f"Unknown compression '{compression}', must be one of {list(COMPRESSION_SUFFIXES.keys())}.")
+
+
+def _quote(values: pd.Series) -> pd.Series:
+    # minimal quoting like csv.QUOTE_MINIMAL (and therefore pandas.to_csv)
+    needs_quotes = values.str.contains('[\t"\n\r]', regex=True)
+    if needs_quotes.any():
+        values = values.copy()
+        values[needs_quotes] = '"' + values[needs_quotes].str.replace('"', '""', regex=False) + '"'
+    return values
+
+
+def _format_text_column(values: pd.Series, na_rep: str) -> List[str]:
+    if pd.api.types.is_float_dtype(values.dtype):
+        chars = _format_float_chars(values.to_numpy(dtype=np.float64)[:, None], na_rep=na_rep)
+        return [line.decode() for line in _compact(chars).split(b"\n")[:-1]]
+    is_na = values.isna()
+    values = _quote(values.astype(str))
+    values[is_na] = na_rep
+    return values.tolist()
+
+
+def _format_float_chars(values: np.ndarray, na_rep: str, decimals: Optional[int] = None) -> np.ndarray:
+    """Formats a 2D float array into a (rows x columns x width) uint8 array of null padded characters."""
+    na_bytes = na_rep.encode()
+    if decimals is None:
+        # shortest representation that round trips (like repr and pandas.to_csv), formatted by numpy's casting loop
+        width = max(32, len(na_bytes))
+        formatted = values.astype(f"S{width}")
+        formatted[np.isnan(values)] = na_bytes
+        return formatted.view(np.uint8).reshape(values.shape + (width,))
+    if not 0 <= decimals <= 15:
+        raise ValueError("decimals must be between 0 and 15.")
+    scale = 10**decimals
+    is_na = np.isnan(values)
+    # values too large for integer arithmetic (and infinite values) are formatted one by one, so are exact ties after
+    # scaling since the tie might stem from the rounding of the multiplication (the product is rounded correctly,
+    # so all other values are rounded to the same decimals as by printf)
+    with np.errstate(invalid="ignore"):
+        scaled_abs = np.abs(values) * scale
+        fallback = ~is_na & ~(scaled_abs < _MAX_EXACT_SCALED)
+        fallback |= ~is_na & (scaled_abs - np.floor(scaled_abs) == 0.5)
+    scaled = np.round(scaled_abs)
+    fallback_strings = [f"{v:.{decimals}f}".encode() for v in values[fallback]]
+    width = max([1 + _MAX_DIGITS + 2, len(na_bytes)] + [len(f) for f in fallback_strings])
+    # characters are filled position by position (contiguous planes) and right aligned: [-][integer digits][.][decimals]
+    planes = np.zeros((width,) + values.shape, dtype=np.uint8)
+    scaled = np.where(is_na | fallback, 0, scaled).astype(np.int64)
+    pos = width - 1
+    for _ in range(decimals):
+        scaled, digit = np.divmod(scaled, 10)
+        planes[pos] = digit
+        planes[pos] += ord("0")
+        pos -= 1
+    if decimals > 0:
+        planes[pos] = ord(".")
+        pos -= 1
+    integer_start = np.full(values.shape, pos, dtype=np.int64)
+    scaled, digit = np.divmod(scaled, 10)
+    planes[pos] = digit
+    planes[pos] += ord("0")
+    for i in range(1, _MAX_DIGITS - decimals):
+        has_digit = scaled > 0
+        if not has_digit.any():
+            break
+        scaled, digit = np.divmod(scaled, 10)
+        planes[pos - i] = np.where(has_digit, digit + ord("0"), 0)
+        integer_start[has_digit] = pos - i
+    rows, cols = np.nonzero(np.signbit(values) & ~is_na)
+    planes[integer_start[rows, cols] - 1, rows, cols] = ord("-")
+    chars = np.moveaxis(planes, 0, -1)
+    chars[is_na] = np.frombuffer(na_bytes.rjust(width, b"\0"), dtype=np.uint8)
+    for r, c, string in zip(*np.nonzero(fallback), fallback_strings):
+        chars[r, c, :] = 0
+        chars[r, c, width - len(string) :] = np.frombuffer(string, dtype=np.uint8)
+    return chars
+
+
+def _compact(chars: np.ndarray, sep: bytes = b"\t", line_end: bytes = b"\n") -> bytes:
+    """Joins null padded field characters into TSV lines (without any python level loop over values)."""
+    num_rows, num_cols, _ = chars.shape
+    separators = np.full((num_rows, num_cols, 1), ord(sep), dtype=np.uint8)
+    separators[:, -1, 0] = ord(line_end)
+    chars = np.concatenate([chars, separators], axis=2)
+    return chars[chars != 0].tobytes()
+
+
+def _format_label_rows(labels: Optional[pd.DataFrame], na_rep: str) -> Optional[List[bytes]]:
+    if labels is None or labels.shape[1] == 0:
+        return None
+    columns = [_format_text_column(labels.iloc[:, i], na_rep=na_rep) for i in range(labels.shape[1])]
+    return ["\t".join(fields).encode() for fields in zip(*columns)]
+
+
+def write_value_tsv(
+    path: Union[str, Path],
+    values: np.ndarray,
+    sample_names: List[str],
+    row_labels: pd.DataFrame,
+    row_annotations: Optional[pd.DataFrame] = None,
+    na_rep: str = "NA",
+    decimals: Optional[int] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    chunksize: int = 2**20,
+):
+    """Writes a (molecule x sample) value matrix as wide TSV table.
+
+    Floats are formatted in vectorized chunks of rows instead of value by value, which is considerably faster than
+    pandas.to_csv for large matrices. The default output is identical to pandas.to_csv.
+
+    Args:
+        path (Union[str, Path]): File to write to.
+        values (np.ndarray): Matrix of shape (number of rows, number of samples).
+        sample_names (List[str]): Column names of the value matrix columns.
+        row_labels (pd.DataFrame): Columns written in front of the values for every row (e.g. molecule ids), the column
+            names are used as header.
+        row_annotations (Optional[pd.DataFrame], optional): Columns written after the values for every row. Defaults to None.
+        na_rep (str, optional): Representation of missing values. Defaults to "NA".
+        decimals (Optional[int], optional): If given floats are written with this fixed number of decimals, which allows
+            formatting them with integer arithmetic and is several times faster (same output as "%.<decimals>f").
+            Defaults to None (shortest exact representation).
+        compression (Optional[str], optional): None, "gzip" or "zstd". "zstd" requires the zstandard package, which is
+            installed with the zstd extra (pip install pyproteonet[zstd]). Defaults to None.
+        compression_level (Optional[int], optional): Compression level. Defaults to the library's default.
+        chunksize (int, optional): Approximate number of values formatted at once. Defaults to 2**20.
+    """
+    num_rows = values.shape[0]
+    for labels in [row_labels, row_annotations]:
+        if labels is not None and labels.shape[0] != num_rows:
+            raise ValueError("The number of row labels does not match the number of rows of the value matrix.")
+    header = list(row_labels.columns) + list(sample_names)
+    if row_annotations is not None:
+        header += list(row_annotations.columns)
+    header = _format_text_column(pd.Series(header, dtype=object), na_rep=na_rep)
+    prefixes = _format_label_rows(row_labels, na_rep=na_rep)
+    suffixes = _format_label_rows(row_annotations, na_rep=na_rep)
+    rows_per_chunk = max(1, chunksize // max(1, values.shape[1]))
+    with _open_output(Path(path), compression=compression, compression_level=compression_level) as out:
+        out.write(("\t".join(header) + "\n").encode())
+        for start in range(0, num_rows, rows_per_chunk):
+            end = min(num_rows, start + rows_per_chunk)
+            fields = []
+            if prefixes is not None:
+                fields.append(prefixes[start:end])
+            if values.shape[1] > 0:
+                chars = _format_float_chars(values[start:end], na_rep=na_rep, decimals=decimals)
+                fields.append(_compact(chars)[:-1].split(b"\n"))
+            if suffixes is not None:
+                fields.append(suffixes[start:end])
+            out.write(b"".join([b"\t".join(row) + b"\n" for row in zip(*fields)]))
@@ -0,0 +1,151 @@
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..data.dataset import Dataset
+from ..metrics.masked_metrics import RunningMetrics
+from ..simulation.utils import get_numpy_random_generator
+from ..utils.numpy import eq_nan
+
+
+def non_missing_replicate_masks(
+    dataset: Dataset,
+    molecule: str,
+    column: str,
+    frac: float,
+    num_replicates: int,
+    random_seed: Optional[Union[int, np.random.Generator]] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Draws random masks of non-missing values, one per replicate.
+
+    Like masking.missing_values.mask_non_missing a fraction of the non-missing values of every sample is masked.
+    Masks are yielded as (molecule positions, sample positions) of the masked cells within the (molecule x sample)
+    value matrix, so no mask frame is created per replicate.
+
+    Args:
+        dataset (Dataset): The dataset to mask.
+        molecule (str): The molecule type to mask.
+        column (str): The value column whose non-missing values are masked.
+        frac (float): Fraction of non-missing values to mask per sample.
+        num_replicates (int): Number of masks to draw.
+        random_seed (Optional[Union[int, np.random.Generator]], optional): Seed or generator for the random draws. Defaults to None.
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: Molecule positions and sample positions of the masked cells.
+    """
+    rng = get_numpy_random_generator(seed=random_seed)
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=[column])[0]
+    # column major so that cells of the same sample are contiguous
+    sample_pos, mol_pos = np.nonzero(~eq_nan(values.T, dataset.missing_value))
+    per_sample = np.bincount(sample_pos, minlength=values.shape[1])
+    num_masked = np.round(per_sample * frac).astype(int)
+    group_start = np.concatenate([[0], np.cumsum(per_sample)[:-1]])
+    for _ in range(num_replicates):
+        keys = rng.random(mol_pos.shape[0])
+        order = np.lexsort((keys, sample_pos))
+        rank = np.arange(order.shape[0]) - group_start[sample_pos[order]]
+        selected = order[rank < num_masked[sample_pos[order]]]
+        yield mol_pos[selected], sample_pos[selected]
+
+
+def _predictions_at(
+    prediction: Union[pd.Series, pd.DataFrame],
+    dataset: Dataset,
+    molecule: str,
+    mol_pos: np.ndarray,
+    sample_pos: np.ndarray,
+) -> np.ndarray:
+    mol_ids = dataset.molecules[molecule].index
+    samples = pd.Index(dataset.sample_names)
+    if isinstance(prediction, pd.DataFrame):
+        rows = prediction.index.get_indexer(mol_ids[mol_pos])
+        cols = prediction.columns.get_indexer(samples[sample_pos])
+        res = np.full(mol_pos.shape[0], np.nan)
+        found = (rows >= 0) & (cols >= 0)
+        res[found] = prediction.to_numpy()[rows[found], cols[found]]
+        return res
+    index = pd.MultiIndex.from_arrays([samples[sample_pos], mol_ids[mol_pos]], names=["sample", "id"])
+    return prediction.reorder_levels(["sample", "id"]).reindex(index).to_numpy(dtype=np.float64)
+
+
+def evaluate_masked_replicates(
+    dataset: Dataset,
+    molecule: str,
+    column: str,
+    impute_fn: Callable[..., Union[pd.Series, pd.DataFrame]],
+    num_replicates: int,
+    frac: float = 0.1,
+    ground_truth_column: Optional[str] = None,
+    logarithmize: bool = True,
+    per_replicate: bool = True,
+    random_seed: Optional[Union[int, np.random.Generator]] = None,
+) -> pd.DataFrame:
+    """Evaluates an imputation method on many random masks of non-missing values without copying the dataset.
+
+    For every replicate a fraction of non-missing values is set to missing in place, the imputation function is run on the
+    dataset and its predictions for the masked cells are compared to the original (or ground truth) values. Afterwards the
+    original values are restored. Metrics are accumulated with running sums, so per replicate only the mask positions,
+    the masked values and the predictions for them are kept.
+
+    Args:
+        dataset (Dataset): The dataset to evaluate on. Values are temporarily modified and restored afterwards.
+        molecule (str): The molecule type to mask and impute.
+        column (str): The value column to mask and impute.
+        impute_fn (Callable[..., Union[pd.Series, pd.DataFrame]]): Imputation function called as impute_fn(dataset=dataset, molecule=molecule, column=column),
+            e.g. one of the functions from the imputation package. Must either return a Series with a (sample, id) MultiIndex or a (molecule x sample) matrix.
+        num_replicates (int): Number of random masks to evaluate.
+        frac (float, optional): Fraction of non-missing values masked per sample. Defaults to 0.1.
+        ground_truth_column (Optional[str], optional): Column to compare against. Defaults to the masked values of the column itself.
+        logarithmize (bool, optional): Whether to logarithmize values before comparison. Defaults to True.
+        per_replicate (bool, optional): Whether to return metrics per replicate or only pooled over all replicates. Defaults to True.
+        random_seed (Optional[Union[int, np.random.Generator]], optional): Seed or generator for drawing the masks. Defaults to None.
+
+    Returns:
+        pd.DataFrame: count, pearsonr, mse, mae and rmse per replicate (or one row pooled over all replicates).
+    """
+    samples = dataset.sample_names
+    pooled = RunningMetrics()
+    res = []
+    masks = non_missing_replicate_masks(
+        dataset=dataset, molecule=molecule, column=column, frac=frac, num_replicates=num_replicates, random_seed=random_seed
+    )
+    for replicate, (mol_pos, sample_pos) in enumerate(masks):
+        order = np.argsort(sample_pos, kind="stable")
+        mol_pos, sample_pos = mol_pos[order], sample_pos[order]
+        sample_ids, starts, counts = np.unique(sample_pos, return_index=True, return_counts=True)
+        sample_groups = [(j, slice(start, start + count)) for j, start, count in zip(sample_ids, starts, counts)]
+        original = np.empty(mol_pos.shape[0])
+        try:
+            for j, cells in sample_groups:
+                values = dataset[samples[j]].values[molecule]
+                col_pos = values.columns.get_loc(column)
+                original[cells] = values.iloc[mol_pos[cells], col_pos].to_numpy()
+                values.iloc[mol_pos[cells], col_pos] = dataset.missing_value
+            prediction = impute_fn(dataset=dataset, molecule=molecule, column=column)
+        finally:
+            for j, cells in sample_groups:
+                values = dataset[samples[j]].values[molecule]
+                values.iloc[mol_pos[cells], values.columns.get_loc(column)] = original[cells]
+        prediction = _predictions_at(
+            prediction=prediction, dataset=dataset, molecule=molecule, mol_pos=mol_pos, sample_pos=sample_pos
+        )
+        ground_truth = original
+        if ground_truth_column is not None:
+            ground_truth = np.empty(mol_pos.shape[0])
+            for j, cells in sample_groups:
+                values = dataset[samples[j]].values[molecule]
+                ground_truth[cells] = values.iloc[mol_pos[cells], values.columns.get_loc(ground_truth_column)].to_numpy()
+        missing = eq_nan(prediction, dataset.missing_value) | eq_nan(ground_truth, dataset.missing_value)
+        if logarithmize:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                prediction, ground_truth = np.log(prediction), np.log(ground_truth)
+        # predictions not found in the imputation result are NaN
+        valid = ~(missing | np.isnan(prediction) | np.isnan(ground_truth))
+        replicate_metrics = RunningMetrics().update(ground_truth=ground_truth[valid], prediction=prediction[valid])
+        pooled.merge(replicate_metrics)
+        if per_replicate:
+            res.append({"replicate": replicate, **replicate_metrics.result()})
+    if not per_replicate:
+        res.append(pooled.result())
+    return pd.DataFrame(res)
@@ -5,6 +5,7 @@ import pandas as pd
 from scipy.stats import pearsonr, spearmanr
 
 from ..data.dataset import Dataset
+from .masked_metrics import MASKED_METRICS, compute_masked_metrics
 
 
 def _get_metric_from_str(metric: str):
@@ -39,6 +40,24 @@ def _compare_columns_single_dataset(
     return_counts: bool = False,
     replace_nan_metric_with: Optional[float] = None
 ) -> Dict[str, float]:
+    if isinstance(metric, str) and metric.lower() in MASKED_METRICS:
+        res, counts = _compare_columns_single_dataset_masked(
+            dataset=dataset,
+            molecule=molecule,
+            columns=columns,
+            comparison_column=comparison_column,
+            ids=ids,
+            metrics=[metric],
+            ignore_missing=ignore_missing,
+            logarithmize=logarithmize,
+            per_sample=per_sample,
+            replace_nan_metric_with=replace_nan_metric_with,
+        )
+        res = {c: met[metric.lower()] for c, met in res.items()}
+        if return_counts:
+            return res, counts
+        else:
+            return res
     if isinstance(metric, str):
         metric = _get_metric_from_str(metric)
     val = dataset.get_values_flat(molecule=molecule, columns=columns)
@@ -101,6 +120,130 @@ def _compare_columns_single_dataset(
         return res
 
 
+def _ids_to_selection(dataset: Dataset, molecule: str, ids: pd.Index, samples: List[str]) -> np.ndarray:
+    mol_ids = dataset.molecules[molecule].index
+    selection = np.zeros((len(mol_ids), len(samples)), dtype=bool)
+    if "sample" not in ids.names:
+        assert len(ids.names) == 1
+        selection[mol_ids.isin(ids), :] = True
+    else:
+        id_level = [n for n in ids.names if n != "sample"]
+        assert len(id_level) == 1
+        rows = mol_ids.get_indexer(ids.get_level_values(id_level[0]))
+        cols = pd.Index(samples).get_indexer(ids.get_level_values("sample"))
+        found = (rows >= 0) & (cols >= 0)
+        selection[rows[found], cols[found]] = True
+    return selection
+
+
+def _compare_columns_single_dataset_masked(
+    dataset: Dataset,
+    molecule: str,
+    columns: List[str],
+    comparison_column: str,
+    ids: Optional[pd.Index] = None,
+    metrics: List[str] = list(MASKED_METRICS),
+    ignore_missing: bool = True,
+    logarithmize: bool = True,
+    per_sample: bool = False,
+    replace_nan_metric_with: Optional[float] = None,
+):
+    # Same semantics as _compare_columns_single_dataset but works on the aligned (molecule x sample) matrices
+    # and computes all metrics for all columns with batched masked reductions.
+    samples = dataset.sample_names
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=list(columns) + [comparison_column])
+    values, gt = values[:-1], values[-1]
+    selection = np.ones(gt.shape, dtype=bool)
+    if ids is not None:
+        selection = _ids_to_selection(dataset=dataset, molecule=molecule, ids=ids, samples=samples)
+        if not selection.any():
+            raise ValueError("No values for comparison for the given ids")
+    gt_missing = np.isnan(gt) & selection
+    val_missing = np.isnan(values) & selection
+    if not ignore_missing and (val_missing.any() or gt_missing.any()):
+        missing_value_columns = [c for c, vm in zip(columns, val_missing) if vm.any()]
+        if len(missing_value_columns):
+            raise ValueError(f"There are value columns with missing values: {missing_value_columns}")
+        raise ValueError(f"The ground truth column {comparison_column} has missing values")
+    mask = selection & ~val_missing & ~gt_missing
+    if logarithmize:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values, gt = np.log(values), np.log(gt)
+    metric_vals, counts = compute_masked_metrics(
+        values=values, ground_truth=gt, mask=mask, metrics=metrics, per_sample=per_sample
+    )
+    if replace_nan_metric_with is not None and per_sample:
+        for met in metric_vals.values():
+            met[np.isnan(met)] = replace_nan_metric_with
+    res, cnts = {}, {}
+    for i, c in enumerate(columns):
+        if per_sample:
+            # like a groupby over the flat values, samples are sorted and samples without values are left out
+            sample_order = [(s, j) for s, j in sorted(zip(samples, range(len(samples)))) if counts[i, j] > 0]
+            res[c] = {m: {s: np.array([met[i, j]]) for s, j in sample_order} for m, met in metric_vals.items()}
+            cnts[c] = {s: int(counts[i, j]) for s, j in sample_order}
+        else:
+            res[c] = {m: [met[i]] for m, met in metric_vals.items()}
+            cnts[c] = int(counts[i])
+    return res, cnts
+
+
+def compare_columns_all_metrics(
+    dataset: Union[Dataset, List[Dataset]],
+    molecule: str,
+    columns: List[str],
+    comparison_column: str,
+    ids: Optional[pd.Index] = None,
+    metrics: List[Literal['PearsonR', 'SpearmanR', 'MSE', 'MAE', 'RMSE']] = ['PearsonR', 'SpearmanR', 'MSE', 'MAE', 'RMSE'],
+    ignore_missing: bool = True,
+    logarithmize: bool = True,
+    per_sample: bool = False,
+    replace_nan_metric_with: Optional[float] = None
+) -> pd.DataFrame:
+    """Compares several columns against a ground truth column computing several metrics in one pass.
+
+    Values of all columns are extracted once as aligned (molecule x sample) matrices and all metrics are
+    computed with batched masked reductions instead of per column and per sample SciPy calls.
+
+    Args:
+        dataset (Union[Dataset, List[Dataset]]): Dataset or list of datasets to evaluate.
+        molecule (str): The molecule type to compare values for.
+        columns (List[str]): The value columns to compare.
+        comparison_column (str): The ground truth column.
+        ids (Optional[pd.Index], optional): If given only those molecule ids (or (sample, id) pairs) are compared. Defaults to None.
+        metrics (List[str], optional): Metrics to compute. Defaults to all supported metrics.
+        ignore_missing (bool, optional): Whether to skip missing values or raise an error. Defaults to True.
+        logarithmize (bool, optional): Whether to logarithmize values before comparison. Defaults to True.
+        per_sample (bool, optional): Whether to compute metrics per sample. Defaults to False.
+        replace_nan_metric_with (Optional[float], optional): Replacement for NaN metric values when computing per sample. Defaults to None.
+
+    Returns:
+        pd.DataFrame: One row per column (and sample) with one column per metric, the number of compared values
+            and the dataset index if a list of datasets was given.
+    """
+    if isinstance(dataset, Dataset):
+        dataset = [dataset]
+    res_dfs = []
+    for i_ds, ds in enumerate(dataset):
+        metric_vals, counts = _compare_columns_single_dataset_masked(dataset=ds, molecule=molecule, columns=columns,
+                                                                     comparison_column=comparison_column, ids=ids, metrics=metrics,
+                                                                     ignore_missing=ignore_missing, logarithmize=logarithmize,
+                                                                     per_sample=per_sample, replace_nan_metric_with=replace_nan_metric_with)
+        for col, met in metric_vals.items():
+            if per_sample:
+                col_df = pd.DataFrame({m: np.concatenate(list(v.values())) if len(v) else [] for m, v in met.items()})
+                col_df.insert(0, 'sample', list(counts[col].keys()))
+                col_df['count'] = list(counts[col].values())
+            else:
+                col_df = pd.DataFrame(met)
+                col_df['count'] = counts[col]
+            col_df['column'] = col
+            if len(dataset) > 1:
+                col_df['dataset'] = i_ds
+            res_dfs.append(col_df)
+    return pd.concat(res_dfs, ignore_index=True)
+
+
 #TODO: write docstring
 def compare_columns(
     dataset: Union[Dataset, List[Dataset]],
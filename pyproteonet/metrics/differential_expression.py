@@ -1,49 +1,138 @@
-from typing import Union, List
+from typing import Union, List, Dict, Tuple, Hashable
 import math
+import warnings
 
 import numpy as np
 import pandas as pd
-from scipy.stats import ttest_ind
-from statsmodels.stats.multitest import multipletests
+from scipy.stats import t as t_distribution
 
 from ..data.dataset import Dataset
 
+
+def _benjamini_hochberg(pvalues: np.ndarray) -> np.ndarray:
+    # BH adjusted p-values along the last axis (equivalent to statsmodels' multipletests(method='fdr_bh'))
+    n = pvalues.shape[-1]
+    order = np.argsort(pvalues, axis=-1)
+    sorted_p = np.take_along_axis(pvalues, order, axis=-1)
+    adjusted = sorted_p * n / np.arange(1, n + 1)
+    adjusted = np.minimum.accumulate(adjusted[..., ::-1], axis=-1)[..., ::-1]
+    adjusted = np.minimum(adjusted, 1.0)
+    res = np.empty_like(adjusted)
+    np.put_along_axis(res, order, adjusted, axis=-1)
+    return res
+
+
+class _GroupStatistics:
+    # per sample group sufficient statistics of the log2 values, computed once and shared between contrasts
+    def __init__(self, log_values: np.ndarray, values: np.ndarray):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            self.n = (~np.isnan(log_values)).sum(axis=-1)
+            self.mean = np.nanmean(log_values, axis=-1)
+            self.var = np.nanvar(log_values, axis=-1, ddof=1)
+            self.median = np.nanmedian(values, axis=-1)
+
+
+def find_des_contrasts(
+    dataset: Dataset,
+    molecule: str,
+    columns: Union[str, List[str]],
+    contrasts: Dict[Hashable, Tuple[List[str], List[str]]],
+    max_pvalue: float = 0.05,
+    min_fc: float = 2,
+    is_log: bool = False,
+    equal_var: bool = False,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Finds differentially expressed molecules for many contrasts and value columns at once.
+
+    Values are extracted once for all columns. Means, variances and medians of every sample group are computed once
+    and shared between contrasts, t-tests and Benjamini-Hochberg correction are vectorized over the whole
+    contrast x column grid. Molecules with (almost) zero variance in one of the groups are not tested and get a p-value of 1.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to test.
+        columns (Union[str, List[str]]): The value column(s) to test.
+        contrasts (Dict[Hashable, Tuple[List[str], List[str]]]): Mapping from contrast name to (numerator samples, denominator samples).
+        max_pvalue (float, optional): Maximum BH adjusted p-value for a molecule to be called differentially expressed. Defaults to 0.05.
+        min_fc (float, optional): Minimum fold change (in either direction) for a molecule to be called differentially expressed. Defaults to 2.
+        is_log (bool, optional): Whether the values are logarithmized (natural logarithm). Defaults to False.
+        equal_var (bool, optional): Whether to use Student's t-test assuming equal variances instead of Welch's t-test. Defaults to False.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: Differential expression calls, adjusted p-values and fold changes (ratio of group medians).
+            Every frame has a ("contrast", "id") MultiIndex and one column per value column.
+    """
+    if isinstance(columns, str):
+        columns = [columns]
+    mol_ids = dataset.molecules[molecule].index
+    samples = dataset.sample_names
+    sample_pos = {s: i for i, s in enumerate(samples)}
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=columns, samples=samples)
+    if is_log:
+        values = math.e**values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_values = np.log2(values)
+    eps = np.finfo(float).eps
+    group_stats: Dict[Tuple[int, ...], _GroupStatistics] = {}
+
+    def get_group_statistics(group: List[str]) -> _GroupStatistics:
+        key = tuple(sample_pos[s] for s in group)
+        if key not in group_stats:
+            group_stats[key] = _GroupStatistics(log_values=log_values[:, :, key], values=values[:, :, key])
+        return group_stats[key]
+
+    numerators, denominators = [], []
+    for numerator_samples, denominator_samples in contrasts.values():
+        numerators.append(get_group_statistics(numerator_samples))
+        denominators.append(get_group_statistics(denominator_samples))
+    # arrays of shape (contrasts, columns, molecules)
+    n1, n2 = np.stack([g.n for g in numerators]), np.stack([g.n for g in denominators])
+    mean1, mean2 = np.stack([g.mean for g in numerators]), np.stack([g.mean for g in denominators])
+    var1, var2 = np.stack([g.var for g in numerators]), np.stack([g.var for g in denominators])
+    tested = (var1 > eps) & (var2 > eps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if equal_var:
+            dof = n1 + n2 - 2
+            pooled_var = ((n1 - 1) * var1 + (n2 - 1) * var2) / dof
+            t = (mean1 - mean2) / np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+        else:
+            se1, se2 = var1 / n1, var2 / n2
+            dof = (se1 + se2) ** 2 / (se1**2 / (n1 - 1) + se2**2 / (n2 - 1))
+            t = (mean1 - mean2) / np.sqrt(se1 + se2)
+        pvalues = np.ones(t.shape)
+        pvalues[tested] = 2 * t_distribution.sf(np.abs(t[tested]), dof[tested])
+        pvalues[np.isnan(pvalues)] = 1.0
+        pvalues = _benjamini_hochberg(pvalues)
+        fcs = np.stack([g.median for g in numerators]) / np.stack([g.median for g in denominators])
+        des = (pvalues <= max_pvalue) & (np.abs(np.log(fcs)) > np.log(min_fc))
+    index = pd.MultiIndex.from_product([list(contrasts.keys()), mol_ids], names=["contrast", "id"])
+
+    def to_frame(arr: np.ndarray) -> pd.DataFrame:
+        # (contrasts, columns, molecules) -> rows ordered by contrast, molecule
+        return pd.DataFrame(arr.transpose(0, 2, 1).reshape(-1, len(columns)), index=index, columns=columns)
+
+    return to_frame(des), to_frame(pvalues), to_frame(fcs)
+
+
 #TODO: add docstrings
 def find_des(dataset: Dataset, molecule:str, columns: Union[str, List[str]],
              nominator_samples: List[str], denominator_samples: List[str],
              max_pvalue=0.05, min_fc=2, is_log: bool = False):
-    if isinstance(columns, str):
-        columns = [columns]
-    des = pd.DataFrame(index=dataset.molecules[molecule].index)
-    pvalues_mat = pd.DataFrame(index=dataset.molecules[molecule].index)
-    fcs = pd.DataFrame(index=dataset.molecules[molecule].index)
-    for c in columns:
-        mat = dataset.get_samples_value_matrix(molecule=molecule, column=c)
-        if is_log:
-            mat = math.e**mat
-        log_mat = np.log2(mat)
-        eps = np.finfo(np.finfo(float).eps).eps
-        mask = (log_mat[nominator_samples].var(axis=1) > eps) & (log_mat[denominator_samples].var(axis=1) > eps)
-        test_mat = log_mat.loc[mask, :]
-        test_res = ttest_ind(test_mat[nominator_samples].to_numpy(), test_mat[denominator_samples].to_numpy(), axis=1, nan_policy='omit')
-        pvalues = pd.Series(1.0, index=mat.index)
-        pvalues.loc[mask] = test_res.pvalue
-        correction_res = multipletests(pvals=pvalues, alpha=max_pvalue, method='fdr_bh')
-        des[c] = correction_res[0]
-        pvalues_mat[c] = correction_res[1]
-        fc = mat[nominator_samples].median(axis=1).to_numpy() / mat[denominator_samples].median(axis=1).to_numpy()
-        des[c] = des[c] & np.abs(np.log(fc)) > np.log(min_fc)
-        fcs[c] = fc
-    return des, pvalues_mat, fcs
+    des, pvalues, fcs = find_des_contrasts(
+        dataset=dataset,
+        molecule=molecule,
+        columns=columns,
+        contrasts={0: (nominator_samples, denominator_samples)},
+        max_pvalue=max_pvalue,
+        min_fc=min_fc,
+        is_log=is_log,
+        equal_var=True,
+    )
+    return des.loc[0], pvalues.loc[0], fcs.loc[0]
 
 
-#TODO: add docstrings
-def evaluate_des(dataset: Dataset, molecule: str, columns: Union[str, List[str]], numerator_samples: List[str], 
-                 denominator_samples: List[str], gt_fc: pd.Series, min_fc: float = 1.5, max_pvalue: float = 0.05,
-                 is_log: bool = False, absolute_metrics: bool = False)->pd.DataFrame:
-    des, pvalues, fc = find_des(dataset=dataset, molecule=molecule, columns=columns,
-                                nominator_samples=numerator_samples, denominator_samples=denominator_samples,
-                                min_fc=min_fc, max_pvalue=max_pvalue, is_log=is_log)
+def _evaluate_de_calls(des: pd.DataFrame, fc: pd.DataFrame, gt_fc: pd.Series, min_fc: float, absolute_metrics: bool) -> pd.DataFrame:
     gt_fc = pd.DataFrame(index=gt_fc.index, data=np.stack([gt_fc.values]*fc.shape[1], axis=1), columns=fc.columns)
     gt_de = (gt_fc > min_fc) | (gt_fc < 1/min_fc)
     correct_higher = (gt_fc > min_fc) & (fc > min_fc)
@@ -52,8 +141,8 @@ def evaluate_des(dataset: Dataset, molecule: str, columns: Union[str, List[str]]
     correctly_not_found = (~des) & (~gt_de)
     if absolute_metrics:
         prec_rec_eval = pd.DataFrame({'Correct DE':correctly_found.sum()})
-        prec_rec_eval['Correct no DE'] = correctly_not_found.sum() 
-        prec_rec_eval['Correctly Classified'] = (gt_de == des).sum() 
+        prec_rec_eval['Correct no DE'] = correctly_not_found.sum()
+        prec_rec_eval['Correctly Classified'] = (gt_de == des).sum()
         prec_rec_eval['False Positives'] = (des & (~gt_de)).sum()
     else:
         prec_rec_eval = pd.DataFrame({'Recall':correctly_found.sum() / gt_de.sum()})
@@ -62,4 +151,63 @@ def evaluate_des(dataset: Dataset, molecule: str, columns: Union[str, List[str]]
         prec_rec_eval['Accuracy'] = (gt_de == des).sum() / gt_de.count()
         prec_rec_eval['FP Rate'] = (des & (~gt_de)).sum() / (~gt_de).sum()
         prec_rec_eval['F1 Score'] = 2 * prec_rec_eval['Precision'] * prec_rec_eval['Recall'] / (prec_rec_eval['Precision'] + prec_rec_eval['Recall'])
-    return prec_rec_eval
\ No newline at end of file
+    return prec_rec_eval
+
+
+#TODO: add docstrings
+def evaluate_des(dataset: Dataset, molecule: str, columns: Union[str, List[str]], numerator_samples: List[str],
+                 denominator_samples: List[str], gt_fc: pd.Series, min_fc: float = 1.5, max_pvalue: float = 0.05,
+                 is_log: bool = False, absolute_metrics: bool = False)->pd.DataFrame:
+    des, pvalues, fc = find_des(dataset=dataset, molecule=molecule, columns=columns,
+                                nominator_samples=numerator_samples, denominator_samples=denominator_samples,
+                                min_fc=min_fc, max_pvalue=max_pvalue, is_log=is_log)
+    return _evaluate_de_calls(des=des, fc=fc, gt_fc=gt_fc, min_fc=min_fc, absolute_metrics=absolute_metrics)
+
+
+def evaluate_des_contrasts(
+    dataset: Dataset,
+    molecule: str,
+    columns: Union[str, List[str]],
+    contrasts: Dict[Hashable, Tuple[List[str], List[str]]],
+    gt_fcs: Dict[Hashable, pd.Series],
+    min_fc: float = 1.5,
+    max_pvalue: float = 0.05,
+    is_log: bool = False,
+    absolute_metrics: bool = False,
+    equal_var: bool = True,
+) -> pd.DataFrame:
+    """Evaluates differential expression calls for many contrasts and value columns against ground truth fold changes.
+
+    All contrasts are tested in one batch with find_des_contrasts, afterwards every contrast is evaluated like in evaluate_des.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to test.
+        columns (Union[str, List[str]]): The value column(s) to evaluate.
+        contrasts (Dict[Hashable, Tuple[List[str], List[str]]]): Mapping from contrast name to (numerator samples, denominator samples).
+        gt_fcs (Dict[Hashable, pd.Series]): Ground truth fold change per molecule for every contrast.
+        min_fc (float, optional): Minimum fold change for a molecule to be considered differentially expressed. Defaults to 1.5.
+        max_pvalue (float, optional): Maximum BH adjusted p-value. Defaults to 0.05.
+        is_log (bool, optional): Whether the values are logarithmized (natural logarithm). Defaults to False.
+        absolute_metrics (bool, optional): Whether to return absolute counts instead of rates. Defaults to False.
+        equal_var (bool, optional): Whether to use Student's instead of Welch's t-test, defaults to True like evaluate_des.
+
+    Returns:
+        pd.DataFrame: Evaluation metrics with a ("contrast", "column") MultiIndex.
+    """
+    des, pvalues, fc = find_des_contrasts(
+        dataset=dataset,
+        molecule=molecule,
+        columns=columns,
+        contrasts=contrasts,
+        max_pvalue=max_pvalue,
+        min_fc=min_fc,
+        is_log=is_log,
+        equal_var=equal_var,
+    )
+    res = {}
+    for contrast in contrasts.keys():
+        res[contrast] = _evaluate_de_calls(
+            des=des.loc[contrast], fc=fc.loc[contrast], gt_fc=gt_fcs[contrast], min_fc=min_fc, absolute_metrics=absolute_metrics
+        )
+    return pd.concat(res, names=["contrast", "column"])
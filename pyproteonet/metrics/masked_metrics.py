@@ -0,0 +1,150 @@
+from typing import Dict, List, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+MASKED_METRICS = ("pearsonr", "spearmanr", "mse", "mae", "rmse")
+
+
+def _masked_mean(x: np.ndarray, mask: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(mask, x, 0).sum(axis=1) / counts
+
+
+def _masked_pearsonr(a: np.ndarray, b: np.ndarray, mask: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    mean_a = _masked_mean(a, mask, counts)
+    mean_b = _masked_mean(b, mask, counts)
+    da = np.where(mask, a - mean_a[:, np.newaxis, :], 0)
+    db = np.where(mask, b - mean_b[:, np.newaxis, :], 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = (da * db).sum(axis=1) / np.sqrt((da**2).sum(axis=1) * (db**2).sum(axis=1))
+    r[counts < 2] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _masked_rank(x: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # ranks every (column, sample) slice along the molecule axis, ties get their average rank like in scipy.stats.spearmanr
+    n_columns, n_molecules, n_samples = x.shape
+    flat = np.where(mask, x, np.nan).transpose(1, 0, 2).reshape(n_molecules, n_columns * n_samples)
+    ranks = pd.DataFrame(flat).rank(axis=0, method="average", na_option="keep").to_numpy()
+    return ranks.reshape(n_molecules, n_columns, n_samples).transpose(1, 0, 2)
+
+
+def compute_masked_metrics(
+    values: np.ndarray,
+    ground_truth: np.ndarray,
+    mask: np.ndarray,
+    metrics: Iterable[str] = MASKED_METRICS,
+    per_sample: bool = False,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Computes several comparison metrics for many value columns at once using masked reductions.
+
+    Args:
+        values (np.ndarray): Values to compare, array of shape (columns, molecules, samples).
+        ground_truth (np.ndarray): Ground truth values, array of shape (molecules, samples).
+        mask (np.ndarray): Boolean array of shape (columns, molecules, samples), only entries set to True are compared.
+        metrics (Iterable[str], optional): Metrics to compute, any of "PearsonR", "SpearmanR", "MSE", "MAE", "RMSE" (case insensitive).
+            Defaults to all of them.
+        per_sample (bool, optional): Whether to compute metrics per sample or across all samples. Defaults to False.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], np.ndarray]: Dictionary mapping the lower case metric name to the metric values
+            and the number of compared values. Arrays have shape (columns, samples) if per_sample is set, otherwise (columns,).
+            Metrics with fewer than two compared values (one for the error metrics) are NaN.
+    """
+    metrics = [m.lower() for m in metrics]
+    for m in metrics:
+        if m not in MASKED_METRICS:
+            raise AttributeError(f"Metric {m} not found!")
+    values = np.asarray(values, dtype=np.float64)
+    ground_truth = np.broadcast_to(np.asarray(ground_truth, dtype=np.float64), values.shape)
+    mask = np.asarray(mask, dtype=bool)
+    if not per_sample:
+        n_columns = values.shape[0]
+        values = values.reshape(n_columns, -1, 1)
+        ground_truth = ground_truth.reshape(n_columns, -1, 1)
+        mask = mask.reshape(n_columns, -1, 1)
+    counts = mask.sum(axis=1)
+    res = {}
+    if {"mse", "rmse", "mae"}.intersection(metrics):
+        diff = values - ground_truth
+        if "mse" in metrics or "rmse" in metrics:
+            mse = _masked_mean(diff**2, mask, counts)
+            if "mse" in metrics:
+                res["mse"] = mse
+            if "rmse" in metrics:
+                res["rmse"] = np.sqrt(mse)
+        if "mae" in metrics:
+            res["mae"] = _masked_mean(np.abs(diff), mask, counts)
+    if "pearsonr" in metrics:
+        res["pearsonr"] = _masked_pearsonr(ground_truth, values, mask, counts)
+    if "spearmanr" in metrics:
+        res["spearmanr"] = _masked_pearsonr(
+            _masked_rank(ground_truth, mask), _masked_rank(values, mask), mask, counts
+        )
+    if not per_sample:
+        res = {m: r[:, 0] for m, r in res.items()}
+        counts = counts[:, 0]
+    return {m: res[m] for m in metrics}, counts
+
+
+class RunningMetrics:
+    """Accumulates PearsonR, MSE, MAE and RMSE over batches of (ground truth, prediction) pairs.
+
+    Only running moments are stored (using the pairwise update of Chan et al.), so arbitrarily many
+    batches can be evaluated without keeping their values. SpearmanR needs all values for ranking and is therefore not supported.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean_gt = 0.0
+        self.mean_prediction = 0.0
+        self.m2_gt = 0.0
+        self.m2_prediction = 0.0
+        self.comoment = 0.0
+        self.sum_squared_error = 0.0
+        self.sum_absolute_error = 0.0
+
+    def update(self, ground_truth: np.ndarray, prediction: np.ndarray) -> "RunningMetrics":
+        ground_truth = np.asarray(ground_truth, dtype=np.float64).ravel()
+        prediction = np.asarray(prediction, dtype=np.float64).ravel()
+        batch = RunningMetrics()
+        batch.count = ground_truth.shape[0]
+        if batch.count == 0:
+            return self
+        batch.mean_gt, batch.mean_prediction = ground_truth.mean(), prediction.mean()
+        d_gt, d_prediction = ground_truth - batch.mean_gt, prediction - batch.mean_prediction
+        batch.m2_gt, batch.m2_prediction = (d_gt**2).sum(), (d_prediction**2).sum()
+        batch.comoment = (d_gt * d_prediction).sum()
+        diff = prediction - ground_truth
+        batch.sum_squared_error = (diff**2).sum()
+        batch.sum_absolute_error = np.abs(diff).sum()
+        return self.merge(batch)
+
+    def merge(self, other: "RunningMetrics") -> "RunningMetrics":
+        if other.count == 0:
+            return self
+        n = self.count + other.count
+        delta_gt = other.mean_gt - self.mean_gt
+        delta_prediction = other.mean_prediction - self.mean_prediction
+        weight = self.count * other.count / n
+        self.m2_gt += other.m2_gt + delta_gt**2 * weight
+        self.m2_prediction += other.m2_prediction + delta_prediction**2 * weight
+        self.comoment += other.comoment + delta_gt * delta_prediction * weight
+        self.mean_gt += delta_gt * other.count / n
+        self.mean_prediction += delta_prediction * other.count / n
+        self.sum_squared_error += other.sum_squared_error
+        self.sum_absolute_error += other.sum_absolute_error
+        self.count = n
+        return self
+
+    def result(self) -> Dict[str, float]:
+        res = {"count": self.count, "pearsonr": np.nan, "mse": np.nan, "mae": np.nan, "rmse": np.nan}
+        if self.count > 0:
+            res["mse"] = self.sum_squared_error / self.count
+            res["rmse"] = np.sqrt(res["mse"])
+            res["mae"] = self.sum_absolute_error / self.count
+        if self.count > 1:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                res["pearsonr"] = float(np.clip(self.comoment / np.sqrt(self.m2_gt * self.m2_prediction), -1.0, 1.0))
+        return res
@@ -1,13 +1,96 @@
-from typing import List, Union, Optional
-import itertools
+from typing import List, Union, Optional, Tuple
+import warnings
 
 from ..data import Dataset
 
 import pandas as pd
 import numpy as np
 
+# upper bound for the number of ratios materialized at once when reducing over molecules (unless a single sample pair
+# already has more ratios, i.e. number of columns times number of molecules)
+_MAX_CHUNK_ELEMENTS = 2**24
+
+
+def _ratio_values(
+    dataset: Dataset,
+    molecule: str,
+    columns: List[str],
+    numerator_samples: List[str],
+    denominator_samples: List[str],
+    ids: Optional[pd.Index] = None,
+) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    mol_ids = dataset.molecules[molecule].index
+    samples = list(dict.fromkeys(list(numerator_samples) + list(denominator_samples)))
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=columns, samples=samples)
+    if ids is not None:
+        selection = mol_ids.isin(ids)
+        values, mol_ids = values[:, selection], mol_ids[selection]
+    sample_pos = {s: i for i, s in enumerate(samples)}
+    numerator = values[:, :, [sample_pos[s] for s in numerator_samples]]
+    denominator = values[:, :, [sample_pos[s] for s in denominator_samples]]
+    return numerator, denominator, mol_ids
+
+
+def sample_pair_ratio_tensor(numerator: np.ndarray, denominator: np.ndarray, is_log: bool = False) -> np.ndarray:
+    """Computes the ratios of all numerator/denominator sample pairs by broadcasting.
+
+    Args:
+        numerator (np.ndarray): Numerator values of shape (..., numerator samples).
+        denominator (np.ndarray): Denominator values of shape (..., denominator samples).
+        is_log (bool, optional): Whether values are logarithmized, ratios are differences then. Defaults to False.
+
+    Returns:
+        np.ndarray: Ratios of shape (..., numerator samples, denominator samples).
+    """
+    if is_log:
+        return numerator[..., :, np.newaxis] - denominator[..., np.newaxis, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return numerator[..., :, np.newaxis] / denominator[..., np.newaxis, :]
+
+
+def _summarize_pair_ratios(
+    numerator: np.ndarray,
+    denominator: np.ndarray,
+    columns: List[str],
+    numerator_samples: List[str],
+    denominator_samples: List[str],
+    is_log: bool,
+    ground_truth: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    # reduces over molecules in blocks of numerator and denominator samples, so the full (molecule x pair) tensor is never
+    # materialized, the median needs all molecules of a pair at once so a block holds at least one pair
+    n_columns, n_molecules, n_numerator = numerator.shape
+    n_denominator = denominator.shape[2]
+    pairs_per_block = max(1, _MAX_CHUNK_ELEMENTS // max(1, n_columns * n_molecules))
+    denominator_chunk = min(max(1, n_denominator), pairs_per_block)
+    numerator_chunk = max(1, pairs_per_block // denominator_chunk)
+    count = np.zeros((n_columns, n_numerator, n_denominator), dtype=np.int64)
+    mean = np.full((n_columns, n_numerator, n_denominator), np.nan)
+    median = np.full((n_columns, n_numerator, n_denominator), np.nan)
+    for num_start in range(0, n_numerator, numerator_chunk):
+        num = slice(num_start, num_start + numerator_chunk)
+        for den_start in range(0, n_denominator, denominator_chunk):
+            den = slice(den_start, den_start + denominator_chunk)
+            ratios = sample_pair_ratio_tensor(numerator[:, :, num], denominator[:, :, den], is_log=is_log)
+            if ground_truth is not None:
+                ratios = np.abs(ratios - ground_truth[np.newaxis, :, np.newaxis, np.newaxis])
+            ratios[~np.isfinite(ratios)] = np.nan
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                count[:, num, den] = (~np.isnan(ratios)).sum(axis=1)
+                mean[:, num, den] = np.nanmean(ratios, axis=1)
+                median[:, num, den] = np.nanmedian(ratios, axis=1)
+    index = pd.MultiIndex.from_product(
+        [numerator_samples, denominator_samples], names=["nominator_sample", "denominator_sample"]
+    )
+    res = {}
+    for i, c in enumerate(columns):
+        res[(c, "count")] = count[i].ravel()
+        res[(c, "mean")] = mean[i].ravel()
+        res[(c, "median")] = median[i].ravel()
+    return pd.DataFrame(res, index=index)
+
 
-# TODO: Write Docstring
 def calculate_sample_pair_ratios(
     dataset: Dataset,
     molecule: str,
@@ -15,25 +98,55 @@ def calculate_sample_pair_ratios(
     numerator_samples: List[str],
     denominator_samples: List[str],
     ids: Optional[pd.Index] = None,
-    is_log: bool = False
+    is_log: bool = False,
+    reduce: bool = False,
 ) -> pd.DataFrame:
+    """Calculates the ratios of molecule values for all pairs of numerator and denominator samples.
+
+    Ratios are computed by broadcasting over the (molecule x sample) value matrices.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to calculate ratios for.
+        columns (Union[str, List[str]]): The value column(s) to calculate ratios for.
+        numerator_samples (List[str]): Samples used as numerators.
+        denominator_samples (List[str]): Samples used as denominators.
+        ids (Optional[pd.Index], optional): If given only ratios for those molecule ids are calculated. Defaults to None.
+        is_log (bool, optional): Whether values are logarithmized, ratios are differences then. Defaults to False.
+        reduce (bool, optional): If set only count, mean and median of the (finite) ratios over all molecules are returned
+            per sample pair, this keeps memory bounded for many pairs. Defaults to False.
+
+    Returns:
+        pd.DataFrame: If not reduced, ratios with a ("nominator_sample", "denominator_sample", "id") MultiIndex and one column per value column.
+            Otherwise one row per sample pair with (column, statistic) columns.
+    """
     if isinstance(columns, str):
         columns = [columns]
-    vals = dataset.values[molecule].df
-    val_groups = {s: g for s, g in vals.groupby("sample")}
-    res = []
-    for ns, ds in itertools.product(numerator_samples, denominator_samples):
-        if is_log:
-            ratio = val_groups[ns].droplevel("sample") - val_groups[ds].droplevel("sample")
-        else:
-            ratio = val_groups[ns].droplevel("sample") / val_groups[ds].droplevel("sample")
-        ratio = pd.concat([ratio], keys=[ds], names=["denominator_sample"])
-        ratio = pd.concat([ratio], keys=[ns], names=["nominator_sample"])
-        res.append(ratio)
-    res = pd.concat(res)
-    if ids is not None:
-        res = res.loc[res.index.get_level_values("id").isin(ids)]
-    return res
+    numerator, denominator, mol_ids = _ratio_values(
+        dataset=dataset,
+        molecule=molecule,
+        columns=columns,
+        numerator_samples=numerator_samples,
+        denominator_samples=denominator_samples,
+        ids=ids,
+    )
+    if reduce:
+        return _summarize_pair_ratios(
+            numerator=numerator,
+            denominator=denominator,
+            columns=columns,
+            numerator_samples=numerator_samples,
+            denominator_samples=denominator_samples,
+            is_log=is_log,
+        )
+    ratios = sample_pair_ratio_tensor(numerator, denominator, is_log=is_log)
+    # (column, molecule, numerator, denominator) -> rows ordered by numerator, denominator, molecule
+    ratios = ratios.transpose(2, 3, 1, 0).reshape(-1, len(columns))
+    index = pd.MultiIndex.from_product(
+        [numerator_samples, denominator_samples, mol_ids], names=["nominator_sample", "denominator_sample", "id"]
+    )
+    return pd.DataFrame(ratios, index=index, columns=columns)
+
 
 def caclulate_ratio_absolute_error(
     dataset: Dataset,
@@ -44,13 +157,51 @@ def caclulate_ratio_absolute_error(
     ground_truth_ratios: pd.Series,
     ids: Optional[pd.Index] = None,
     is_log: bool = False,
+    reduce: bool = False,
 ) -> pd.DataFrame:
-    mae = calculate_sample_pair_ratios(
-        dataset, molecule, columns, numerator_samples, denominator_samples, ids=ids, is_log=is_log
+    """Calculates the absolute errors of sample pair ratios compared to ground truth ratios per molecule.
+
+    Args:
+        dataset (Dataset): The dataset.
+        molecule (str): The molecule type to calculate ratios for.
+        columns (Union[str, List[str]]): The value column(s) to calculate ratios for.
+        numerator_samples (List[str]): Samples used as numerators.
+        denominator_samples (List[str]): Samples used as denominators.
+        ground_truth_ratios (pd.Series): Ground truth ratio for every molecule id (not logarithmized).
+        ids (Optional[pd.Index], optional): If given only ratios for those molecule ids are calculated. Defaults to None.
+        is_log (bool, optional): Whether values are logarithmized, ground truth ratios are logarithmized as well then. Defaults to False.
+        reduce (bool, optional): If set only count, mean and median of the absolute errors over all molecules are returned per sample pair. Defaults to False.
+
+    Returns:
+        pd.DataFrame: Absolute errors in the same layout as returned by calculate_sample_pair_ratios.
+    """
+    if isinstance(columns, str):
+        columns = [columns]
+    numerator, denominator, mol_ids = _ratio_values(
+        dataset=dataset,
+        molecule=molecule,
+        columns=columns,
+        numerator_samples=numerator_samples,
+        denominator_samples=denominator_samples,
+        ids=ids,
     )
-    gt = ground_truth_ratios[mae.index.get_level_values('id')].values
+    gt = ground_truth_ratios[mol_ids].to_numpy(dtype=np.float64)
     if is_log:
         gt = np.log(gt)
-    for c in mae.columns:
-        mae.loc[:,c] = (mae[c] - gt).abs()
-    return mae
+    if reduce:
+        return _summarize_pair_ratios(
+            numerator=numerator,
+            denominator=denominator,
+            columns=columns,
+            numerator_samples=numerator_samples,
+            denominator_samples=denominator_samples,
+            is_log=is_log,
+            ground_truth=gt,
+        )
+    ratios = sample_pair_ratio_tensor(numerator, denominator, is_log=is_log)
+    ratios = np.abs(ratios - gt[np.newaxis, :, np.newaxis, np.newaxis])
+    ratios = ratios.transpose(2, 3, 1, 0).reshape(-1, len(columns))
+    index = pd.MultiIndex.from_product(
+        [numerator_samples, denominator_samples, mol_ids], names=["nominator_sample", "denominator_sample", "id"]
+    )
+    return pd.DataFrame(ratios, index=index, columns=columns)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Union
 import warnings
 
 import numpy as np
@@ -7,9 +7,23 @@ from scipy.optimize import minimize
 
 from ..data import Dataset
 
+def _pep_log_intensities(normalization: np.ndarray, profiles: np.ndarray):
+    normalization = normalization.reshape(profiles.shape[:2])
+    reshaped_profiles = np.transpose(profiles, (2, 0, 1)) # move axes to support broadcasting
+    pep_ints_all = np.nansum(reshaped_profiles*normalization, axis=1)
+    # zero (or missing) intensities do not contribute to the error
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ints = np.log(pep_ints_all)
+    valid = np.isfinite(log_ints)
+    log_ints[~valid] = 0
+    return reshaped_profiles, pep_ints_all, log_ints, valid
+
 def get_total_error(normalization: np.ndarray, profiles: np.ndarray) -> float:
     """Computes the summed peptide errors over the whole dataset.
 
+    The squared log ratios of all sample pairs are not enumerated explicitly but summed per peptide using
+    sum_{i<j} (l_i - l_j)^2 = n * sum_i l_i^2 - (sum_i l_i)^2, which is linear instead of quadratic in the number of samples.
+
     Args:
         normalization (np.ndarray): per sample normalization factors.
         profiles (np.ndarray): peptide intensity profiles over the dataset.
@@ -17,24 +31,30 @@ def get_total_error(normalization: np.ndarray, profiles: np.ndarray) -> float:
     Returns:
         float: summed peptide error.
     """
-    normalization = normalization.reshape(profiles.shape[:2])
-    reshaped_profiles = np.transpose(profiles, (2, 0, 1)) # move axes to support broadcasting
-    normalized_profiles = reshaped_profiles*normalization
-    pep_ints_all = np.nansum(normalized_profiles, axis=1) 
-    #returns upper triangular indices, with offset of 1, which gives us every pair of indices in our array
-    i, j = np.triu_indices(pep_ints_all.shape[1], k=1) #returns upper triangular indices
-    x = pep_ints_all[:,i]
-    y = pep_ints_all[:,j]
-    #this operation will result in pos/neg infinity for zero values in x or y, and will cause expected runtime warnings
-    with np.errstate(divide = 'ignore', invalid='ignore'):
-        errors = np.log(x/y)
-    #change pos/neg infinity values to 0 to compute accurate sum
-    errors = np.nan_to_num(errors, posinf=0, neginf=0)
-    #absolute value is not necessary as squaring should always result in a non negative value
-    total_error = (errors**2).sum()
-    #total_error = np.abs(errors).sum()
+    _, _, log_ints, valid = _pep_log_intensities(normalization, profiles)
+    n = valid.sum(axis=1)
+    total_error = (n * (log_ints**2).sum(axis=1) - log_ints.sum(axis=1)**2).sum()
     return total_error
 
+def get_total_error_gradient(normalization: np.ndarray, profiles: np.ndarray) -> np.ndarray:
+    """Computes the analytic gradient of get_total_error with respect to the normalization factors.
+
+    Args:
+        normalization (np.ndarray): per sample normalization factors.
+        profiles (np.ndarray): peptide intensity profiles over the dataset.
+
+    Returns:
+        np.ndarray: gradient of the summed peptide error, flattened like the normalization factors.
+    """
+    reshaped_profiles, pep_ints_all, log_ints, valid = _pep_log_intensities(normalization, profiles)
+    n = valid.sum(axis=1, keepdims=True)
+    # derivative of the summed squared log ratios with respect to the log intensity of every peptide and sample
+    d_log = 2 * (n * log_ints - log_ints.sum(axis=1, keepdims=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_ints = np.where(valid, d_log / pep_ints_all, 0)
+    gradient = np.nansum(reshaped_profiles * d_ints[:, np.newaxis, :], axis=0)
+    return gradient.reshape(-1)
+
 def normalize_experiment_SLSQP(profiles: np.ndarray) -> np.ndarray:
     """Calculates normalization with SLSQP approach.
     Args:
@@ -49,20 +69,90 @@ def normalize_experiment_SLSQP(profiles: np.ndarray) -> np.ndarray:
     x0 = x0.reshape(profiles.shape[0] * profiles.shape[1])
     x0 = np.nan_to_num(x0, nan=1)
     bounds = [(0.01, 1) for _ in x0]
-    res = minimize(get_total_error, args = profiles , x0 = x0, bounds=bounds, method='SLSQP', options={'disp': False, 'maxiter':100*profiles.shape[1]})
+    res = minimize(get_total_error, args = profiles , x0 = x0, jac=get_total_error_gradient, bounds=bounds, method='SLSQP', options={'disp': False, 'maxiter':100*profiles.shape[1]})
     solution = res.x/np.max(res.x)
     solution = solution.reshape(profiles.shape[:2])
     return solution
 
-def normalize_maxlfq(dataset: Dataset, molecule: str, column: str, reference_ids: Optional[pd.Index]=None, result_column: Optional[str] = None)->pd.DataFrame:
-    pep_table = dataset.get_samples_value_matrix(molecule=molecule, column=column)
+def normalize_least_squares(values: np.ndarray, min_factor: float = 0.01) -> np.ndarray:
+    """Calculates normalization factors minimizing the same error as normalize_experiment_SLSQP in closed form.
+
+    For a single fraction the summed squared log ratios are a quadratic function of the log normalization factors,
+    so the optimum is the solution of a linear system given by the (sample x sample) graph Laplacian weighted with the
+    number of peptides shared between two samples. The system only needs two matrix products over the peptides.
+
+    Args:
+        values (np.ndarray): peptide intensities of shape (number of peptides, number of samples).
+        min_factor (float, optional): factors are clipped to [min_factor, 1] like the bounds of the SLSQP approach. Defaults to 0.01.
+            If the factors span more than 1/min_factor, the clipped unconstrained solution is not the constrained
+            optimum found by SLSQP and the results of both approaches differ.
+
+    Returns:
+        np.ndarray: normalization factors, one per sample.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_values = np.log(values)
+    valid = np.isfinite(log_values)
+    present = valid.astype(np.float64)
+    log_values = np.where(valid, log_values, 0)
+    shared = present.T @ present
+    # log_sums[k, j] is the summed log intensity of sample k over the peptides shared with sample j
+    log_sums = log_values.T @ present
+    laplacian = np.diag(shared.sum(axis=1)) - shared
+    rhs = (log_sums.T - log_sums).sum(axis=1)
+    log_factors = np.linalg.lstsq(laplacian, rhs, rcond=None)[0]
+    factors = np.exp(log_factors - log_factors.max())
+    return np.clip(factors, min_factor, 1)
+
+def normalize_maxlfq(
+    dataset: Dataset,
+    molecule: str,
+    column: str,
+    reference_ids: Optional[pd.Index] = None,
+    result_column: Optional[str] = None,
+    method: str = "least_squares",
+    num_reference_molecules: Optional[int] = None,
+    random_seed: Optional[Union[int, np.random.Generator]] = None,
+) -> pd.DataFrame:
+    """Normalizes all samples like the MaxLFQ normalization, minimizing the squared log ratios of all molecules
+    between all pairs of samples.
+
+    Args:
+        dataset (Dataset): Dataset to normalize.
+        molecule (str): Molecule type to normalize (usually peptides).
+        column (str): Value column to normalize.
+        reference_ids (Optional[pd.Index], optional): Molecules used to estimate the normalization factors. Defaults to all molecules.
+        result_column (Optional[str], optional): If given the normalized values are written to this column. Defaults to None.
+        method (str, optional): "least_squares" solves the optimization in closed form, "slsqp" uses iterative
+            SLSQP optimization (with analytic gradients). Both minimize the same error and agree as long as the sample
+            factors span less than 100x. Beyond that the bound of 0.01 on the factors is active and the results differ,
+            "slsqp" finds the constrained optimum while "least_squares" clips the unconstrained one.
+            Defaults to "least_squares".
+        num_reference_molecules (Optional[int], optional): If given the factors are estimated from a random subset of
+            this many reference molecules. Defaults to None.
+        random_seed (Optional[Union[int, np.random.Generator]], optional): Seed for the reference subsampling. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The normalized values indexed by sample and id.
+    """
+    ids = dataset.molecules[molecule].index
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=[column])[0]
+    pep_table = pd.DataFrame(values, index=ids, columns=dataset.sample_names)
     if reference_ids is not None:
         tab = pep_table.loc[reference_ids].to_numpy()
     else:
-        tab = pep_table.to_numpy()
-    tab = tab.T[np.newaxis, :, :]
-    factors = normalize_experiment_SLSQP(tab)
-    print(factors)
+        tab = values
+    if num_reference_molecules is not None and num_reference_molecules < tab.shape[0]:
+        from ..simulation.utils import get_numpy_random_generator
+
+        rng = get_numpy_random_generator(seed=random_seed)
+        tab = tab[np.sort(rng.choice(tab.shape[0], size=num_reference_molecules, replace=False))]
+    if method == "least_squares":
+        factors = normalize_least_squares(tab)
+    elif method == "slsqp":
+        factors = normalize_experiment_SLSQP(tab.T[np.newaxis, :, :])
+    else:
+        raise ValueError(f"Unknown normalization method '{method}'.")
     for column, fac in zip(pep_table.columns, factors.flatten()):
         pep_table[column] *= fac
     res = pep_table.stack().swaplevel()
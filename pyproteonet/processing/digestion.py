@@ -0,0 +1,204 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+import hashlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from ..utils.parallel import process_map
+
+
+@dataclass
+class DigestionResult:
+    """Distinct peptides of several digested sequences stored as flat arrays.
+
+    The (sorted) peptides of sequence i are ``peptides[offsets[i]:offsets[i + 1]]``.
+    """
+
+    peptides: np.ndarray
+    offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.peptides[self.offsets[i] : self.offsets[i + 1]]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of distinct peptides per sequence."""
+        return np.diff(self.offsets)
+
+    def sequence_positions(self) -> np.ndarray:
+        """Position of the digested sequence for every entry of the peptide array."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.counts)
+
+
+def sequence_hash(sequence: str) -> str:
+    """Content hash (sha256 hex digest) used as cache key of a sequence."""
+    return hashlib.sha256(sequence.encode("utf-8")).hexdigest()
+
+
+def _digest_chunk(
+    sequences: List[str], enzyme: str, min_peptide_length: int, max_peptide_length: int
+) -> List[List[str]]:
+    # digests a chunk of sequences (also in worker processes), the digestor is only set up once per chunk
+    from pyopenms import ProteaseDigestion, AASequence
+
+    digestor = ProteaseDigestion()
+    digestor.setEnzyme(enzyme)
+    peptides = []
+    for sequence in sequences:
+        res = []
+        digestor.digest(AASequence().fromString(sequence), res, min_peptide_length, max_peptide_length)
+        peptides.append(sorted(set(pep.toString() for pep in res)))
+    return peptides
+
+
+class DigestionCache:
+    """Persistent, content addressed cache of digested sequences.
+
+    Stored in a local SQLite database, entries are keyed by the sequence hash, the enzyme and the peptide length
+    bounds, so they are shared between molecule sets, datasets and processes digesting the same proteome.
+
+    Args:
+        fp (Union[str, Path]): Path of the SQLite database or of a directory to create "digestion.sqlite" in.
+    """
+
+    _QUERY_SIZE = 500
+
+    def __init__(self, fp: Union[str, Path]):
+        fp = Path(fp)
+        if fp.is_dir() or not fp.suffix:
+            fp.mkdir(parents=True, exist_ok=True)
+            fp = fp / "digestion.sqlite"
+        self.fp = fp
+        with self._transaction() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS digestion (sequence_hash TEXT, enzyme TEXT, min_length INTEGER, "
+                "max_length INTEGER, peptides TEXT NOT NULL, "
+                "PRIMARY KEY (sequence_hash, enzyme, min_length, max_length))"
+            )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(fp={str(self.fp)})"
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.fp, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get(
+        self, hashes: Iterable[str], enzyme: str, min_peptide_length: int, max_peptide_length: int
+    ) -> Dict[str, List[str]]:
+        """Looks up the peptides of all cached sequence hashes.
+
+        Args:
+            hashes (Iterable[str]): Sequence hashes to look up.
+            enzyme (str): Enzyme name.
+            min_peptide_length (int): Minimum peptide length.
+            max_peptide_length (int): Maximum peptide length.
+
+        Returns:
+            Dict[str, List[str]]: Peptides per found sequence hash.
+        """
+        hashes = list(hashes)
+        res = {}
+        with self._transaction() as con:
+            for start in range(0, len(hashes), self._QUERY_SIZE):
+                chunk = hashes[start : start + self._QUERY_SIZE]
+                rows = con.execute(
+                    "SELECT sequence_hash, peptides FROM digestion WHERE enzyme = ? AND min_length = ? "
+                    f"AND max_length = ? AND sequence_hash IN ({','.join('?' * len(chunk))})",
+                    [enzyme, min_peptide_length, max_peptide_length, *chunk],
+                )
+                for seq_hash, peptides in rows:
+                    res[seq_hash] = peptides.split("\n") if peptides else []
+        return res
+
+    def put(
+        self, peptides: Dict[str, Sequence[str]], enzyme: str, min_peptide_length: int, max_peptide_length: int
+    ) -> None:
+        """Adds the peptides of digested sequences (keyed by sequence hash) in one transaction.
+
+        Args:
+            peptides (Dict[str, Sequence[str]]): Peptides per sequence hash.
+            enzyme (str): Enzyme name.
+            min_peptide_length (int): Minimum peptide length.
+            max_peptide_length (int): Maximum peptide length.
+        """
+        with self._transaction() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO digestion VALUES (?, ?, ?, ?, ?)",
+                (
+                    (seq_hash, enzyme, min_peptide_length, max_peptide_length, "\n".join(peps))
+                    for seq_hash, peps in peptides.items()
+                ),
+            )
+
+
+def digest_sequences(
+    sequences: Union[pd.Series, Sequence[str]],
+    enzyme: str = "Trypsin",
+    min_peptide_length: int = 7,
+    max_peptide_length: int = 30,
+    num_workers: int = 4,
+    chunksize: int = 500,
+    cache: Optional[Union[str, Path, DigestionCache]] = None,
+) -> DigestionResult:
+    """Digests protein sequences in silico and returns the distinct peptides of every sequence.
+
+    Identical sequences are only digested once and all sequences found in the cache are skipped. The remaining ones
+    are digested in chunks across a process pool and added to the cache.
+
+    Args:
+        sequences (Union[pd.Series, Sequence[str]]): Protein sequences.
+        enzyme (str, optional): Enzyme name as known to pyOpenMS. Defaults to "Trypsin".
+        min_peptide_length (int, optional): Minimum peptide length. Defaults to 7.
+        max_peptide_length (int, optional): Maximum peptide length. Defaults to 30.
+        num_workers (int, optional): Number of processes. Defaults to 4.
+        chunksize (int, optional): Number of sequences digested per task. Defaults to 500.
+        cache (Optional[Union[str, Path, DigestionCache]], optional): Persistent cache (or its path) to read from and
+            write to. Defaults to None (no persistent cache).
+
+    Returns:
+        DigestionResult: The peptides of all sequences in the given order.
+    """
+    if cache is not None and not isinstance(cache, DigestionCache):
+        cache = DigestionCache(cache)
+    sequence_list = list(sequences)
+    hashes = [sequence_hash(sequence) for sequence in sequence_list]
+    unique = dict(zip(hashes, sequence_list))
+    found = {}
+    if cache is not None:
+        found = cache.get(unique.keys(), enzyme, min_peptide_length, max_peptide_length)
+    missing = [seq_hash for seq_hash in unique if seq_hash not in found]
+    if missing:
+        missing_sequences = [unique[seq_hash] for seq_hash in missing]
+        chunks = [missing_sequences[start : start + chunksize] for start in range(0, len(missing), chunksize)]
+        digest_fn = partial(
+            _digest_chunk,
+            enzyme=enzyme,
+            min_peptide_length=min_peptide_length,
+            max_peptide_length=max_peptide_length,
+        )
+        digested = dict(
+            zip(missing, (peps for chunk in process_map(digest_fn, chunks, num_workers=num_workers) for peps in chunk))
+        )
+        if cache is not None:
+            cache.put(digested, enzyme, min_peptide_length, max_peptide_length)
+        found.update(digested)
+    per_sequence = [found[seq_hash] for seq_hash in hashes]
+    offsets = np.zeros(len(per_sequence) + 1, dtype=np.int64)
+    np.cumsum([len(peps) for peps in per_sequence], out=offsets[1:])
+    peptides = np.empty(offsets[-1], dtype=object)
+    peptides[:] = [pep for peps in per_sequence for pep in peps]
+    return DigestionResult(peptides=peptides, offsets=offsets)
@@ -1,18 +1,62 @@
+from typing import Optional, Union
 from io import StringIO
+from pathlib import Path
 import requests
 
-from pybiomart import Server
+from ..utils.mapping_cache import MappingCache, file_token, read_mapping_file
 
 class BiomartMapper:
+    """Maps identifiers with a BioMart table (e.g. Ensembl gene ids to gene names).
+
+    The table is either queried from the BioMart server or read from a downloaded BioMart export (flat file). With a
+    cache directory, the table is stored in a local SQLite database after the first query, so later mappers are
+    created offline.
+
+    Args:
+        from_attribute (str): BioMart attribute to map from.
+        to_attribute (str, optional): BioMart attribute to map to. Defaults to 'external_gene_name'.
+        dataset (str, optional): BioMart dataset. Defaults to 'hsapiens_gene_ensembl'.
+        mart (str, optional): BioMart mart. Defaults to 'ENSEMBL_MART_ENSEMBL'.
+        server_url (str, optional): BioMart server. Defaults to 'http://www.ensembl.org'.
+        skip_missing (bool, optional): Drop unmapped identifiers instead of mapping them to 'NaN_Gene'.
+            Defaults to True.
+        cache_dir (Optional[Union[str, Path]], optional): Directory of the persistent mapping cache.
+            Defaults to None (no cache).
+        flat_file (Optional[Union[str, Path]], optional): Downloaded BioMart export (tab separated with header) to
+            read the table from instead of querying the server, its first two columns are used. With a cache, the
+            file is only read again if it changed since it was cached. Defaults to None.
+        offline (bool, optional): Never query the server, the table must be cached or given as flat file.
+            Defaults to False.
+    """
 
     def __init__(self, from_attribute:str, to_attribute:str='external_gene_name', dataset:str='hsapiens_gene_ensembl',
-                 mart:str='ENSEMBL_MART_ENSEMBL', server_url:str='http://www.ensembl.org', skip_missing:bool=True):
-        server = Server(host=server_url)
-        dataset = (server.marts[mart].datasets[dataset])
-        data_array = dataset.query(attributes=[from_attribute, to_attribute]).to_numpy()
-        self.mapping = dict()
-        for data_ in data_array:
-            self.mapping[data_[0]] = data_[1]
+                 mart:str='ENSEMBL_MART_ENSEMBL', server_url:str='http://www.ensembl.org', skip_missing:bool=True,
+                 cache_dir:Optional[Union[str, Path]]=None, flat_file:Optional[Union[str, Path]]=None,
+                 offline:bool=False):
+        source = f"biomart:{server_url}:{mart}:{dataset}:{from_attribute}:{to_attribute}"
+        cache = MappingCache(cache_dir) if cache_dir is not None else None
+        if flat_file is not None:
+            token = file_token(flat_file)
+            if cache is not None and cache.is_complete(source, token=token):
+                # the unchanged flat file was already loaded into the cache
+                data_array = cache.get(source).to_numpy()
+            else:
+                data_array = read_mapping_file(flat_file).to_numpy()
+                if cache is not None:
+                    cache.put(source, data_array, complete=True, token=token)
+        elif cache is not None and cache.is_complete(source):
+            data_array = cache.get(source).to_numpy()
+        elif offline:
+            raise KeyError(f'BioMart table {source} is neither cached nor given as flat file.')
+        else:
+            from pybiomart import Server
+
+            server = Server(host=server_url)
+            dataset = (server.marts[mart].datasets[dataset])
+            data_array = dataset.query(attributes=[from_attribute, to_attribute]).dropna().astype(str).to_numpy()
+            if cache is not None:
+                cache.put(source, data_array, complete=True)
+        self.mapping = dict(zip(data_array[:, 0], data_array[:, 1]))
         self.skip_missing=skip_missing
 
     def __call__(self, gene_series):
@@ -21,4 +65,4 @@ class BiomartMapper:
             gene_series = gene_series[~gene_series.isna()]
         else:
             gene_series[gene_series.isna()] = 'NaN_Gene'
-        return gene_series.astype(str)
\ No newline at end of file
+        return gene_series.astype(str)
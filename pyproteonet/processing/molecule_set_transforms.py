@@ -1,19 +1,50 @@
-from typing import Optional, Union
+from typing import List, Optional, Union
 from io import StringIO
+from pathlib import Path
 import requests
 
+import numpy as np
 import pandas as pd
 from tqdm.auto import tqdm
-from pyopenms import ProteaseDigestion, AASequence
 
 from ..data.molecule_set import MoleculeSet
 from ..data.dataset import Dataset
+from ..utils.parallel import thread_map
+from .digestion import digest_sequences
+
+
+def _request_sequences(uniprot_ids: pd.Series) -> List[pd.DataFrame]:
+    # one request batch including all of its result pages
+    base_url = "http://rest.uniprot.org/uniprotkb/search"
+    params = {
+        #'from': "ACC",
+        #'to': 'ACC',
+        "format": "tsv",
+        "query": " OR ".join([f"accession:{id}" for id in uniprot_ids]),
+        #'query': " OR ".join(uniprot_ids[start:start+page_size]),
+        "fields": "accession,sequence",
+        #'size': min(request_size, len(uniprot_ids) - start),
+    }
+    # data = data.encode('ascii')
+    response = requests.get(base_url, params=params)
+    results = []
+    df_result = pd.read_csv(StringIO(response.content.decode("utf-8")), sep="\t")
+    df_result.columns = ["entry", "sequence"]
+    results.append(df_result)
+    while "Link" in response.headers:
+        link = response.headers["Link"].partition(">")[0][1:]
+        response = requests.get(link)
+        df_result = pd.read_csv(StringIO(response.content.decode("utf-8")), sep="\t")
+        df_result.columns = ["entry", "sequence"]
+        results.append(df_result)
+    return results
 
 
 def map_protein_sequence(
     uniprot_ids: pd.Series,
     result_column: Optional[str] = "sequence",
     request_size: int = 200,
+    num_workers: int = 4,
 ) -> pd.Series:
     """
     Retrieve uniprot sequences based on a list of uniprot sequence identifier.
@@ -27,6 +58,7 @@ def map_protein_sequence(
         output_column (str): Column in protein Dataframe to write sequences to.
         inplace (bool): Whether to copy the MoleculeSet/Dataset before retrieving the sequences.
         request_size (int, optional): Number of proteins to batch in one request. Defaults to 50.
+        num_workers (int, optional): Number of request batches fetched concurrently. Defaults to 4.
 
     Returns:
         Optional[MoleculeSet]: The transformed input or None if inplace=True
@@ -36,30 +68,10 @@ def map_protein_sequence(
     #    raise KeyError('MoleculeSet must have "protein" to map protein sequences.')
     #molecules = molecules["protein"]
     #uniprot_ids = molecules[uniprot_id_column] if uniprot_id_column is not None else molecules.index
-    base_url = "http://rest.uniprot.org/uniprotkb/search"
-    start = 0
+    batches = [uniprot_ids[start : start + request_size] for start in range(0, len(uniprot_ids), request_size)]
     results = []
-    for start in tqdm(range(0, len(uniprot_ids), request_size)):
-        params = {
-            #'from': "ACC",
-            #'to': 'ACC',
-            "format": "tsv",
-            "query": " OR ".join([f"accession:{id}" for id in uniprot_ids[start : start + request_size]]),
-            #'query': " OR ".join(uniprot_ids[start:start+page_size]),
-            "fields": "accession,sequence",
-            #'size': min(request_size, len(uniprot_ids) - start),
-        }
-        # data = data.encode('ascii')
-        response = requests.get(base_url, params=params)
-        df_result = pd.read_csv(StringIO(response.content.decode("utf-8")), sep="\t")
-        df_result.columns = ["entry", "sequence"]
-        results.append(df_result)
-        while "Link" in response.headers:
-            link = response.headers["Link"].partition(">")[0][1:]
-            response = requests.get(link)
-            df_result = pd.read_csv(StringIO(response.content.decode("utf-8")), sep="\t")
-            df_result.columns = ["entry", "sequence"]
-            results.append(df_result)
+    for batch_results in tqdm(thread_map(_request_sequences, batches, num_workers=num_workers), total=len(batches)):
+        results.extend(batch_results)
     results = pd.concat(results, ignore_index=True)
     #results.set_index("entry", drop=True, inplace=True, verify_integrity=True)
     #assert len(results) == len(uniprot_ids) and uniprot_ids.isin(results.index).all()
@@ -78,20 +90,55 @@ def num_theoretical_peptides(
     min_peptide_length: int = 7,
     max_peptide_length: int = 30,
     result_column: Optional[str] = "num_theoretical_peptides",
+    num_workers: int = 4,
+    chunksize: int = 500,
+    use_cache: bool = True,
+    cache_dir: Optional[Union[str, Path]] = None,
 ) -> pd.Series:
+    """Counts the distinct peptides of every protein sequence after in silico digestion.
+
+    Sequences are digested in chunks across a process pool (see `digest_sequences`). The counts are cached in the
+    molecule set (keyed by sequence column, enzyme and peptide length bounds), so repeated calls only redigest if the
+    sequences changed. With a cache directory, digested sequences are also persisted on disk and shared across runs.
+
+    Args:
+        molecule_set (MoleculeSet): MoleculeSet with "protein" molecules.
+        sequence_column (str, optional): Protein column containing the sequences. Defaults to "sequence".
+        enzyme (str, optional): Enzyme name as known to pyOpenMS. Defaults to "Trypsin".
+        min_peptide_length (int, optional): Minimum peptide length. Defaults to 7.
+        max_peptide_length (int, optional): Maximum peptide length. Defaults to 30.
+        result_column (Optional[str], optional): Protein column to write the counts to. Defaults to "num_theoretical_peptides".
+        num_workers (int, optional): Number of processes. Defaults to 4.
+        chunksize (int, optional): Number of sequences digested per task. Defaults to 500.
+        use_cache (bool, optional): Whether to use and update the molecule set's digestion cache. Defaults to True.
+        cache_dir (Optional[Union[str, Path]], optional): Directory of the persistent digestion cache.
+            Defaults to None (no persistent cache).
+
+    Returns:
+        pd.Series: Number of theoretical peptides per protein.
+    """
     if "protein" not in molecule_set.molecules:
         raise KeyError("The MoleculeSet must contain proteins!")
     sequences = molecule_set.molecules["protein"][sequence_column]
-    digestor = ProteaseDigestion()
-    digestor.setEnzyme(enzyme)
-    num_peps = []
-    for sequence in sequences:
-        res = []
-        digestor.digest(AASequence().fromString(sequence), res, min_peptide_length, max_peptide_length)
-        num_peps.append(len(set(res)))
+    key = ("num_theoretical_peptides", sequence_column, enzyme, min_peptide_length, max_peptide_length)
+    cached = molecule_set.digestion_cache.get(key) if use_cache else None
+    if cached is not None and cached[0].equals(sequences):
+        num_peps = cached[1]
+    else:
+        digested = digest_sequences(
+            sequences,
+            enzyme=enzyme,
+            min_peptide_length=min_peptide_length,
+            max_peptide_length=max_peptide_length,
+            num_workers=num_workers,
+            chunksize=chunksize,
+            cache=cache_dir,
+        )
+        num_peps = pd.Series(digested.counts, index=sequences.index, dtype=np.int64)
+        if use_cache:
+            molecule_set.digestion_cache[key] = (sequences.copy(), num_peps)
     if result_column is not None:
         molecule_set.molecules['protein'][result_column] = num_peps
         return molecule_set.molecules['protein'][result_column]
     else:
-        return pd.Series(num_peps, index=sequences.index)
-
+        return num_peps.copy()
@@ -1,6 +1,7 @@
 from .sampling import draw_normal_log_space
 from .modification import per_molecule_random_scaling
 from .random_error import add_positive_gaussian, poisson_error
-from .missing_values import simulate_mcars, simulate_mnars_thresholding
+from .missing_values import simulate_mcars, simulate_mnars_thresholding, simulate_missing_values
 from .protein_peptide import simulate_protein_peptide_dataset
-from .mock import ProteinPeptideDatasetMocker
\ No newline at end of file
+from .mock import ProteinPeptideDatasetMocker
+from .batch import simulate_replicates
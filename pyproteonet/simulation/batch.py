@@ -0,0 +1,104 @@
+from typing import Callable, Iterator, Optional, Tuple, Union
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from collections import deque
+
+import numpy as np
+
+from ..data.dataset import Dataset
+from .protein_peptide import simulate_protein_peptide_dataset
+
+# simulation function and keyword arguments of a worker process, set once by the pool initializer instead of being
+# pickled with every submitted replicate
+_worker_simulation: Optional[Tuple[Callable[..., Dataset], dict]] = None
+
+
+def _simulate_replicate(
+    simulate_fn: Callable[..., Dataset],
+    seed_sequence: np.random.SeedSequence,
+    output_dir: Optional[Path],
+    name: str,
+    kwargs: dict,
+) -> Union[Dataset, Path]:
+    dataset = simulate_fn(random_seed=np.random.default_rng(seed_sequence), **kwargs)
+    if output_dir is None:
+        return dataset
+    path = output_dir / name
+    dataset.save(path, overwrite=True)
+    return path
+
+
+def _init_worker(simulate_fn: Callable[..., Dataset], kwargs: dict):
+    global _worker_simulation
+    _worker_simulation = (simulate_fn, kwargs)
+
+
+def _simulate_replicate_in_worker(
+    seed_sequence: np.random.SeedSequence, output_dir: Optional[Path], name: str
+) -> Union[Dataset, Path]:
+    simulate_fn, kwargs = _worker_simulation
+    return _simulate_replicate(
+        simulate_fn=simulate_fn, seed_sequence=seed_sequence, output_dir=output_dir, name=name, kwargs=kwargs
+    )
+
+
+def simulate_replicates(
+    num_datasets: int,
+    simulate_fn: Callable[..., Dataset] = simulate_protein_peptide_dataset,
+    random_seed: Optional[Union[int, np.random.SeedSequence, np.random.Generator]] = None,
+    num_workers: int = 1,
+    output_dir: Optional[Union[str, Path]] = None,
+    name_prefix: str = "replicate",
+    mp_context: Optional[BaseContext] = None,
+    **kwargs,
+) -> Iterator[Union[Dataset, Path]]:
+    """Simulates many replicate datasets in parallel, every replicate using its own independent random stream.
+
+    The random stream of every replicate is spawned from the master seed with np.random.SeedSequence.spawn and only depends
+    on the replicate's position, so the results for a given master seed are the same regardless of the number of workers.
+
+    Args:
+        num_datasets (int): Number of datasets to simulate.
+        simulate_fn (Callable[..., Dataset], optional): Simulation function called as simulate_fn(random_seed=rng, **kwargs).
+            Must be picklable to be used with multiple workers (e.g. a module level function or a bound method like
+            ProteinPeptideDatasetMocker.create_mocked_dataset). Defaults to simulate_protein_peptide_dataset.
+        random_seed (Optional[Union[int, np.random.SeedSequence, np.random.Generator]], optional): Master seed. A
+            generator is used to draw the entropy of the master seed (which advances it). Defaults to None.
+        num_workers (int, optional): Number of worker processes, with one worker everything runs in the calling process. Defaults to 1.
+        output_dir (Optional[Union[str, Path]], optional): If given every dataset is saved to output_dir/<name_prefix><i> by the
+            worker and the path is yielded instead of the dataset. Defaults to None.
+        name_prefix (str, optional): Prefix of the directory names of saved datasets. Defaults to "replicate".
+        mp_context (Optional[BaseContext], optional): Multiprocessing context of the worker processes (e.g.
+            multiprocessing.get_context("spawn")). Defaults to None (the platform's default start method).
+        **kwargs: Further keyword arguments passed to simulate_fn.
+
+    Yields:
+        Union[Dataset, Path]: The simulated datasets (or the paths they were saved to) in replicate order.
+    """
+    if isinstance(random_seed, np.random.Generator):
+        random_seed = np.random.SeedSequence(random_seed.integers(2**32, size=4, dtype=np.uint64).tolist())
+    elif not isinstance(random_seed, np.random.SeedSequence):
+        random_seed = np.random.SeedSequence(random_seed)
+    seed_sequences = random_seed.spawn(num_datasets)
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    names = [f"{name_prefix}{i}" for i in range(num_datasets)]
+    if num_workers <= 1:
+        for seed_sequence, name in zip(seed_sequences, names):
+            yield _simulate_replicate(
+                simulate_fn=simulate_fn, seed_sequence=seed_sequence, output_dir=output_dir, name=name, kwargs=kwargs
+            )
+        return
+    with ProcessPoolExecutor(
+        max_workers=num_workers, mp_context=mp_context, initializer=_init_worker, initargs=(simulate_fn, kwargs)
+    ) as executor:
+        # keep only a bounded number of replicates in flight so results are not piling up in memory
+        pending = deque()
+        for seed_sequence, name in zip(seed_sequences, names):
+            pending.append(executor.submit(_simulate_replicate_in_worker, seed_sequence, output_dir, name))
+            if len(pending) >= 2 * num_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,11 +1,15 @@
-from typing import Optional, Union
+from typing import List, Optional, Tuple, Union
+from dataclasses import dataclass
 
 import numpy as np
+import pandas as pd
 from numpy.random import Generator
 
 from .utils import get_numpy_random_generator
+from ..utils.numpy import eq_nan
 from ..data.dataset import Dataset
 from ..data.dataset_sample import DatasetSample
+from ..data.masked_dataset import MaskedDataset
 
 
 def simulate_mnars_thresholding_sample(
@@ -188,3 +192,166 @@ def simulate_mnars_mcars_lazar(
         use_log_space=use_log_space,
         rng=rng,
     )
+
+
+@dataclass
+class MissingValueMask:
+    """Compact (molecule x sample) bitmask with the bits packed along the molecule axis.
+
+    Args:
+        bits (np.ndarray): Packed bits as returned by np.packbits(mask, axis=0).
+        ids (pd.Index): Molecule ids of the mask rows.
+        samples (List[str]): Sample names of the mask columns.
+    """
+
+    bits: np.ndarray
+    ids: pd.Index
+    samples: List[str]
+
+    @classmethod
+    def from_bool(cls, mask: np.ndarray, ids: pd.Index, samples: List[str]) -> "MissingValueMask":
+        return cls(bits=np.packbits(mask, axis=0), ids=ids, samples=list(samples))
+
+    def to_numpy(self) -> np.ndarray:
+        return np.unpackbits(self.bits, axis=0, count=len(self.ids)).astype(bool)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Unpacks the mask into a boolean DataFrame with the layout of MaskedDataset masks."""
+        return pd.DataFrame(self.to_numpy(), index=self.ids, columns=self.samples)
+
+    def __or__(self, other: "MissingValueMask") -> "MissingValueMask":
+        return MissingValueMask(bits=self.bits | other.bits, ids=self.ids, samples=self.samples)
+
+    def sum(self) -> int:
+        return int(np.unpackbits(self.bits, axis=0, count=len(self.ids)).sum())
+
+    def to_masked_dataset(self, dataset: Dataset, molecule: str = "peptide") -> MaskedDataset:
+        return MaskedDataset(dataset=dataset, masks={molecule: self.to_frame()})
+
+
+def simulate_missing_values_matrix(
+    values: np.ndarray,
+    thresh_mu: Optional[float] = None,
+    thresh_sigma: float = 0,
+    mcar_amount: Union[int, float] = 0,
+    mask_only_non_missing: bool = True,
+    in_log_space: bool = False,
+    rng: Optional[Union[int, Generator]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Simulates MNARs by thresholding and MCARs by random selection for a whole (molecule x sample) value matrix at once.
+
+    Like simulate_mnars_thresholding, every non-missing value below a threshold drawn from a normal distribution
+    becomes an MNAR. Afterwards, like simulate_mcars, the given amount of values per sample is randomly chosen to become MCARs.
+
+    Args:
+        values (np.ndarray): Value matrix of shape (molecules, samples), missing values are NaN.
+        thresh_mu (Optional[float], optional): Mean of the MNAR threshold distribution, no MNARs are simulated if None. Defaults to None.
+        thresh_sigma (float, optional): Standard deviation of the MNAR threshold distribution. Defaults to 0.
+        mcar_amount (Union[int, float], optional): Number of MCARs per sample, floats <= 1 are interpreted as fraction of molecules. Defaults to 0.
+        mask_only_non_missing (bool, optional): Whether MCARs are only drawn from values that are neither missing nor MNARs. Defaults to True.
+        in_log_space (bool, optional): Whether to compare the logarithmized values against the thresholds. Defaults to False.
+        rng (Optional[Union[int, Generator]], optional): Seed or generator for the random draws. Defaults to None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Boolean MNAR and MCAR masks of the same shape as the values.
+    """
+    rng = get_numpy_random_generator(seed=rng)
+    values = np.asarray(values, dtype=np.float64)
+    num_molecules, num_samples = values.shape
+    non_missing = ~np.isnan(values)
+    mnar = np.zeros(values.shape, dtype=bool)
+    if thresh_mu is not None:
+        thresh = rng.normal(loc=thresh_mu, scale=thresh_sigma, size=values.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            compared = np.log(values) if in_log_space else values
+        mnar = non_missing & (compared < thresh)
+    if isinstance(mcar_amount, float) and mcar_amount <= 1.0:
+        mcar_amount = int(num_molecules * mcar_amount)
+    else:
+        mcar_amount = int(mcar_amount)
+    mcar = np.zeros(values.shape, dtype=bool)
+    if mcar_amount > 0:
+        candidates = non_missing & ~mnar if mask_only_non_missing else np.ones(values.shape, dtype=bool)
+        num_candidates = candidates.sum(axis=0).min()
+        if mcar_amount > num_candidates:
+            raise ValueError(f"Only {num_candidates} candidate values are in a sample but {mcar_amount} MCARS were requested!")
+        # a uniform random subset per sample: the candidates with the smallest random keys
+        keys = rng.random(values.shape)
+        keys[~candidates] = np.inf
+        selected = np.argpartition(keys, mcar_amount - 1, axis=0)[:mcar_amount]
+        mcar[selected, np.arange(num_samples)] = True
+    return mnar, mcar
+
+
+def simulate_missing_values(
+    dataset: Dataset,
+    thresh_mu: Optional[float] = None,
+    thresh_sigma: float = 0,
+    mcar_amount: Union[int, float] = 0,
+    molecule: str = "peptide",
+    column: str = "abundance",
+    result_column: Optional[str] = None,
+    mnar_mask_column: Optional[str] = None,
+    mcar_mask_column: Optional[str] = None,
+    mask_only_non_missing: bool = True,
+    in_log_space: bool = False,
+    rng: Optional[Union[int, Generator]] = None,
+    inplace: bool = False,
+) -> Tuple[Dataset, MissingValueMask, MissingValueMask]:
+    """Simulates MNARs and MCARs for all samples at once, see simulate_missing_values_matrix for details.
+
+    Like the per sample simulations, values equal to the dataset's missing value are already missing: they never
+    become MNARs and are no MCAR candidates if mask_only_non_missing is set.
+
+    Args:
+        dataset (Dataset): Input Dataset.
+        thresh_mu (Optional[float], optional): Mean of the MNAR threshold distribution, no MNARs are simulated if None. Defaults to None.
+        thresh_sigma (float, optional): Standard deviation of the MNAR threshold distribution. Defaults to 0.
+        mcar_amount (Union[int, float], optional): Number of MCARs per sample, floats <= 1 are interpreted as fraction of molecules. Defaults to 0.
+        molecule (str, optional): Molecule type to simulate missing values for. Defaults to "peptide".
+        column (str, optional): Column to simulate missing values for. Defaults to "abundance".
+        result_column (Optional[str], optional): Column to write the values with missing values to. Defaults to the input column.
+        mnar_mask_column (Optional[str], optional): If given the MNAR mask is also written to this column. Defaults to None.
+        mcar_mask_column (Optional[str], optional): If given the MCAR mask is also written to this column. Defaults to None.
+        mask_only_non_missing (bool, optional): Whether MCARs are only drawn from values that are neither missing nor MNARs. Defaults to True.
+        in_log_space (bool, optional): Whether to compare the logarithmized values against the thresholds. Defaults to False.
+        rng (Optional[Union[int, Generator]], optional): Seed or generator for the random draws. Defaults to None.
+        inplace (bool, optional): Whether to modify the dataset in place instead of copying it. Defaults to False.
+
+    Returns:
+        Tuple[Dataset, MissingValueMask, MissingValueMask]: The resulting dataset and the packed MNAR and MCAR masks.
+    """
+    if not inplace:
+        dataset = dataset.copy()
+    if result_column is None:
+        result_column = column
+    samples = dataset.sample_names
+    ids = dataset.molecules[molecule].index
+    values = dataset.get_samples_value_tensor(molecule=molecule, columns=[column], samples=samples)[0]
+    # the kernel only treats NaN as missing
+    missing = eq_nan(values, dataset.missing_value)
+    values[missing] = np.nan
+    mnar, mcar = simulate_missing_values_matrix(
+        values=values,
+        thresh_mu=thresh_mu,
+        thresh_sigma=thresh_sigma,
+        mcar_amount=mcar_amount,
+        mask_only_non_missing=mask_only_non_missing,
+        in_log_space=in_log_space,
+        rng=rng,
+    )
+    values[missing | mnar | mcar] = dataset.missing_value
+    results = {result_column: values}
+    if mnar_mask_column is not None:
+        results[mnar_mask_column] = mnar
+    if mcar_mask_column is not None:
+        results[mcar_mask_column] = mcar
+    for j, sample in enumerate(dataset.samples):
+        sample_values = sample.values[molecule]
+        for c, matrix in results.items():
+            sample_values[c] = pd.Series(matrix[:, j], index=ids)
+    return (
+        dataset,
+        MissingValueMask.from_bool(mnar, ids=ids, samples=samples),
+        MissingValueMask.from_bool(mcar, ids=ids, samples=samples),
+    )
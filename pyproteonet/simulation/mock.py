@@ -1,4 +1,6 @@
-from typing import Optional, Union
+from typing import Optional, Union, Iterator
+from pathlib import Path
+from multiprocessing.context import BaseContext
 
 import numpy as np
 import scipy
@@ -7,6 +9,7 @@ from ..data.molecule_set import MoleculeSet
 from ..data.dataset import Dataset
 from ..aggregation.flyability import estimate_flyability_upper_bound
 from .protein_peptide import simulate_protein_peptide_dataset
+from .batch import simulate_replicates
 from .missing_values import simulate_mcars, simulate_mnars_thresholding
 from .utils import get_numpy_random_generator
 
@@ -132,3 +135,35 @@ class ProteinPeptideDatasetMocker:
                 mask_only_non_missing = True,
             )
         return sim_ds
+
+    def create_mocked_datasets(
+        self,
+        num_datasets: int,
+        random_seed: Optional[Union[int, np.random.SeedSequence]] = None,
+        num_workers: int = 1,
+        output_dir: Optional[Union[str, Path]] = None,
+        mp_context: Optional[BaseContext] = None,
+        **kwargs,
+    ) -> Iterator[Union[Dataset, Path]]:
+        """Creates many mocked datasets in parallel, see simulate_replicates for details.
+
+        Args:
+            num_datasets (int): Number of datasets to create.
+            random_seed (Optional[Union[int, np.random.SeedSequence]], optional): Master seed every dataset's random stream is spawned from. Defaults to None.
+            num_workers (int, optional): Number of worker processes. Defaults to 1.
+            output_dir (Optional[Union[str, Path]], optional): If given datasets are saved there and their paths are yielded. Defaults to None.
+            mp_context (Optional[BaseContext], optional): Multiprocessing context of the worker processes. Defaults to None.
+            **kwargs: Further keyword arguments passed to create_mocked_dataset.
+
+        Yields:
+            Union[Dataset, Path]: The mocked datasets (or the paths they were saved to).
+        """
+        return simulate_replicates(
+            num_datasets=num_datasets,
+            simulate_fn=self.create_mocked_dataset,
+            random_seed=random_seed,
+            num_workers=num_workers,
+            output_dir=output_dir,
+            mp_context=mp_context,
+            **kwargs,
+        )
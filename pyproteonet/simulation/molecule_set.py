@@ -1,9 +1,8 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
 import math
 
 import numpy as np
 import pandas as pd
-from tqdm.auto import tqdm
 import scipy
 
 from .utils import get_numpy_random_generator
@@ -11,8 +10,57 @@ from ..data.dataset_sample import DatasetSample
 from ..data.molecule_set import MoleculeSet
 from ..data.dataset import Dataset
 
+def _duplicate_edges(a: np.ndarray, b: np.ndarray, num_b: int) -> np.ndarray:
+    # positions of all but the first occurrence of every (a, b) edge, found by hashing edges to a single integer key
+    keys = a.astype(np.int64) * num_b + b
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    return order[1:][sorted_keys[1:] == sorted_keys[:-1]]
+
+
+def bipartite_configuration_model(
+    degrees_a: np.ndarray,
+    degrees_b: np.ndarray,
+    random_seed: Optional[Union[int, np.random.Generator]] = None,
+    max_iterations: int = 1000,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Draws a random simple bipartite graph with the given node degrees.
+
+    Edge stubs are matched by a random permutation. Multi-edges are found by hashing every edge to a single integer key and are
+    rewired in batches by randomly permuting the b endpoints of all multi-edges together with as many randomly chosen other edges.
+    This keeps all node degrees and is repeated until the graph is simple.
+
+    Args:
+        degrees_a (np.ndarray): Degree of every a node.
+        degrees_b (np.ndarray): Degree of every b node. Must sum up to the same number of edges as degrees_a.
+        random_seed (Optional[Union[int, np.random.Generator]], optional): Seed or generator for the random draws. Defaults to None.
+        max_iterations (int, optional): Maximum number of rewiring rounds. Defaults to 1000.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The a and b node positions of every edge.
+    """
+    rng = get_numpy_random_generator(seed=random_seed)
+    degrees_a, degrees_b = np.asarray(degrees_a, dtype=np.int64), np.asarray(degrees_b, dtype=np.int64)
+    if degrees_a.sum() != degrees_b.sum():
+        raise ValueError("Sum of a node degrees must match sum of b node degrees")
+    a = np.repeat(np.arange(degrees_a.shape[0]), degrees_a)
+    b = rng.permutation(np.repeat(np.arange(degrees_b.shape[0]), degrees_b))
+    num_edges = a.shape[0]
+    for _ in range(max_iterations):
+        duplicates = _duplicate_edges(a, b, degrees_b.shape[0])
+        if duplicates.shape[0] == 0:
+            return a, b
+        is_duplicate = np.zeros(num_edges, dtype=bool)
+        is_duplicate[duplicates] = True
+        candidates = np.flatnonzero(~is_duplicate)
+        partners = rng.choice(candidates, size=min(duplicates.shape[0], candidates.shape[0]), replace=False)
+        rewired = np.concatenate([duplicates, partners])
+        b[rewired] = b[rng.permutation(rewired)]
+    raise ValueError(f"No simple graph found after {max_iterations} rewiring rounds, the degree sequences might not be graphical.")
+
+
 def molecule_set_from_degree_distribution(protein_degree_distribution: List[int] = [2, 5, 7, 7], peptide_degree_distribution: List[int] = [1, 20, 10],
-                                          random_seed: Optional[int] = None)->MoleculeSet:
+                                          random_seed: Optional[Union[int, np.random.Generator]] = None)->MoleculeSet:
     rng = get_numpy_random_generator(seed=random_seed)
     num_prot_edges = (np.arange(len(protein_degree_distribution)) * protein_degree_distribution).sum()
     num_pep_edges = (np.arange(len(peptide_degree_distribution)) * peptide_degree_distribution).sum()
@@ -20,25 +68,10 @@ def molecule_set_from_degree_distribution(protein_degree_distribution: List[int]
         raise ValueError("Sum of protein degrees must match sum of peptide degrees")
     prot_degs = np.repeat(np.arange(len(protein_degree_distribution)), protein_degree_distribution)
     pep_degs = np.repeat(np.arange(len(peptide_degree_distribution)), peptide_degree_distribution)
-    prot_ids = np.repeat(np.arange(len(prot_degs)), prot_degs)
-    pep_ids = np.repeat(np.arange(len(pep_degs)), pep_degs)
-    edges = np.stack((prot_ids, pep_ids), axis=1)
-    while True:
-        unique, ids, counts = np.unique(edges, axis=0, return_counts=True, return_inverse=True)
-        mask = counts > 1
-        if not mask.any():
-            break
-        duplicates = np.repeat(unique[mask], counts[mask] - 1, axis=0)
-        rewired = []
-        for dup in duplicates:
-            id1 = rng.integers(unique.shape[0])
-            id2 = rng.integers(2)
-            dup[id2], unique[id1, id2] = unique[id1, id2], dup[id2]
-            rewired.append(dup)
-        edges = np.concatenate((unique, rewired), axis=0)
+    prot_ids, pep_ids = bipartite_configuration_model(degrees_a=prot_degs, degrees_b=pep_degs, random_seed=rng)
     proteins = pd.DataFrame(index=np.arange(prot_ids.max()+1))
     peptides = pd.DataFrame(index=np.arange(pep_ids.max()+1))
-    mapping = pd.DataFrame({'peptide':edges[:,1], 'protein':edges[:,0]})
+    mapping = pd.DataFrame({'peptide':pep_ids, 'protein':prot_ids})
     mapping.set_index(['peptide', 'protein'], inplace=True)
     ms = MoleculeSet(molecules = {'protein':proteins, 'peptide':peptides},
                      mappings = {'peptide-protein': mapping}
@@ -73,63 +106,50 @@ def _degree_distribution_to_integers(node_degrees: List[float])->List[int]:
 def simulate_molecule_set_protein_peptide(num_peptides = 1000, num_proteins = 100, 
                                           relative_peptide_node_degrees = [0.25, 0.5, 0.25],
                                           relative_protein_node_degrees = None,
-                                          random_seed = None, *args, **kwargs):
+                                          random_seed = None, max_iterations: int = 1000, *args, **kwargs):
     rng = get_numpy_random_generator(seed=random_seed)
     #Simulate peptide to protein correspondences
     peptide_node_degrees = _relative_to_absolute_node_degrees(relative_peptide_node_degrees, num_peptides)
-    protein_deg_distribution = None
+    pep_degs = np.repeat(np.arange(len(peptide_node_degrees)), peptide_node_degrees)
+    num_edges = pep_degs.sum()
     b_nodes_deg0 = 0
     if relative_protein_node_degrees is not None:
-        num_edges = ((np.arange(len(peptide_node_degrees))) * peptide_node_degrees).sum()
-        #protein_deg_distribution = np.array(_relative_to_absolute_node_degrees(relative_protein_node_degrees, num_proteins))
-        protein_deg_distribution = np.array(relative_protein_node_degrees)
+        protein_deg_distribution = np.array(relative_protein_node_degrees, dtype=float)
         protein_deg_distribution /= protein_deg_distribution.sum()
         protein_deg_distribution *= num_edges / (protein_deg_distribution * np.arange(len(protein_deg_distribution))).sum()
         b_nodes_deg0 = round(protein_deg_distribution[0])
         protein_deg_distribution = np.array(_degree_distribution_to_integers(protein_deg_distribution), dtype=int)
-        protein_deg_distribution = np.repeat(np.arange(len(protein_deg_distribution)), protein_deg_distribution).astype(float)
-        #protein_deg_distribution *= num_edges / protein_deg_distribution.sum()
-        rng.shuffle(protein_deg_distribution)
-    a_b = []
-    start = 0
-    a_nodes = []
-    a_nodes_deg0 = []
-    for deg, nwd in enumerate(peptide_node_degrees):
-        nodes = np.arange(start, start + nwd)
-        if deg==0:
-            a_nodes_deg0.append(nodes)
-        else:
-            a_nodes.append(np.stack([nodes, np.full(nwd, deg)], axis=1))
-        start += nwd
-    a_nodes = np.concatenate(a_nodes, axis=0)
-    rng.shuffle(a_nodes, axis=0)
-    epsilon = 1 / protein_deg_distribution.sum() * 0.001
-    for a, deg in tqdm(a_nodes):
-        a = np.full(deg, a)
-        if protein_deg_distribution is None:
-            b = rng.choice(num_proteins, size=deg, replace=False)
+        prot_degs = rng.permutation(np.repeat(np.arange(len(protein_deg_distribution)), protein_deg_distribution))
+        # rounding the distribution to integers might leave a few stubs more or less than there are peptide stubs,
+        # those are added to/removed from random proteins
+        missing_stubs = num_edges - prot_degs.sum()
+        if missing_stubs > 0:
+            probs = (prot_degs + 1) / (prot_degs + 1).sum()
+            prot_degs += np.bincount(rng.choice(prot_degs.shape[0], size=missing_stubs, p=probs), minlength=prot_degs.shape[0])
+        elif missing_stubs < 0:
+            stubs = np.repeat(np.arange(prot_degs.shape[0]), prot_degs)
+            removed = rng.choice(stubs.shape[0], size=-missing_stubs, replace=False)
+            prot_degs -= np.bincount(stubs[removed], minlength=prot_degs.shape[0])
+        peptides, proteins = bipartite_configuration_model(
+            degrees_a=pep_degs, degrees_b=prot_degs, random_seed=rng, max_iterations=max_iterations
+        )
+    else:
+        # every peptide is mapped to distinct, uniformly drawn proteins, multi-edges are redrawn in batches
+        peptides = np.repeat(np.arange(pep_degs.shape[0]), pep_degs)
+        proteins = rng.integers(num_proteins, size=num_edges)
+        for _ in range(max_iterations):
+            duplicates = _duplicate_edges(peptides, proteins, num_proteins)
+            if duplicates.shape[0] == 0:
+                break
+            proteins[duplicates] = rng.integers(num_proteins, size=duplicates.shape[0])
         else:
-            #b = np.argpartition(protein_deg_distribution, -deg)[-deg:]
-            probs = protein_deg_distribution + epsilon
-            probs[probs<0] = 0
-            probs /= probs.sum()
-            b = rng.choice(protein_deg_distribution.shape[0], p=probs, size=deg, replace=False)
-            protein_deg_distribution[b]-=1
-        if len(a)!=len(b):
-            raise ValueError()
-        a_b.append(np.stack([a, b], axis=1))
-    a_b = np.concatenate(a_b, axis=0)
-    #correspondences = pd.DataFrame({'peptide':a, 'protein':b})
-    protein_ids = np.squeeze(np.unique(a_b[:,1]))
+            raise ValueError(f"No simple graph found after {max_iterations} rounds, peptide degrees must not exceed the number of proteins.")
+    protein_ids = np.unique(proteins)
     start_deg_0 = protein_ids.max()+1
     protein_ids = np.concatenate([protein_ids, np.arange(start_deg_0, start_deg_0 + b_nodes_deg0)])
-    protein_protein_mapping = pd.DataFrame({'id':protein_ids, 'map_id':protein_ids})
-    protein_ids = pd.DataFrame(index=protein_ids)
-    a_nodes_deg0 = np.concatenate(a_nodes_deg0, axis=0)
-    peptide_ids = pd.DataFrame(index=np.unique(np.concatenate([np.squeeze(a_b[:,0]), a_nodes_deg0], axis=0)))
-    peptide_protein_mapping = pd.DataFrame({'id':a_b[:,0], 'map_id':a_b[:,1]})
-    protein_mapping = {'protein':protein_protein_mapping, 'peptide':peptide_protein_mapping}
+    peptide_ids = np.arange(pep_degs.shape[0])
     #we assume exactly one protein per gene
-    molecule_set = MoleculeSet(molecules={'peptide':peptide_ids, 'protein':protein_ids},
-                               mappings={'gene':protein_mapping, 'protein':protein_mapping})
-    return molecule_set
\ No newline at end of file
+    mapping = pd.DataFrame(index=pd.MultiIndex.from_arrays([peptides, proteins], names=['peptide', 'protein']))
+    molecule_set = MoleculeSet(molecules={'peptide':pd.DataFrame(index=peptide_ids), 'protein':pd.DataFrame(index=protein_ids)},
+                               mappings={'gene':mapping, 'protein':mapping.copy()})
+    return molecule_set
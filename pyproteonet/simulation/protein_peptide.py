@@ -1,15 +1,13 @@
-from typing import List, Union, Optional, Iterable
+from typing import List, Union, Optional, Iterable, Tuple
+import collections
 
 import numpy as np
+import pandas as pd
+import scipy
 
 from .utils import get_numpy_random_generator
 from ..data.molecule_set import MoleculeSet
 from ..data.dataset import Dataset
-from .sampling import draw_normal_log_space
-from .modification import per_molecule_random_scaling, introduce_random_condition
-from .random_error import multiply_exponential_gaussian, add_positive_gaussian, poisson_error
-from ..processing.aggregation import neighbor_sum
-from pyproteonet.aggregation.partner_summarization import partner_aggregation
 
 
 def simulate_protein_peptide_dataset(
@@ -82,8 +80,6 @@ def simulate_protein_peptide_dataset(
     Returns:
         Dataset: _description_
     """    
-    #Use different seeds for different step because otherwise the exact same values are drawn in multiple steps which can lead to
-    # strange effects (e.g. the product of two normal draws would always be positive because the same value is drawn twice). 
     if print_parameters:
         print(f"Protein distribution: mean(log_e)={log_abundance_mu}, std(log_e)={log_abundance_sigma}")
         print(f"Protein error std (log_e):{log_protein_error_sigma}")
@@ -94,85 +90,110 @@ def simulate_protein_peptide_dataset(
         print(f"Peptide noise: mu(log_e):{peptide_noise_mu}, sigma(log_e):{peptide_noise_sigma}")
         print(f"Condition_samples:{condition_samples}, condition_affeced:{condition_affected},")
         print(f"condition_means(log2):{log2_condition_means}, condition_sigmas(log2){log2_condition_stds}")
-    seed = get_numpy_random_generator(seed=random_seed)
-    dataset = draw_normal_log_space(
+    if isinstance(samples, int):
+        samples = [f"sample{i}" for i in range(samples)]
+    if print_parameters:
+        print(f"Number samples: {len(samples)}")
+    protein_values, peptide_values, peptide_gt_values = _simulate_protein_peptide_values(
         molecule_set=molecule_set,
-        log_mu=log_abundance_mu,
-        log_sigma=log_abundance_sigma,
+        mapping=mapping,
         samples=samples,
-        molecule=protein_molecule,
-        column=protein_column,
-        random_seed=seed,
+        log_abundance_mu=log_abundance_mu,
+        log_abundance_sigma=log_abundance_sigma,
+        log_protein_error_sigma=log_protein_error_sigma,
+        log_peptide_error_sigma=log_peptide_error_sigma,
+        simulate_flyability=simulate_flyability,
+        flyability_alpha=flyability_alpha,
+        flyability_beta=flyability_beta,
+        peptide_noise_mu=peptide_noise_mu,
+        peptide_noise_sigma=peptide_noise_sigma,
+        peptide_poisson_error=peptide_poisson_error,
+        condition_samples=condition_samples,
+        condition_affected=condition_affected,
+        log2_condition_means=log2_condition_means,
+        log2_condition_stds=log2_condition_stds,
+        protein_molecule=protein_molecule,
+        peptide_molecule=peptide_molecule,
+        rng=get_numpy_random_generator(seed=random_seed),
     )
-    if print_parameters:
-        print(f"Number samples: {len(dataset.samples_dict)}")
-    for samples, affected, mean, std in zip(condition_samples, condition_affected, log2_condition_means, log2_condition_stds):
-        introduce_random_condition(
-            dataset,
-            molecule=protein_molecule,
-            column=protein_column,
-            inplace=True,
-            affected=affected,
-            log2_cond_factor_mean=mean,
-            log2_cond_factor_std=std,
-            samples=samples,
-            random_seed=seed,
-        )
-    ground_truth_prot_vals = dataset.values[protein_molecule][protein_column]
-    multiply_exponential_gaussian(
-        dataset,
-        molecule=protein_molecule,
-        column=protein_column,
-        sigma=log_protein_error_sigma,
-        inplace=True,
-        random_seed=seed,
+    peptide_columns = {peptide_column: peptide_values.T}
+    if calculate_peptide_gt:
+        if peptide_gt_column is None:
+            peptide_gt_column = peptide_column + '_gt'
+        peptide_columns[peptide_gt_column] = peptide_gt_values.T
+    return Dataset.from_value_matrices(
+        molecule_set=molecule_set,
+        sample_names=samples,
+        values={protein_molecule: {protein_column: protein_values.T}, peptide_molecule: peptide_columns},
     )
-    neighbor_sum(
-        dataset,
-        molecule=protein_molecule,
-        column=protein_column,
-        mapping=mapping,
-        result_molecule=peptide_molecule,
-        result_column=peptide_column,
-        only_unique=False,
-        inplace=True,
+
+
+def _simulate_protein_peptide_values(
+    molecule_set: MoleculeSet,
+    mapping: str,
+    samples: List[str],
+    log_abundance_mu: float,
+    log_abundance_sigma: float,
+    log_protein_error_sigma: float,
+    log_peptide_error_sigma: float,
+    simulate_flyability: bool,
+    flyability_alpha: float,
+    flyability_beta: float,
+    peptide_noise_mu: float,
+    peptide_noise_sigma: float,
+    peptide_poisson_error: bool,
+    condition_samples: List[Union[float, List[str]]],
+    condition_affected: List[Union[float, int, Iterable]],
+    log2_condition_means: List[float],
+    log2_condition_stds: List[float],
+    protein_molecule: str,
+    peptide_molecule: str,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Simulates all samples at once on (sample x molecule) matrices and returns the ground truth protein, peptide and
+    # ground truth peptide values. Random values are drawn in the same order and shapes as the single simulation steps
+    # (draw_normal_log_space, introduce_random_condition, multiply_exponential_gaussian, per_molecule_random_scaling,
+    # add_positive_gaussian, poisson_error) draw them sample by sample, so a seed yields the same values as chaining those steps.
+    protein_ids = molecule_set.molecules[protein_molecule].index
+    num_samples, num_proteins = len(samples), len(protein_ids)
+    num_peptides = len(molecule_set.molecules[peptide_molecule])
+    log_values = rng.normal(loc=log_abundance_mu, scale=log_abundance_sigma, size=num_proteins)
+    log_errors = rng.normal(loc=0, scale=0, size=(num_samples, num_proteins))
+    proteins = np.exp(log_values + log_errors)
+    for cond_samples, affected, mean, std in zip(condition_samples, condition_affected, log2_condition_means, log2_condition_stds):
+        if isinstance(cond_samples, (int, float)):
+            if isinstance(cond_samples, float) and cond_samples <= 1.0:
+                cond_samples = int(num_samples * cond_samples)
+            cond_samples = rng.choice(samples, size=int(cond_samples))
+        if isinstance(affected, collections.abc.Iterable):
+            affected = pd.Index(list(affected))
+        else:
+            if isinstance(affected, float):
+                affected = int(num_proteins * affected)
+            affected = rng.choice(protein_ids, size=affected, replace=False)
+        protein_pos = protein_ids.get_indexer(affected)
+        if (protein_pos < 0).any():
+            raise KeyError(f"Affected proteins {list(pd.Index(affected)[protein_pos < 0])} are not in the molecule set.")
+        factor = 2 ** rng.normal(loc=mean, scale=std, size=len(affected))
+        sample_pos = pd.Index(samples).get_indexer(pd.unique(np.asarray(cond_samples)))
+        proteins[np.ix_(sample_pos[sample_pos >= 0], protein_pos)] *= factor
+    ground_truth_proteins = proteins.copy()
+    proteins *= np.exp(rng.normal(loc=0, scale=log_protein_error_sigma, size=(num_samples, num_proteins)))
+    # sparse protein->peptide sum, peptides without any protein are missing
+    peptide_protein = molecule_set.get_mapping_matrix(
+        mapping=mapping, molecule=peptide_molecule, partner_molecule=protein_molecule
     )
+    unmapped = np.asarray(peptide_protein.sum(axis=1)).ravel() == 0
+    peptides = np.asarray(peptide_protein @ proteins.T).T
+    peptides[:, unmapped] = np.nan
     if log_peptide_error_sigma != 0:
-         multiply_exponential_gaussian(
-            dataset,
-            molecule=peptide_molecule,
-            column=peptide_column,
-            sigma=log_peptide_error_sigma,
-            inplace=True,
-            random_seed=seed,
-        )
+        peptides *= np.exp(rng.normal(loc=0, scale=log_peptide_error_sigma, size=(num_samples, num_peptides)))
     if simulate_flyability:
-        per_molecule_random_scaling(
-            dataset=dataset,
-            beta_distr_alpha=flyability_alpha,
-            beta_distr_beta=flyability_beta,
-            molecule=peptide_molecule,
-            column=peptide_column,
-            inplace=True,
-            random_seed=seed,
-        )
-    add_positive_gaussian(
-        dataset,
-        molecule=peptide_molecule,
-        column=peptide_column,
-        mu=peptide_noise_mu,
-        sigma=peptide_noise_sigma,
-        inplace=True,
-        random_seed=seed,
-    )
+        peptides *= scipy.stats.beta.rvs(a=flyability_alpha, b=flyability_beta, size=num_peptides, random_state=rng)
+    peptides += np.abs(rng.normal(loc=peptide_noise_mu, scale=peptide_noise_sigma, size=(num_samples, num_peptides)))
     if peptide_poisson_error:
-        poisson_error(
-            dataset=dataset, molecule=peptide_molecule, column=peptide_column, random_seed=seed, inplace=True
-        )
-    dataset.values[protein_molecule][protein_column] = ground_truth_prot_vals
-    if calculate_peptide_gt:
-        if peptide_gt_column is None:
-            peptide_gt_column = peptide_column + '_gt'
-        dataset.values[peptide_molecule][peptide_gt_column] = partner_aggregation(dataset=dataset, molecule=peptide_molecule, mapping=mapping,
-                                                                                   partner_column=protein_column, method='sum', only_unique=False)
-    return dataset
+        non_missing = ~np.isnan(peptides)
+        peptides[non_missing] = rng.poisson(lam=peptides[non_missing])
+    ground_truth_peptides = np.asarray(peptide_protein @ ground_truth_proteins.T).T
+    ground_truth_peptides[:, unmapped] = np.nan
+    return ground_truth_proteins, peptides, ground_truth_peptides
@@ -0,0 +1,199 @@
+from typing import Iterable, Iterator, List, Optional, Set, Tuple, Union
+from contextlib import contextmanager
+from pathlib import Path
+import sqlite3
+
+import pandas as pd
+
+
+class MappingCache:
+    """Persistent cache of identifier mappings (e.g. UniProt accession -> gene name) in a local SQLite database.
+
+    Mappings are grouped by a source key describing the service and the mapped identifier types. Besides the mapped
+    pairs, all queried identifiers are recorded (also those without a match), so they are not queried again. Sources
+    loaded completely (e.g. a whole BioMart table or a downloaded flat file) are marked as complete, optionally
+    together with a version token of the loaded data (e.g. a flat file fingerprint, see `file_token`).
+
+    Args:
+        fp (Union[str, Path]): Path of the SQLite database or of a directory to create "mapping.sqlite" in.
+    """
+
+    _QUERY_SIZE = 500
+
+    def __init__(self, fp: Union[str, Path]):
+        fp = Path(fp)
+        if fp.is_dir() or not fp.suffix:
+            fp.mkdir(parents=True, exist_ok=True)
+            fp = fp / "mapping.sqlite"
+        self.fp = fp
+        with self._transaction() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS mapping (source TEXT, from_id TEXT, to_id TEXT)")
+            con.execute("CREATE INDEX IF NOT EXISTS mapping_from ON mapping (source, from_id)")
+            con.execute("CREATE TABLE IF NOT EXISTS queried (source TEXT, from_id TEXT, PRIMARY KEY (source, from_id))")
+            con.execute("CREATE TABLE IF NOT EXISTS complete_sources (source TEXT PRIMARY KEY, token TEXT)")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(fp={str(self.fp)})"
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.fp, timeout=60)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def is_complete(self, source: str, token: Optional[str] = None) -> bool:
+        """Whether all mappings of the source were loaded.
+
+        Args:
+            source (str): Source key.
+            token (Optional[str], optional): Only count the source as complete if it was loaded with this version
+                token. Defaults to None (any version).
+        """
+        with self._transaction() as con:
+            row = con.execute("SELECT token FROM complete_sources WHERE source = ?", (source,)).fetchone()
+        return row is not None and (token is None or row[0] == token)
+
+    def queried(self, source: str, ids: Iterable[str]) -> Set[str]:
+        """The given identifiers which were already queried from the source."""
+        ids = list(ids)
+        res = set()
+        with self._transaction() as con:
+            for start in range(0, len(ids), self._QUERY_SIZE):
+                chunk = ids[start : start + self._QUERY_SIZE]
+                rows = con.execute(
+                    f"SELECT from_id FROM queried WHERE source = ? AND from_id IN ({','.join('?' * len(chunk))})",
+                    [source, *chunk],
+                )
+                res.update(row[0] for row in rows)
+        return res
+
+    def get(self, source: str, ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Looks up cached mappings.
+
+        Args:
+            source (str): Source key.
+            ids (Optional[Iterable[str]], optional): Identifiers to look up. Defaults to None (all mappings).
+
+        Returns:
+            pd.DataFrame: Mapped pairs with columns "from" and "to" in insertion order.
+        """
+        with self._transaction() as con:
+            if ids is None:
+                rows = con.execute("SELECT from_id, to_id FROM mapping WHERE source = ? ORDER BY rowid", (source,))
+                rows = rows.fetchall()
+            else:
+                ids = list(ids)
+                rows = []
+                for start in range(0, len(ids), self._QUERY_SIZE):
+                    chunk = ids[start : start + self._QUERY_SIZE]
+                    rows.extend(
+                        con.execute(
+                            "SELECT from_id, to_id FROM mapping WHERE source = ? "
+                            f"AND from_id IN ({','.join('?' * len(chunk))}) ORDER BY rowid",
+                            [source, *chunk],
+                        )
+                    )
+        return pd.DataFrame(rows, columns=["from", "to"])
+
+    def put(
+        self,
+        source: str,
+        pairs: Iterable[Tuple[str, str]],
+        queried: Optional[Iterable[str]] = None,
+        complete: bool = False,
+        token: Optional[str] = None,
+    ) -> None:
+        """Adds mapped pairs and marks their identifiers as queried in one transaction.
+
+        Args:
+            source (str): Source key.
+            pairs (Iterable[Tuple[str, str]]): Mapped (from, to) identifier pairs.
+            queried (Optional[Iterable[str]], optional): Identifiers which were queried, also those without any
+                mapped pair. Defaults to None (only the identifiers of the pairs).
+            complete (bool, optional): Mark the source as completely loaded, replacing all previous entries.
+                Defaults to False.
+            token (Optional[str], optional): Version token stored with a complete source. Defaults to None.
+        """
+        pairs = [(str(from_id), str(to_id)) for from_id, to_id in pairs]
+        queried_ids: Set[str] = set(from_id for from_id, _ in pairs)
+        if queried is not None:
+            queried_ids.update(str(from_id) for from_id in queried)
+        with self._transaction() as con:
+            if complete:
+                con.execute("DELETE FROM mapping WHERE source = ?", (source,))
+                con.execute("DELETE FROM queried WHERE source = ?", (source,))
+            else:
+                con.executemany(
+                    "DELETE FROM mapping WHERE source = ? AND from_id = ?",
+                    ((source, from_id) for from_id in queried_ids),
+                )
+            con.executemany("INSERT INTO mapping VALUES (?, ?, ?)", ((source, *pair) for pair in pairs))
+            con.executemany(
+                "INSERT OR IGNORE INTO queried VALUES (?, ?)", ((source, from_id) for from_id in queried_ids)
+            )
+            if complete:
+                con.execute("INSERT OR REPLACE INTO complete_sources VALUES (?, ?)", (source, token))
+
+
+def file_token(path: Union[str, Path]) -> str:
+    """Fingerprint of a file (resolved path, size and modification time) to detect changed flat files."""
+    path = Path(path).resolve()
+    stat = path.stat()
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def read_mapping_file(
+    path: Union[str, Path],
+    from_column: Optional[Union[str, int]] = None,
+    to_column: Optional[Union[str, int]] = None,
+    sep: str = "\t",
+    to_separator: Optional[str] = None,
+    id_type: Optional[str] = None,
+    chunksize: int = 10**6,
+) -> pd.DataFrame:
+    """Reads identifier pairs from a downloaded flat file.
+
+    Supports tabular exports with a header line (e.g. a UniProt search result with "Entry" and "Gene Names" columns
+    or a BioMart export) and the three column UniProt "idmapping.dat" format (accession, identifier type,
+    identifier) if an identifier type is given. Compressed files are decompressed based on their suffix.
+
+    Args:
+        path (Union[str, Path]): The flat file.
+        from_column (Optional[Union[str, int]], optional): Name or position of the source identifier column.
+            Defaults to None (the first column).
+        to_column (Optional[Union[str, int]], optional): Name or position of the target identifier column.
+            Defaults to None (the second column).
+        sep (str, optional): Column separator. Defaults to "\\t".
+        to_separator (Optional[str], optional): Separator of several target identifiers within one field
+            (e.g. " " for UniProt gene names). Defaults to None.
+        id_type (Optional[str], optional): Identifier type to keep from an "idmapping.dat" file. Defaults to None.
+        chunksize (int, optional): Number of lines parsed at once. Defaults to 10**6.
+
+    Returns:
+        pd.DataFrame: Mapped pairs with columns "from" and "to".
+    """
+    if id_type is not None:
+        reader = pd.read_csv(path, sep=sep, header=None, names=["from", "type", "to"], dtype=str, chunksize=chunksize)
+    else:
+        reader = pd.read_csv(path, sep=sep, dtype=str, chunksize=chunksize)
+    res: List[pd.DataFrame] = []
+    for chunk in reader:
+        if id_type is not None:
+            chunk = chunk.loc[chunk["type"] == id_type, ["from", "to"]]
+        else:
+            columns = [
+                chunk.columns[column] if isinstance(column, int) else column
+                for column in [0 if from_column is None else from_column, 1 if to_column is None else to_column]
+            ]
+            chunk = chunk[columns].set_axis(["from", "to"], axis=1)
+        chunk = chunk.dropna()
+        if to_separator is not None:
+            chunk = chunk.assign(to=chunk["to"].str.split(to_separator)).explode("to")
+            chunk = chunk[chunk["to"] != ""]
+        res.append(chunk)
+    if not res:
+        return pd.DataFrame(columns=["from", "to"])
+    return pd.concat(res, ignore_index=True)
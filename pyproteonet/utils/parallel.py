@@ -0,0 +1,104 @@
+from typing import Callable, Iterable, Iterator, List, TypeVar, Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def thread_map(fn: Callable[[T], R], items: Iterable[T], num_workers: int = 8) -> Iterator[R]:
+    """Applies a function to all items with a thread pool, yielding the results in item order.
+
+    Meant for IO bound work like reading files from (network) storage. Only a bounded number of items is processed ahead
+    of the consumer, so results do not pile up in memory. With one worker everything runs in the calling thread.
+
+    Args:
+        fn (Callable[[T], R]): Function to apply.
+        items (Iterable[T]): Items to apply the function to.
+        num_workers (int, optional): Number of threads. Defaults to 8.
+
+    Yields:
+        R: The function results in the order of the items.
+    """
+    if num_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= 2 * num_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _read_bytes(path: Union[str, Path]) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_files_parallel(paths: Iterable[Union[str, Path]], num_workers: int = 8) -> Iterator[bytes]:
+    """Reads the full contents of many files concurrently, yielding them in the order of the given paths.
+
+    Args:
+        paths (Iterable[Union[str, Path]]): Files to read.
+        num_workers (int, optional): Number of threads. Defaults to 8.
+
+    Yields:
+        bytes: The file contents.
+    """
+    return thread_map(_read_bytes, paths, num_workers=num_workers)
+
+
+@contextmanager
+def in_memory_hdf_store(content: bytes, name: str = "store.h5"):
+    """Opens the image of an HDF5 file (e.g. read with read_files_parallel) as read only pandas HDFStore.
+
+    HDF5 is not thread safe, so files are read concurrently and parsed from memory afterwards. The HDF5 core driver
+    needs a file name that does not exist on disk, so the store is named after a path in a fresh temporary directory.
+
+    Args:
+        content (bytes): The file contents.
+        name (str, optional): File name used for the store. Defaults to "store.h5".
+
+    Yields:
+        pd.HDFStore: The opened store.
+    """
+    import pandas as pd
+
+    with TemporaryDirectory() as tmp_dir:
+        with pd.HDFStore(
+            str(Path(tmp_dir) / name),
+            mode="r",
+            driver="H5FD_CORE",
+            driver_core_image=content,
+            driver_core_backing_store=0,
+        ) as store:
+            yield store
+
+
+def process_map(fn: Callable[[T], R], items: Iterable[T], num_workers: int = 4) -> List[R]:
+    """Applies a function to all items with a process pool, returning the results in item order.
+
+    Meant for CPU bound work holding the GIL (e.g. pure Python loops over sequences). The function and the items
+    must be picklable, so pass chunks of work rather than single small items. With one worker (or a single item)
+    everything runs in the calling process.
+
+    Args:
+        fn (Callable[[T], R]): Function to apply (must be defined at module level).
+        items (Iterable[T]): Items to apply the function to.
+        num_workers (int, optional): Number of processes. Defaults to 4.
+
+    Returns:
+        List[R]: The function results in the order of the items.
+    """
+    items = list(items)
+    if num_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(items))) as executor:
+        return list(executor.map(fn, items))
@@ -1,19 +1,22 @@
 from typing import Optional, Union, List
 from io import StringIO
+from pathlib import Path
 import requests
 
 import pandas as pd
 from tqdm.auto import tqdm
-from pyopenms import ProteaseDigestion, AASequence
 
 from ..data.molecule_set import MoleculeSet
 from ..data.dataset import Dataset
+from .mapping_cache import MappingCache, read_mapping_file
+from .parallel import thread_map
 
 
 import re
 import time
 import json
 import zlib
+from functools import partial
 from xml.etree import ElementTree
 from urllib.parse import urlparse, parse_qs, urlencode
 import requests
@@ -24,11 +27,40 @@ POLLING_INTERVAL = 3
 API_URL = "https://rest.uniprot.org"
 
 class UniprotMapper:
+    """Maps identifiers with the UniProt ID mapping service.
 
-    def __init__(self):
+    With a cache directory, all mapped (and unmappable) identifiers are stored in a local SQLite database and only
+    identifiers never queried before are sent to UniProt. Downloaded UniProt flat files can be bulk loaded into the
+    cache (see `load_flat_file`), so mapping also works offline.
+
+    Args:
+        cache_dir (Optional[Union[str, Path]], optional): Directory of the persistent mapping cache.
+            Defaults to None (no cache).
+        offline (bool, optional): Only use the cache, identifiers not found in it are left unmapped.
+            Defaults to False.
+        num_workers (int, optional): Number of mapping jobs run concurrently. Defaults to 4.
+        batch_size (int, optional): Number of identifiers submitted per mapping job. Defaults to 10000.
+        api_url (str, optional): Base URL of the UniProt REST API. Defaults to API_URL.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = None,
+        offline: bool = False,
+        num_workers: int = 4,
+        batch_size: int = 10000,
+        api_url: str = API_URL,
+    ):
         self.retries = Retry(total=5, backoff_factor=0.25, status_forcelist=[500, 502, 503, 504])
         self.session = requests.Session()
         self.session.mount("https://", HTTPAdapter(max_retries=self.retries))
+        self.session.mount("http://", HTTPAdapter(max_retries=self.retries))
+        self.cache = MappingCache(cache_dir) if cache_dir is not None else None
+        self.offline = offline
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.api_url = api_url
+        self.polling_interval = POLLING_INTERVAL
 
 
     def check_response(self, response):
@@ -39,8 +71,8 @@ class UniprotMapper:
 
 
     def submit_id_mapping(self, from_db, to_db, ids):
-        request = requests.post(
-            f"{API_URL}/idmapping/run",
+        request = self.session.post(
+            f"{self.api_url}/idmapping/run",
             data={"from": from_db, "to": to_db, "ids": ",".join(ids)},
         )
         self.check_response(request)
@@ -58,16 +90,18 @@ class UniprotMapper:
 
     def check_id_mapping_results_ready(self, job_id, verbose: bool = False):
         while True:
-            request = self.session.get(f"{API_URL}/idmapping/status/{job_id}")
+            request = self.session.get(f"{self.api_url}/idmapping/status/{job_id}")
             self.check_response(request)
             j = request.json()
             if verbose:
                 print(j)
             if "jobStatus" in j:
-                if j["jobStatus"] == "RUNNING":
+                if j["jobStatus"] in ("NEW", "RUNNING"):
                     if verbose:
-                        print(f"Retrying in {POLLING_INTERVAL}s")
-                    time.sleep(POLLING_INTERVAL)
+                        print(f"Retrying in {self.polling_interval}s")
+                    time.sleep(self.polling_interval)
+                elif j["jobStatus"] == "FINISHED":
+                    return True
                 else:
                     raise Exception(j["jobStatus"])
             else:
@@ -96,10 +130,9 @@ class UniprotMapper:
 
 
     def get_id_mapping_results_link(self, job_id):
-        url = f"{API_URL}/idmapping/details/{job_id}"
+        url = f"{self.api_url}/idmapping/details/{job_id}"
         request = self.session.get(url)
         self.check_response(request)
-        import pdb; pdb.set_trace()
         return request.json()["redirectURL"]
 
 
@@ -187,18 +220,84 @@ class UniprotMapper:
         return self.decode_results(request, file_format, compressed)
 
 
-    def map_uniprot(self, ids: pd.Series, to_db: str, from_db: str = "UniProtKB_AC-ID", verbose: bool = False):
-        ids = ids.drop_duplicates()
-        ids_t = (pd.Series(ids.index.values, index=ids))
-        job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=list(ids_t.index))
-        #if self.check_id_mapping_results_ready(job_id, verbose=verbose):
+    @staticmethod
+    def _source(to_db: str, from_db: str) -> str:
+        return f"uniprot:{from_db}:{to_db}"
+
+    def _map_batch(self, ids: List[str], to_db: str, from_db: str, verbose: bool = False) -> List[dict]:
+        # one mapping job: submit, wait until finished and fetch all result pages
+        job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=ids)
+        self.check_id_mapping_results_ready(job_id, verbose=verbose)
         link = self.get_id_mapping_results_link(job_id)
-        results = self.get_id_mapping_results_search(link, verbose=verbose)
         # Equivalently using the stream endpoint which is more demanding
         # on the API and so is less stable:
         # results = get_id_mapping_results_stream(link)
-        results = pd.DataFrame(results['results'])
-        results.loc[:, 'from']=results['from'].map(ids_t)
+        return self.get_id_mapping_results_search(link, verbose=verbose)["results"]
+
+    def load_flat_file(
+        self,
+        path: Union[str, Path],
+        to_db: str,
+        from_db: str = "UniProtKB_AC-ID",
+        from_column: Optional[Union[str, int]] = None,
+        to_column: Optional[Union[str, int]] = None,
+        sep: str = "\t",
+        to_separator: Optional[str] = None,
+        id_type: Optional[str] = None,
+    ) -> int:
+        """Bulk loads mappings from a downloaded UniProt flat file into the cache.
+
+        All source identifiers of the file are marked as queried, so they are never sent to UniProt afterwards.
+        See `read_mapping_file` for the supported formats.
+
+        Args:
+            path (Union[str, Path]): The flat file (e.g. a tsv search result export or "idmapping.dat").
+            to_db (str): Target database (as used by the ID mapping service, e.g. "Gene_Name").
+            from_db (str, optional): Source database. Defaults to "UniProtKB_AC-ID".
+            from_column (Optional[Union[str, int]], optional): Source identifier column. Defaults to None (first).
+            to_column (Optional[Union[str, int]], optional): Target identifier column. Defaults to None (second).
+            sep (str, optional): Column separator. Defaults to "\\t".
+            to_separator (Optional[str], optional): Separator of several targets within one field. Defaults to None.
+            id_type (Optional[str], optional): Identifier type to keep from an "idmapping.dat" file. Defaults to None.
+
+        Returns:
+            int: Number of loaded mapping pairs.
+        """
+        if self.cache is None:
+            raise ValueError("Loading flat files requires a cache directory.")
+        pairs = read_mapping_file(
+            path, from_column=from_column, to_column=to_column, sep=sep, to_separator=to_separator, id_type=id_type
+        )
+        self.cache.put(
+            self._source(to_db=to_db, from_db=from_db),
+            zip(pairs["from"], pairs["to"].map(json.dumps)),
+            queried=pairs["from"].unique(),
+        )
+        return len(pairs)
+
+    def map_uniprot(self, ids: pd.Series, to_db: str, from_db: str = "UniProtKB_AC-ID", verbose: bool = False):
+        ids = ids.drop_duplicates()
+        ids_t = (pd.Series(ids.index.values, index=ids))
+        labels = dict(zip(ids_t.index.astype(str), ids_t.values))
+        source = self._source(to_db=to_db, from_db=from_db)
+        to_query = list(labels.keys())
+        results = []
+        if self.cache is not None:
+            cached = self.cache.get(source, to_query)
+            results.extend({"from": from_id, "to": json.loads(to)} for from_id, to in zip(cached["from"], cached["to"]))
+            queried = self.cache.queried(source, to_query)
+            to_query = [from_id for from_id in to_query if from_id not in queried]
+        if to_query and not self.offline:
+            batches = [to_query[start : start + self.batch_size] for start in range(0, len(to_query), self.batch_size)]
+            map_fn = partial(self._map_batch, to_db=to_db, from_db=from_db, verbose=verbose)
+            for batch, batch_results in zip(batches, thread_map(map_fn, batches, num_workers=self.num_workers)):
+                if self.cache is not None:
+                    self.cache.put(source, ((r["from"], json.dumps(r["to"])) for r in batch_results), queried=batch)
+                results.extend(batch_results)
+        results = pd.DataFrame(results, columns=["from", "to"])
+        positions = {from_id: i for i, from_id in enumerate(labels.keys())}
+        results = results.iloc[results["from"].map(positions).fillna(len(positions)).argsort(kind="stable")]
+        results.loc[:, 'from']=results['from'].map(labels)
         results.set_index('from', drop=True, inplace=True)
         results.index.set_names(ids.index.names, inplace=True)
         return results['to']
@@ -246,7 +345,6 @@ def map_protein_sequence(
         # data = data.encode('ascii')
         response = requests.get(base_url, params=params)
         df_result = pd.read_csv(StringIO(response.content.decode("utf-8")), sep="\t")
-        import pdb; pdb.set_trace()
         df_result.columns = ["entry", "sequence"]
         results.append(df_result)
         while "Link" in response.headers:
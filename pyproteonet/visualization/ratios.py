@@ -1,5 +1,6 @@
 from typing import List, Optional, Iterable, Union, Tuple
 from warnings import warn
+import warnings
 import math
 
 from matplotlib import pyplot as plt
@@ -104,14 +105,13 @@ def plot_ratios_volcano(
         sample_group = values.loc[:, sample_group]
         if molecule_ids is not None:
             sample_group = sample_group.loc[molecule_ids]
-        sample_group = sample_group.stack(dropna=False)
-        sample_group.index.rename(names="id", level=0, inplace=True)
-        grouped = sample_group.groupby("id")
-        group_mean = grouped.mean()
-        non_na = (~sample_group.isna()).groupby("id").sum()
-        not_enough_evidence = non_na[~(non_na >= min_samples)].index
-        group_mean.loc[not_enough_evidence] = np.nan
-        groups.append(group_mean)
+        group_values = sample_group.to_numpy()
+        non_na = (~np.isnan(group_values)).sum(axis=1)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            group_mean = np.nanmean(group_values, axis=1)
+        group_mean[~(non_na >= min_samples)] = np.nan
+        groups.append(pd.Series(group_mean, index=sample_group.index))
     if ax is None:
         fig, ax = plt.subplots()
     abundances = pd.DataFrame({"a": groups[0], "b": groups[1]})
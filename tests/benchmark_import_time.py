@@ -0,0 +1,54 @@
+"""Guards the import time of the data layer and the IO functions.
+
+Every import is run in a fresh interpreter so already imported modules do not distort the timings.
+Fails if one of the heavy optional backends is pulled in at import time or if importing takes too long.
+"""
+import subprocess
+import sys
+import json
+
+MODULES = ["pyproteonet.data", "pyproteonet.io"]
+HEAVY_BACKENDS = ["torch", "dgl", "lightning", "matplotlib", "seaborn", "rpy2", "h5py", "pyopenms", "alphapept"]
+MAX_IMPORT_SECONDS = 1.0
+REPEATS = 3
+
+_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"duration": duration, "heavy": heavy}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _SNIPPET.format(module=module, heavy=HEAVY_BACKENDS)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    failed = False
+    for module in MODULES:
+        results = [measure_import(module) for _ in range(REPEATS)]
+        duration = min(r["duration"] for r in results)
+        heavy = results[0]["heavy"]
+        print(f"import {module}: {duration:.3f}s (best of {REPEATS})")
+        if heavy:
+            print(f"  ERROR: heavy backends imported eagerly: {', '.join(heavy)}")
+            failed = True
+        if duration > MAX_IMPORT_SECONDS:
+            print(f"  ERROR: import takes longer than {MAX_IMPORT_SECONDS}s")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("Done! Import time benchmark passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmarks the simulation of proteome sized molecule sets.
+
+Draws a peptide-protein graph of roughly the size of the human proteome from degree sequences and
+fails if the graph is not simple, the degrees are not kept or the simulation takes too long.
+"""
+import sys
+import time
+
+import numpy as np
+
+from pyproteonet.simulation.molecule_set import bipartite_configuration_model
+
+NUM_PROTEINS = 20_000
+NUM_PEPTIDES = 1_000_000
+MAX_SECONDS = 10.0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    peptide_degrees = rng.choice([1, 2, 3], p=[0.8, 0.15, 0.05], size=NUM_PEPTIDES)
+    # heavy tailed protein degrees with the same number of edges as the peptides
+    protein_weights = rng.lognormal(mean=0, sigma=1, size=NUM_PROTEINS)
+    protein_degrees = np.bincount(
+        rng.choice(NUM_PROTEINS, size=peptide_degrees.sum(), p=protein_weights / protein_weights.sum()),
+        minlength=NUM_PROTEINS,
+    )
+    start = time.perf_counter()
+    peptides, proteins = bipartite_configuration_model(degrees_a=peptide_degrees, degrees_b=protein_degrees, random_seed=1)
+    duration = time.perf_counter() - start
+    print(f"{NUM_PEPTIDES} peptides, {NUM_PROTEINS} proteins, {peptides.shape[0]} edges: {duration:.2f}s")
+    failed = False
+    if np.unique(peptides.astype(np.int64) * NUM_PROTEINS + proteins).shape[0] != peptides.shape[0]:
+        print("  ERROR: graph contains multi-edges")
+        failed = True
+    if not (
+        np.array_equal(np.bincount(peptides, minlength=NUM_PEPTIDES), peptide_degrees)
+        and np.array_equal(np.bincount(proteins, minlength=NUM_PROTEINS), protein_degrees)
+    ):
+        print("  ERROR: node degrees are not kept")
+        failed = True
+    if duration > MAX_SECONDS:
+        print(f"  ERROR: simulation takes longer than {MAX_SECONDS}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("Done! Molecule set simulation benchmark passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+import runpy
 from nbdev.test import test_nb
 from pathlib import Path
+import pytest
+
+runpy.run_path('./benchmark_import_time.py', run_name='__main__')
+runpy.run_path('./benchmark_molecule_set_simulation.py', run_name='__main__')
+
+exit_code = pytest.main(['-q', '.'])
+if exit_code != 0:
+    raise SystemExit(f"pytest failed with exit code {int(exit_code)}")
 
 test_nb(fn=Path('./sim_gnn_peptide_impute.ipynb'))
 test_nb(fn=Path('./data.ipynb'))
 test_nb(fn=Path('./top3.ipynb'))
 test_nb(fn=Path('./maxlfq.ipynb'))
-print("Done! All tests were run!")
\ No newline at end of file
+print("Done! All tests were run!")
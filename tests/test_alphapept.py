@@ -0,0 +1,41 @@
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('tables')
+
+from pyproteonet.io import load_alphapept_result
+
+
+def _write_result(base_path):
+    sequences = ['AAAK', 'CCCK', 'DDDR', 'EEEK', 'FFFR']
+    # protein names per peptide (CSR), CCCK is shared by two proteins of the same group, FFFR is only found as decoy
+    peptide_proteins = [['PA'], ['PA', 'PB'], ['PC'], ['PC'], ['PD']]
+    proteins = ['PA', 'PB', 'PC', 'PD']
+    with h5py.File(base_path / 'database.hdf', 'w') as database:
+        database['peptides/sequences'] = np.array(sequences, dtype='S')
+        database['peptides/protein_indices'] = np.array([proteins.index(p) for prots in peptide_proteins for p in prots])
+        database['peptides/protein_indptr'] = np.cumsum([0] + [len(prots) for prots in peptide_proteins])
+        database['proteins/name'] = np.array(proteins, dtype='S')
+    protein_fdr = pd.DataFrame({
+        'sequence': ['AAAK', 'CCCK', 'DDDR', 'AAAK', 'AAAK', 'EEEK', 'FFFR'],
+        'protein_group': ['PA,PB', 'PA,PB', 'PC', 'PA,PB', 'PA,PB', 'PC', 'PD'],
+        'sample_group': ['s1', 's1', 's1', 's2', 's2', 's2', 's2'],
+        'decoy': [False, False, False, False, False, False, True],
+        'ms1_int_sum_apex': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    })
+    protein_fdr.to_hdf(base_path / 'results.hdf', key='protein_fdr')
+
+
+def test_load_alphapept_result(tmp_path):
+    _write_result(tmp_path)
+    ds = load_alphapept_result(tmp_path, keep_spectra=False)
+    assert ds.sample_names == ['s1', 's2']
+    assert sorted(ds.molecules['protein_group'].index) == ['PA,PB', 'PC']
+    assert sorted(ds.molecules['peptide'].index) == ['AAAK', 'CCCK', 'DDDR', 'EEEK']
+    mapping = ds.molecule_set.mappings['protein_group-peptide'].df
+    assert sorted(mapping.index) == [('PA,PB', 'AAAK'), ('PA,PB', 'CCCK'), ('PC', 'DDDR'), ('PC', 'EEEK')]
+    values = ds.get_samples_value_matrix(molecule='peptide', column='ms1_int_sum_apex').loc[['AAAK', 'CCCK', 'DDDR', 'EEEK']]
+    np.testing.assert_array_equal(values['s1'].to_numpy(), [1.0, 2.0, 3.0, np.nan])
+    np.testing.assert_array_equal(values['s2'].to_numpy(), [9.0, np.nan, np.nan, 6.0])
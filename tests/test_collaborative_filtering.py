@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('torch')
+
+from pyproteonet.data import Dataset
+from pyproteonet.imputation.dnn.collaborative_filtering import (
+    _iter_batches,
+    _write_ratings,
+    impute_collaborative_filtering,
+)
+from test_utils import create_random_dataset
+
+
+def _create_matrix(num_molecules: int = 40, num_samples: int = 6) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(20, 2, size=(num_molecules, num_samples))
+    matrix[rng.random(matrix.shape) < 0.3] = np.nan
+    return matrix
+
+
+def _create_dataset(matrix: np.ndarray) -> Dataset:
+    return create_random_dataset(
+        num_proteins=matrix.shape[0], num_peptides=0, num_samples=matrix.shape[1], columns={'protein': ['abundance']},
+        values={'protein': {'abundance': matrix}},
+    )
+
+
+def _ratings(tmp_path: Path, matrix: np.ndarray, seed: int, name: str):
+    out_dir = tmp_path / name
+    out_dir.mkdir()
+    return _write_ratings(matrix, out_dir=out_dir, rng=np.random.default_rng(seed), chunksize=20)
+
+
+def test_write_ratings_covers_observed_values(tmp_path):
+    matrix = _create_matrix()
+    items, samples, values = _ratings(tmp_path, matrix, seed=1, name='a')
+    rows, cols = np.nonzero(~np.isnan(matrix))
+    assert len(items) == len(rows)
+    assert set(zip(items.tolist(), samples.tolist())) == set(zip(rows.tolist(), cols.tolist()))
+    np.testing.assert_array_equal(values, matrix[items, samples].astype(np.float32))
+    same_seed = _ratings(tmp_path, matrix, seed=1, name='b')
+    for a, b in zip((items, samples, values), same_seed):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_iter_batches_visits_every_rating_once(tmp_path):
+    ratings = _ratings(tmp_path, _create_matrix(), seed=1, name='a')
+    epochs = [list(_iter_batches(ratings, batch_size=7, chunksize=30, rng=np.random.default_rng(2))) for _ in range(2)]
+    for batches in epochs:
+        assert all(len(b[0]) <= 7 for b in batches)
+        visited = sorted(zip(*[np.concatenate(b).tolist() for b in zip(*batches)]))
+        assert visited == sorted(zip(*[r.tolist() for r in ratings]))
+    for batch, batch_same_seed in zip(*epochs):
+        for a, b in zip(batch, batch_same_seed):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_impute_collaborative_filtering():
+    matrix = _create_matrix()
+    ds = _create_dataset(matrix)
+    kwargs = dict(molecule='protein', column='abundance', epochs=2, batch_size=16, cuda=False, random_seed=0)
+    imputed = impute_collaborative_filtering(ds, result_column='imputed', **kwargs)
+    assert imputed.shape == matrix.shape
+    assert imputed.index.equals(ds.molecules['protein'].index)
+    assert list(imputed.columns) == ds.sample_names
+    assert not imputed.isna().any().any()
+    observed = ~np.isnan(matrix)
+    np.testing.assert_allclose(imputed.to_numpy()[observed], matrix[observed])
+    # the result column is written flat like any other value column
+    written = ds.get_samples_value_matrix(molecule='protein', column='imputed')
+    pd.testing.assert_frame_equal(written, imputed, check_names=False, check_dtype=False)
+    pd.testing.assert_frame_equal(impute_collaborative_filtering(ds, **kwargs), imputed)
+
+
+def test_impute_collaborative_filtering_all_missing():
+    ds = _create_dataset(np.full((5, 3), np.nan))
+    with pytest.raises(ValueError, match='no observed values'):
+        impute_collaborative_filtering(ds, molecule='protein', column='abundance', epochs=1, cuda=False)
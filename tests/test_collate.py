@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+dgl = pytest.importorskip('dgl')
+import torch
+
+from pyproteonet.data.masked_dataset import MaskedDataset
+from pyproteonet.dgl.collate import HomogeneousGraphTemplate, masked_heterograph_to_homogeneous
+from test_utils import create_random_dataset
+
+
+def _create_masked_dataset() -> MaskedDataset:
+    ds = create_random_dataset(
+        num_proteins=6, num_peptides=15, shared_peptides=[(4, 2)],
+        columns={mol: ['abundance', 'feature'] for mol in ['protein', 'peptide']},
+    )
+    rng = np.random.default_rng(1)
+    samples = ds.sample_names
+    masks = {
+        mol: pd.DataFrame(rng.random((len(ds.molecules[mol]), 4)) < 0.4, index=ds.molecules[mol].index, columns=samples)
+        for mol in ['protein', 'peptide']
+    }
+    hidden = {'peptide': pd.DataFrame(rng.random((15, 4)) < 0.2, index=ds.molecules['peptide'].index, columns=samples)}
+    return MaskedDataset(dataset=ds, masks=masks, hidden=hidden)
+
+
+@pytest.mark.parametrize('samples', [None, ['s2', 's0']])
+def test_template_graph_equals_heterograph_conversion(samples):
+    md = _create_masked_dataset()
+    target, features = 'abundance', ['feature']
+    heterograph = md.to_dgl_graph(
+        feature_columns={mol: [target] + features for mol in md.dataset.molecules.keys()},
+        mappings=['peptide-protein'],
+        samples=samples,
+    )
+    expected = masked_heterograph_to_homogeneous([heterograph], target=target, features=features)[0]
+    template = HomogeneousGraphTemplate.from_molecule_set(md.dataset.molecule_set, mappings=['peptide-protein'])
+    graph = template.create_graph(masked_dataset=md, target=target, features=features, samples=samples)
+
+    assert graph.num_nodes() == expected.num_nodes()
+    edges = sorted(zip(*[e.tolist() for e in graph.edges()]))
+    assert edges == sorted(zip(*[e.tolist() for e in expected.edges()]))
+    # node order, ids/types and the one hot molecule type encoding all end up in the node data
+    assert set(graph.ndata.keys()) == set(expected.ndata.keys())
+    for key in expected.ndata.keys():
+        assert graph.ndata[key].dtype == expected.ndata[key].dtype, key
+        assert torch.equal(graph.ndata[key].nan_to_num(-1e6), expected.ndata[key].nan_to_num(-1e6)), key
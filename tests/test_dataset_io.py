@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.data import Dataset
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    return create_random_dataset(columns={'protein': ['abundance'], 'peptide': ['abundance', 'abundance_gt']})
+
+
+def _assert_same_values(ds: Dataset, loaded: Dataset):
+    assert loaded.sample_names == ds.sample_names
+    for sample in ds.sample_names:
+        for molecule, values in ds.samples_dict[sample].values.items():
+            pd.testing.assert_frame_equal(loaded.samples_dict[sample].values[molecule], values)
+
+
+@pytest.mark.parametrize('num_workers', [1, 4])
+def test_save_load(tmp_path, monkeypatch, num_workers):
+    ds = _create_dataset()
+    ds.save(tmp_path / 'dataset')
+    # a file named like a sample in the working directory must not interfere with parsing the in memory images
+    monkeypatch.chdir(tmp_path)
+    for name in ['s0.h5', 's0.in_memory.h5']:
+        (tmp_path / name).write_bytes(b'not a sample')
+    loaded = Dataset.load(tmp_path / 'dataset', num_workers=num_workers)
+    _assert_same_values(ds, loaded)
+
+
+def test_save_load_sample_wise(tmp_path):
+    # samples with non float columns are created one by one
+    ds = _create_dataset()
+    for sample in ds.samples:
+        sample.values['protein']['count'] = np.arange(10)
+    ds.save(tmp_path / 'dataset')
+    loaded = Dataset.load(tmp_path / 'dataset')
+    _assert_same_values(ds, loaded)
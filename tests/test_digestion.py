@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from pyproteonet.processing import digestion
+from pyproteonet.processing.digestion import DigestionCache, digest_sequences, sequence_hash
+
+
+def test_digestion_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(DigestionCache, '_QUERY_SIZE', 2)
+    cache = DigestionCache(tmp_path / 'cache')
+    assert cache.fp == tmp_path / 'cache' / 'digestion.sqlite'
+    peptides = {sequence_hash(f'SEQ{i}'): [f'PEP{i}A', f'PEP{i}B'] for i in range(5)}
+    peptides[sequence_hash('EMPTY')] = []
+    cache.put(peptides, 'Trypsin', 7, 30)
+    hashes = list(peptides.keys()) + [sequence_hash('UNKNOWN')]
+    # a new instance reads the persisted entries, queried in several chunks
+    assert DigestionCache(cache.fp).get(hashes, 'Trypsin', 7, 30) == peptides
+    # entries are keyed by enzyme and peptide lengths as well
+    assert cache.get(hashes, 'Lys-C', 7, 30) == {}
+    assert cache.get(hashes, 'Trypsin', 6, 30) == {}
+    cache.put({sequence_hash('SEQ0'): ['NEW']}, 'Trypsin', 7, 30)
+    assert cache.get([sequence_hash('SEQ0')], 'Trypsin', 7, 30) == {sequence_hash('SEQ0'): ['NEW']}
+
+
+def test_digest_sequences_from_cache(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('all sequences should be taken from the cache')
+
+    monkeypatch.setattr(digestion, 'process_map', fail)
+    cached = {'AAAK': ['AAAK'], 'BBBKCCCR': ['BBBK', 'CCCR'], 'DDD': []}
+    cache = DigestionCache(tmp_path / 'digestion.sqlite')
+    cache.put({sequence_hash(seq): peps for seq, peps in cached.items()}, 'Trypsin', 7, 30)
+    sequences = pd.Series(['BBBKCCCR', 'AAAK', 'DDD', 'BBBKCCCR', 'AAAK'], index=['P1', 'P2', 'P3', 'P4', 'P5'])
+    res = digest_sequences(sequences, cache=tmp_path / 'digestion.sqlite')
+    assert len(res) == 5
+    np.testing.assert_array_equal(res.offsets, [0, 2, 3, 3, 5, 6])
+    np.testing.assert_array_equal(res.counts, [2, 1, 0, 2, 1])
+    np.testing.assert_array_equal(res.sequence_positions(), [0, 0, 1, 3, 3, 4])
+    assert res.peptides.tolist() == ['BBBK', 'CCCR', 'AAAK', 'BBBK', 'CCCR', 'AAAK']
+    for i, seq in enumerate(sequences):
+        assert res[i].tolist() == cached[seq]
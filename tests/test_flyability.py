@@ -0,0 +1,56 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from pyproteonet.data import Dataset
+from pyproteonet.aggregation import estimate_flyability_upper_bound
+from pyproteonet.simulation.mock import ProteinPeptideDatasetMocker
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    return create_random_dataset(
+        num_proteins=20, num_peptides=100, shared_peptides=[(7, 1)], mean=10, std=2, log_normal=True
+    )
+
+
+def test_flyability_cache_follows_value_changes():
+    ds = _create_dataset()
+    kwargs = dict(mapping='peptide-protein', remove_one=False)
+    first = estimate_flyability_upper_bound(ds, **kwargs)
+    assert first.equals(estimate_flyability_upper_bound(ds, use_cache=False, **kwargs))
+    assert estimate_flyability_upper_bound(ds, **kwargs).equals(first)
+
+    ds.samples_dict['s1'].values['peptide'].loc[1, 'abundance'] = 1e9
+    changed = estimate_flyability_upper_bound(ds, **kwargs)
+    assert changed.equals(estimate_flyability_upper_bound(ds, use_cache=False, **kwargs))
+    assert not np.allclose(changed.values, first.values, equal_nan=True)
+
+    ds.values['peptide']['abundance'] = ds.values['peptide']['abundance'] * 2
+    doubled = estimate_flyability_upper_bound(ds, **kwargs)
+    assert doubled.equals(estimate_flyability_upper_bound(ds, use_cache=False, **kwargs))
+    assert np.allclose(doubled.values, changed.values, equal_nan=True)
+
+
+def test_dataset_with_flyability_cache_is_picklable():
+    ds = _create_dataset()
+    kwargs = dict(mapping='peptide-protein', remove_one=False)
+    first = estimate_flyability_upper_bound(ds, **kwargs)
+    assert ds.flyability_cache
+    loaded = pickle.loads(pickle.dumps(ds))
+    assert loaded.flyability_cache == {}
+    assert ds.flyability_cache
+    assert estimate_flyability_upper_bound(loaded, **kwargs).equals(first)
+    assert loaded.flyability_cache
+
+
+def test_mocker_is_picklable():
+    ds = _create_dataset()
+    mocker = ProteinPeptideDatasetMocker(dataset=ds, mapping='peptide-protein', column='abundance')
+    loaded = pickle.loads(pickle.dumps(mocker))
+    assert loaded.flyability_dist == mocker.flyability_dist
+    np.testing.assert_array_equal(
+        loaded.dataset.get_samples_value_tensor(molecule='peptide', columns=['abundance']),
+        ds.get_samples_value_tensor(molecule='peptide', columns=['abundance']),
+    )
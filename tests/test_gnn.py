@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('dgl')
+pytest.importorskip('lightning')
+import torch
+
+from pyproteonet.data import Dataset
+from pyproteonet.imputation.dnn.gnn.homogeneous import impute_homogeneous_gnn
+from pyproteonet.imputation.dnn.gnn.heterogeneous import impute_heterogeneous_gnn
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    return create_random_dataset(
+        num_proteins=8, num_peptides=30, num_samples=5, shared_peptides=[(5, 3)],
+        columns={'protein': ['abundance'], 'peptide': ['abundance']}, mean=10,
+    )
+
+
+@pytest.mark.parametrize(
+    'impute_fn, result_kwargs',
+    [
+        (impute_homogeneous_gnn, dict(result_column='result', partner_result_column='partner_result')),
+        (impute_heterogeneous_gnn, dict(molecule_result_column='result', partner_result_column='partner_result')),
+    ],
+)
+def test_sample_wise_prediction_batches_match_single_samples(impute_fn, result_kwargs):
+    results = []
+    # 2 does not divide the 5 samples, so the last batch is smaller
+    for prediction_batch_size in [1, 2, 64]:
+        ds = _create_dataset()
+        # without training the predictions only depend on the seeded initial weights
+        torch.manual_seed(0)
+        impute_fn(ds, molecule='protein', mapping='peptide-protein', column='abundance', partner_column='abundance',
+                  train_sample_wise=True, max_epochs=0, prediction_batch_size=prediction_batch_size, **result_kwargs)
+        results.append((ds.values['protein']['result'], ds.values['peptide']['partner_result']))
+    for result, partner_result in results:
+        assert not result.isna().any() and not partner_result.isna().any()
+        pd.testing.assert_series_equal(result, results[0][0], check_exact=False, rtol=1e-5)
+        pd.testing.assert_series_equal(partner_result, results[0][1], check_exact=False, rtol=1e-5)
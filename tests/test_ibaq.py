@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyopenms')
+
+from pyproteonet.data import Dataset, MoleculeSet
+from pyproteonet.aggregation.ibaq import iBAQ
+
+
+def test_ibaq_missing_values():
+    proteins = pd.DataFrame(
+        {'sequence': ['MAAAAAAKGGGGGGGRLLLLLLLK', 'PEPTIDEK', 'MSSSSSSSSK', 'MAK']},
+        index=pd.Index(['P0', 'P1', 'P2', 'P3'], name='id'),
+    )
+    peptides = pd.DataFrame(index=pd.Index(np.arange(4), name='id'))
+    # P2 has no peptides, P3 has a peptide but is too short for any theoretical peptide
+    mapping = pd.DataFrame([(0, 'P0'), (1, 'P0'), (2, 'P1'), (3, 'P3')], columns=['peptide', 'protein'])
+    ms = MoleculeSet(molecules={'protein': proteins, 'peptide': peptides},
+                     mappings={'protein': mapping.set_index(['peptide', 'protein'])})
+    values = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, -1.0], [7.0, 8.0]])
+    ds = Dataset.from_value_matrices(molecule_set=ms, sample_names=['a', 'b'], values={'peptide': {'abundance': values}},
+                                     missing_value=-1.0)
+    result = iBAQ(ds, num_workers=1).get_samples_value_matrix(molecule='protein')
+    num_peptides = {'P0': 3, 'P1': 1}
+    np.testing.assert_allclose(result.loc['P0'], [4 / num_peptides['P0'], 6 / num_peptides['P0']])
+    assert result.loc['P1', 'a'] == 5 and result.loc['P1', 'b'] == -1
+    assert (result.loc[['P2', 'P3']] == -1).all().all()
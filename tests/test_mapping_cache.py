@@ -0,0 +1,143 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from pyproteonet.utils.uniprot import UniprotMapper
+from pyproteonet.processing import molecule_mapping
+from pyproteonet.processing.molecule_mapping import BiomartMapper
+
+
+class _UniprotHandler(BaseHTTPRequestHandler):
+    # minimal stand-in of the UniProt ID mapping service, identifiers starting with "X" have no match
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj, headers=None):
+        body = json.dumps(obj).encode()
+        self.send_response(200)
+        for key, value in {**(headers or {}), 'Content-Type': 'application/json'}.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        ids = parse_qs(body)['ids'][0].split(',')
+        server = self.server
+        with server.lock:
+            job_id = str(len(server.jobs))
+            server.jobs[job_id] = ids
+            server.calls['run'] += 1
+            server.calls['ids'].extend(ids)
+        self._json({'jobId': job_id})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.split('/')
+        base = f'http://127.0.0.1:{self.server.server_address[1]}/idmapping/results/{parts[-1]}'
+        if parts[2] == 'status':
+            self._json({'jobStatus': 'FINISHED'})
+        elif parts[2] == 'details':
+            self._json({'redirectURL': base})
+        else:
+            ids = [i for i in self.server.jobs[parts[3]] if not i.startswith('X')]
+            size, cursor = int(query['size'][0]), int(query.get('cursor', ['0'])[0])
+            with self.server.lock:
+                self.server.calls['pages'] += 1
+            headers = {'x-total-results': str(len(ids))}
+            if cursor + size < len(ids):
+                headers['Link'] = f'<{base}?size={size}&cursor={cursor + size}>; rel="next"'
+            self._json({'results': [{'from': i, 'to': 'G' + i} for i in ids[cursor : cursor + size]]}, headers)
+
+
+@pytest.fixture
+def uniprot_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _UniprotHandler)
+    server.jobs, server.calls, server.lock = {}, {'run': 0, 'pages': 0, 'ids': []}, threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_uniprot_mapper_cache(uniprot_server, tmp_path):
+    url = f'http://127.0.0.1:{uniprot_server.server_address[1]}'
+    ids = pd.Series([f'P{i}' for i in range(1200)] + ['X1', 'P3'], index=[f'prot{i}' for i in range(1202)])
+    mapped = UniprotMapper(cache_dir=tmp_path, api_url=url, batch_size=1000).map_uniprot(ids, to_db='Gene_Name')
+    assert len(mapped) == 1200
+    assert mapped['prot5'] == 'GP5'
+    assert list(mapped.index[:3]) == ['prot0', 'prot1', 'prot2']
+    assert uniprot_server.calls['run'] == 2
+    assert sorted(uniprot_server.calls['ids']) == sorted(ids.unique())
+
+    # everything cached, the unmatched but queried "X1" is not submitted again
+    cached = UniprotMapper(cache_dir=tmp_path, api_url=url).map_uniprot(ids, to_db='Gene_Name')
+    assert cached.equals(mapped)
+    assert uniprot_server.calls['run'] == 2
+
+    # only new identifiers are submitted
+    more = pd.Series(['P1', 'P5000', 'X1'], index=['a', 'b', 'c'])
+    res = UniprotMapper(cache_dir=tmp_path, api_url=url).map_uniprot(more, to_db='Gene_Name')
+    assert res.to_dict() == {'a': 'GP1', 'b': 'GP5000'}
+    assert uniprot_server.calls['run'] == 3
+    assert uniprot_server.calls['ids'][-1:] == ['P5000']
+
+
+def test_uniprot_mapper_offline(uniprot_server, tmp_path):
+    url = f'http://127.0.0.1:{uniprot_server.server_address[1]}'
+    UniprotMapper(cache_dir=tmp_path, api_url=url).map_uniprot(pd.Series(['P1']), to_db='Gene_Name')
+    calls = uniprot_server.calls['run']
+    res = UniprotMapper(cache_dir=tmp_path, api_url=url, offline=True).map_uniprot(
+        pd.Series(['P1', 'Q9']), to_db='Gene_Name'
+    )
+    assert res.to_dict() == {0: 'GP1'}
+    assert uniprot_server.calls['run'] == calls
+
+
+def test_uniprot_mapper_load_flat_file(tmp_path):
+    fp = tmp_path / 'uniprot.tsv'
+    fp.write_text('Entry\tGene Names\nQ9\tA B\nQ8\t\nQ7\tC\n')
+    mapper = UniprotMapper(cache_dir=tmp_path)
+    assert mapper.load_flat_file(fp, to_db='Gene_Name', to_separator=' ') == 3
+    res = UniprotMapper(cache_dir=tmp_path, offline=True).map_uniprot(
+        pd.Series(['Q9', 'Q8', 'Q7', 'P2']), to_db='Gene_Name'
+    )
+    assert list(res.items()) == [(0, 'A'), (0, 'B'), (2, 'C')]
+
+
+def test_biomart_mapper_flat_file_cache(tmp_path, monkeypatch):
+    fp = tmp_path / 'biomart.tsv'
+    fp.write_text('Gene stable ID\tGene name\nENSG1\tA\nENSG2\tB\n')
+    reads = []
+    original_read = molecule_mapping.read_mapping_file
+
+    def read_mapping_file(path, *args, **kwargs):
+        reads.append(path)
+        return original_read(path, *args, **kwargs)
+
+    monkeypatch.setattr(molecule_mapping, 'read_mapping_file', read_mapping_file)
+
+    mapper = BiomartMapper('ensembl_gene_id', cache_dir=tmp_path, flat_file=fp)
+    assert mapper(pd.Series(['ENSG1.4', 'ENSG2', 'ENSG3'])).tolist() == ['A', 'B']
+    assert len(reads) == 1
+    # unchanged flat file: the cached table is used
+    BiomartMapper('ensembl_gene_id', cache_dir=tmp_path, flat_file=fp)
+    assert len(reads) == 1
+    offline = BiomartMapper('ensembl_gene_id', cache_dir=tmp_path, offline=True, skip_missing=False)
+    assert offline(pd.Series(['ENSG1', 'ENSG3'])).tolist() == ['A', 'NaN_Gene']
+
+    # a changed flat file is read again and replaces the cached table
+    fp.write_text('Gene stable ID\tGene name\nENSG1\tA1\nENSG3\tC\n')
+    changed = BiomartMapper('ensembl_gene_id', cache_dir=tmp_path, flat_file=fp)
+    assert len(reads) == 2
+    assert changed.mapping == {'ENSG1': 'A1', 'ENSG3': 'C'}
+    assert BiomartMapper('ensembl_gene_id', cache_dir=tmp_path, offline=True).mapping == changed.mapping
+
+    with pytest.raises(KeyError):
+        BiomartMapper('other_attribute', cache_dir=tmp_path, offline=True)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.aggregation.maxlfq import maxlfq
+from test_utils import create_random_dataset
+
+
+# recorded with the implementation before delayed normalization and fractions were added
+EXPECTED = {
+    False: np.array([
+        [206471.7669773264, 73185.99210426198, 262984.8443755501, 2324.322447164247],
+        [6142.270459260095, 99915.96201021841, 15898.72274256081, 462521.8439091894],
+        [9303.607087792761, 21600.55942619891, 10297.010173275034, 30952.23576073986],
+        [3576.814956893504, 9463.340093528408, 30960.548160956678, 176367.52629459256],
+        [12594.726963228992, 28198.229404887705, 81250.97356977826, 257529.6117924451],
+        [11994.273198519997, 2377.8530099571562, 104382.90484350592, 445647.45766643103],
+    ]),
+    True: np.array([
+        [12.238062499999995, 11.200624999999992, 12.479999999999995, 7.750812499999987],
+        [8.723149999999997, 11.512024999999998, 9.673899999999998, 13.044524999999997],
+        [9.13865277777778, 9.980527777777782, 9.239402777777784, 10.340527777777783],
+        [8.182321428571427, 9.155321428571431, 10.340321428571428, 12.08032142857143],
+        [9.440875000000002, 10.246875000000003, 11.305250000000003, 12.459],
+        [9.392124999999998, 7.774124999999993, 11.555874999999997, 13.007375],
+    ]),
+}
+
+
+def _create_dataset(log_normal: bool = True, values=None):
+    return create_random_dataset(
+        num_proteins=6, num_peptides=24, num_samples=4, shared_peptides=[(5, 1)], mean=10, std=2,
+        log_normal=log_normal, decimals=3, missing_frac=0.3, values=values,
+    )
+
+
+def _maxlfq(ds, **kwargs):
+    return maxlfq(ds, molecule='protein', mapping='peptide-protein', partner_column='abundance', **kwargs)
+
+
+@pytest.mark.parametrize('is_log', [False, True])
+def test_maxlfq_matches_recorded_result(is_log):
+    ds = _create_dataset(log_normal=not is_log)
+    res = _maxlfq(ds, is_log=is_log, result_column='maxlfq')
+    assert res.index.names == ['sample', 'id']
+    np.testing.assert_allclose(res.unstack('sample').to_numpy(), EXPECTED[is_log], rtol=1e-12)
+    np.testing.assert_allclose(ds.get_samples_value_matrix(molecule='protein', column='maxlfq').to_numpy(),
+                               EXPECTED[is_log], rtol=1e-12)
+
+
+def test_maxlfq_fractions():
+    ds = _create_dataset()
+    fractions = {'s0': ('A', 1), 's1': ('A', 2), 's2': ('B', 1), 's3': ('B', 2)}
+    res = _maxlfq(ds, fractions=fractions, result_column='maxlfq').unstack('sample')
+    assert list(res.columns) == ['A', 'B']
+    # the same as aggregating the summed fractions of every sample group
+    values = ds.get_samples_value_matrix(molecule='peptide', column='abundance').to_numpy()
+    summed = np.stack([np.nansum(values[:, [0, 1]], axis=1), np.nansum(values[:, [2, 3]], axis=1)], axis=1)
+    summed[np.isnan(values[:, [0, 1]]).all(axis=1), 0] = np.nan
+    summed[np.isnan(values[:, [2, 3]]).all(axis=1), 1] = np.nan
+    summed_ds = create_random_dataset(
+        num_proteins=6, num_peptides=24, num_samples=2, shared_peptides=[(5, 1)], values={'peptide': {'abundance': summed}}
+    )
+    expected = _maxlfq(summed_ds).unstack('sample')
+    np.testing.assert_allclose(res.to_numpy(), expected.loc[res.index].to_numpy(), rtol=1e-12, equal_nan=True)
+    # the group result is written to every member sample
+    written = ds.get_samples_value_matrix(molecule='protein', column='maxlfq').loc[res.index]
+    for sample, (group, _) in fractions.items():
+        np.testing.assert_allclose(written[sample].to_numpy(), res[group].to_numpy(), equal_nan=True)
+
+
+def test_maxlfq_normalize():
+    ds = _create_dataset()
+    values = ds.get_samples_value_matrix(molecule='peptide', column='abundance').to_numpy()
+    res = _maxlfq(ds, normalize=True)
+    # normalization removes sample wise scaling (as long as the factors stay within the bounds of 0.01 and 1)
+    scaled_ds = _create_dataset(values={'peptide': {'abundance': values * np.array([1.0, 2.0, 0.5, 4.0])}})
+    scaled = _maxlfq(scaled_ds, normalize=True)
+    ratio = (scaled / res).to_numpy()
+    np.testing.assert_allclose(ratio, ratio[0], rtol=1e-5)
+    # log transformed input gives the log transformed result
+    log_ds = _create_dataset(values={'peptide': {'abundance': np.log(values)}})
+    log_res = _maxlfq(log_ds, normalize=True, is_log=True)
+    np.testing.assert_allclose(log_res.to_numpy(), np.log(res.to_numpy()), rtol=1e-10)
+    assert not np.allclose(log_res.to_numpy(), np.log(_maxlfq(ds).to_numpy()))
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import approx_fprime
+
+from pyproteonet.normalization.maxlfq import get_total_error, get_total_error_gradient, normalize_maxlfq
+from test_utils import create_random_dataset
+
+
+def _create_dataset(sample_factors: np.ndarray, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    num_peptides = 200
+    intensities = np.exp(rng.normal(10, 1, size=(num_peptides, 1)))
+    values = intensities * sample_factors * np.exp(rng.normal(0, 0.1, size=(num_peptides, len(sample_factors))))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    return create_random_dataset(
+        num_peptides=num_peptides, num_samples=len(sample_factors), values={'peptide': {'abundance': values}}
+    )
+
+
+def test_least_squares_matches_slsqp():
+    sample_factors = np.array([1.0, 0.5, 2.0, 0.8, 1.5, 3.0])
+    ds = _create_dataset(sample_factors)
+    kwargs = dict(molecule='peptide', column='abundance')
+    least_squares = normalize_maxlfq(ds, method='least_squares', **kwargs)
+    slsqp = normalize_maxlfq(ds, method='slsqp', **kwargs)
+    np.testing.assert_allclose(least_squares.to_numpy(), slsqp.to_numpy(), rtol=1e-5)
+    # the simulated sample factors are recovered (up to a common scale)
+    raw = ds.values['peptide']['abundance']
+    factors = (raw / least_squares).dropna().groupby('sample').median()
+    factors = factors.loc[ds.sample_names].to_numpy()
+    np.testing.assert_allclose(factors / factors[0], sample_factors / sample_factors[0], rtol=0.05)
+
+
+def test_reference_subsampling():
+    ds = _create_dataset(np.array([1.0, 0.5, 2.0, 0.8]))
+    kwargs = dict(molecule='peptide', column='abundance', num_reference_molecules=50)
+    first = normalize_maxlfq(ds, random_seed=3, **kwargs)
+    pd.testing.assert_series_equal(normalize_maxlfq(ds, random_seed=3, **kwargs), first)
+    assert not normalize_maxlfq(ds, random_seed=4, **kwargs).equals(first)
+    # the same as normalizing with the drawn subset as reference molecules
+    ids = ds.molecules['peptide'].index
+    reference_ids = ids[np.sort(np.random.default_rng(3).choice(len(ids), size=50, replace=False))]
+    expected = normalize_maxlfq(ds, molecule='peptide', column='abundance', reference_ids=reference_ids)
+    pd.testing.assert_series_equal(first, expected)
+
+
+@pytest.mark.parametrize('num_fractions', [1, 3])
+def test_total_error_gradient(num_fractions):
+    rng = np.random.default_rng(0)
+    profiles = np.exp(rng.normal(5, 1, size=(num_fractions, 5, 30)))
+    profiles[rng.random(profiles.shape) < 0.3] = np.nan
+    normalization = rng.uniform(0.2, 1, size=num_fractions * 5)
+    numeric = approx_fprime(normalization, get_total_error, 1e-7, profiles)
+    np.testing.assert_allclose(get_total_error_gradient(normalization, profiles), numeric, rtol=1e-4, atol=1e-3)
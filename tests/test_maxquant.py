@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.io.maxquant import load_maxquant
+
+
+def _tables(tmp_path):
+    rng = np.random.default_rng(0)
+    samples = ['A', 'B', 'C']
+    peptides = pd.DataFrame({
+        'Sequence': [f'PEPTIDE{i}' for i in range(50)],
+        'Protein group IDs': [f'{i % 7};{(i + 1) % 7}' if i % 3 else str(i % 7) for i in range(50)],
+    })
+    peptide_values = rng.integers(0, 1000, size=(50, 3)).astype(float)
+    for i, s in enumerate(samples):
+        peptides[f'Intensity {s}'] = peptide_values[:, i]
+    protein_groups = pd.DataFrame({'Fasta headers': [f'>protein {i}' for i in range(7)]})
+    protein_values = rng.integers(0, 1000, size=(7, 3)).astype(float)
+    for i, s in enumerate(samples):
+        protein_groups[f'LFQ intensity {s}'] = protein_values[:, i]
+    peptides.to_csv(tmp_path / 'peptides.txt', sep='\t', index=False)
+    protein_groups.to_csv(tmp_path / 'proteinGroups.txt', sep='\t', index=False)
+    return samples, peptides, peptide_values, protein_groups, protein_values
+
+
+@pytest.mark.parametrize('from_file', [False, True])
+@pytest.mark.parametrize('chunksize', [8, 100000])
+def test_load_maxquant(tmp_path, from_file, chunksize):
+    samples, peptides, peptide_values, protein_groups, protein_values = _tables(tmp_path)
+    if from_file:
+        peptides, protein_groups = tmp_path / 'peptides.txt', tmp_path / 'proteinGroups.txt'
+    ds = load_maxquant(peptides, protein_groups_table=protein_groups, protein_group_value_columns=['LFQ intensity'],
+                       chunksize=chunksize)
+    assert ds.sample_names == samples
+    assert ds.molecules['peptide']['Sequence'].tolist() == [f'PEPTIDE{i}' for i in range(50)]
+    assert ds.molecules['protein_group'].index.name == 'id'
+    for molecule, column, expected in [('peptide', 'Intensity', peptide_values),
+                                       ('protein_group', 'LFQ intensity', protein_values)]:
+        expected = np.where(expected == 0, np.nan, expected)
+        actual = ds.get_samples_value_matrix(molecule=molecule, column=column).to_numpy()
+        np.testing.assert_array_equal(actual, expected)
+    mapping = ds.mappings['peptide-protein_group'].df.index
+    assert mapping.names == ['peptide', 'protein_group']
+    assert len(mapping) == 50 + sum(1 for i in range(50) if i % 3)
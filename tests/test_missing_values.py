@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from pyproteonet.simulation.missing_values import simulate_missing_values, simulate_mnars_thresholding
+from test_utils import create_random_dataset
+
+
+@pytest.mark.parametrize('missing_value', [np.nan, -1.0, 0.0])
+def test_simulate_missing_values_keeps_existing_missing_values(missing_value):
+    ds = create_random_dataset(num_peptides=200, mean=12, std=3, missing_value=missing_value)
+    values = ds.get_samples_value_tensor(molecule='peptide', columns=['abundance'])[0]
+    missing = np.isnan(values) if np.isnan(missing_value) else values == missing_value
+    assert missing.any()
+
+    # no value is below the threshold, so no new MNARs even though missing values are below it
+    _, mnar, _ = simulate_missing_values(ds, thresh_mu=-10, thresh_sigma=0, rng=0)
+    assert mnar.sum() == 0
+
+    res, mnar, mcar = simulate_missing_values(
+        ds, thresh_mu=10, thresh_sigma=0, mcar_amount=20, result_column='result', rng=0
+    )
+    mnar, mcar = mnar.to_numpy(), mcar.to_numpy()
+    np.testing.assert_array_equal(mnar, ~missing & (values < 10))
+    assert not (mcar & (missing | mnar)).any()
+    assert (mcar.sum(axis=0) == 20).all()
+    result = res.get_samples_value_tensor(molecule='peptide', columns=['result'])[0]
+    expected = values.copy()
+    expected[mnar | mcar] = missing_value
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('missing_value', [np.nan, -1.0])
+def test_simulate_missing_values_matches_sample_wise_thresholding(missing_value):
+    ds = create_random_dataset(num_peptides=200, mean=12, std=3, missing_value=missing_value)
+    res, _, _ = simulate_missing_values(ds, thresh_mu=10, thresh_sigma=0, rng=0)
+    expected = simulate_mnars_thresholding(ds, thresh_mu=10, thresh_sigma=0, rng=np.random.default_rng(0))
+    np.testing.assert_array_equal(
+        res.get_samples_value_tensor(molecule='peptide', columns=['abundance']),
+        expected.get_samples_value_tensor(molecule='peptide', columns=['abundance']),
+    )
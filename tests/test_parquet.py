@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.data import Dataset
+from pyproteonet.io import read_parquet, write_parquet
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    ds = create_random_dataset(
+        shared_peptides=[(9, 1)], columns={'protein': ['abundance'], 'peptide': ['abundance', 'abundance_gt']},
+        missing_value=-1,
+    )
+    ds.molecules['protein']['sequence'] = [f'SEQ{i}' for i in range(10)]
+    ds.molecules['peptide']['length'] = np.arange(40) % 7 + 5
+    return ds
+
+
+def _assert_same_values(ds: Dataset, loaded: Dataset, samples, molecule_ids={}):
+    assert loaded.sample_names == samples
+    for sample in samples:
+        for molecule, values in ds.samples_dict[sample].values.items():
+            if molecule in molecule_ids:
+                values = values.loc[molecule_ids[molecule]]
+            pd.testing.assert_frame_equal(loaded.samples_dict[sample].values[molecule], values)
+
+
+@pytest.mark.parametrize('layout', ['long', 'wide'])
+def test_parquet_round_trip(tmp_path, layout):
+    ds = _create_dataset()
+    write_parquet(ds, tmp_path / 'dataset', layout=layout)
+    loaded = read_parquet(tmp_path / 'dataset')
+    assert loaded.missing_value == -1
+    _assert_same_values(ds, loaded, samples=ds.sample_names)
+    for molecule, df in ds.molecules.items():
+        pd.testing.assert_frame_equal(loaded.molecules[molecule], df)
+    for name, mapping in ds.molecule_set.mappings.items():
+        assert loaded.molecule_set.mappings[name].mapping_molecules == mapping.mapping_molecules
+        pd.testing.assert_frame_equal(loaded.molecule_set.mappings[name].df, mapping.df)
+
+
+@pytest.mark.parametrize('layout', ['long', 'wide'])
+def test_parquet_filtered_read(tmp_path, layout):
+    ds = _create_dataset()
+    write_parquet(ds, tmp_path / 'dataset', layout=layout)
+    peptide_ids = [30, 2, 9, 18]
+    loaded = read_parquet(tmp_path / 'dataset', samples=['s3', 's1'], molecule_ids={'peptide': peptide_ids})
+    assert loaded.missing_value == -1
+    assert sorted(loaded.molecules['peptide'].index) == sorted(peptide_ids)
+    pd.testing.assert_frame_equal(loaded.molecules['protein'], ds.molecules['protein'])
+    mapping = ds.molecule_set.mappings['peptide-protein'].df
+    expected_mapping = mapping[mapping.index.get_level_values('peptide').isin(peptide_ids)]
+    pd.testing.assert_frame_equal(loaded.molecule_set.mappings['peptide-protein'].df, expected_mapping)
+    _assert_same_values(
+        ds, loaded, samples=['s3', 's1'], molecule_ids={'peptide': loaded.molecules['peptide'].index}
+    )
+
+    only_gt = read_parquet(tmp_path / 'dataset', molecules=['peptide'], columns=['abundance_gt'])
+    assert list(only_gt.samples_dict['s0'].values['peptide'].columns) == ['abundance_gt']
+    pd.testing.assert_series_equal(
+        only_gt.samples_dict['s2'].values['peptide']['abundance_gt'],
+        ds.samples_dict['s2'].values['peptide']['abundance_gt'],
+    )
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.data import Dataset
+from pyproteonet.aggregation.partner_summarization import partner_summary_matrix
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    # about 4 peptides per protein, some shared between two proteins, rounded values to get ties between the top values
+    return create_random_dataset(
+        num_proteins=30, num_peptides=120, num_samples=5, shared_peptides=[(11, 1), (13, 7)], mean=10, std=2,
+        decimals=0, missing_frac=0.4,
+    )
+
+
+def _top_n_reference(dataset: Dataset, top_n: int, min_partners: int, only_unique: bool) -> pd.DataFrame:
+    mapping = dataset.molecule_set.mappings['peptide-protein'].df.reset_index()
+    if only_unique:
+        mapping = mapping[mapping.groupby('peptide')['protein'].transform('size') == 1]
+    res = {}
+    for sample_name, sample in dataset.samples_dict.items():
+        abundance = sample.values['peptide']['abundance']
+        mapped = mapping.assign(abundance=abundance.loc[mapping.peptide].to_numpy())
+        grouped = mapped.groupby('protein')['abundance']
+        top = grouped.apply(lambda vals: vals.dropna().nlargest(top_n).mean())
+        top[grouped.count() < min_partners] = np.nan
+        res[sample_name] = top
+    return pd.DataFrame(res).rename_axis(columns='sample')
+
+
+@pytest.mark.parametrize('top_n', [1, 3, 5])
+@pytest.mark.parametrize('min_partners', [1, 3])
+@pytest.mark.parametrize('only_unique', [True, False])
+def test_top_n_mean_matches_nlargest(top_n, min_partners, only_unique):
+    ds = _create_dataset()
+    res = partner_summary_matrix(
+        ds, molecule='protein', mapping='peptide-protein', partner_column='abundance', top_n=top_n,
+        min_partners=min_partners, only_unique=only_unique, samples_per_block=2,
+    )
+    expected = _top_n_reference(ds, top_n=top_n, min_partners=min_partners, only_unique=only_unique)
+    expected = expected.loc[res.index]
+    assert (res.index == expected.index).all()
+    np.testing.assert_allclose(res.to_numpy(), expected.to_numpy(), rtol=1e-12, equal_nan=True)
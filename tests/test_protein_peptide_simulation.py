@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from pyproteonet.simulation import simulate_protein_peptide_dataset
+from test_utils import create_random_dataset
+
+
+def _simulate(condition_affected):
+    ms = create_random_dataset().molecule_set
+    return simulate_protein_peptide_dataset(
+        ms, mapping='peptide-protein', samples=['a', 'b', 'c'], log_protein_error_sigma=0, simulate_flyability=False,
+        peptide_poisson_error=False, peptide_noise_sigma=0, condition_samples=[['b']],
+        condition_affected=[condition_affected], log2_condition_means=[1], log2_condition_stds=[0], random_seed=0,
+    )
+
+
+def test_condition_scales_affected_proteins():
+    proteins = _simulate(['P3', 'P7']).get_samples_value_matrix(molecule='protein', column='abundance_gt')
+    ratio = proteins['b'] / proteins['a']
+    np.testing.assert_allclose(ratio[['P3', 'P7']], 2)
+    np.testing.assert_allclose(ratio.drop(['P3', 'P7']), 1)
+
+
+def test_condition_unknown_affected_proteins():
+    with pytest.raises(KeyError, match='X1'):
+        _simulate(['P3', 'X1'])
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.data import Dataset
+from pyproteonet.metrics import ratios
+from pyproteonet.metrics.ratios import caclulate_ratio_absolute_error, calculate_sample_pair_ratios
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    return create_random_dataset(
+        num_proteins=30, num_samples=7, columns={'protein': ['a', 'b']}, log_normal=True, missing_frac=0.2,
+        missing_columns=('a',),
+    )
+
+
+def _reduce_reference(full: pd.DataFrame) -> pd.DataFrame:
+    full = full.where(np.isfinite(full))
+    grouped = full.groupby(level=['nominator_sample', 'denominator_sample'], sort=False)
+    return pd.concat({'count': grouped.count(), 'mean': grouped.mean(), 'median': grouped.median()}, axis=1)
+
+
+# 60 ratios per sample pair: one pair per block, several denominator samples per block and whole numerator rows
+@pytest.mark.parametrize('max_elements', [1, 60 * 3, 60 * 10, 2**24])
+def test_reduced_pair_ratios_blockwise(monkeypatch, max_elements):
+    monkeypatch.setattr(ratios, '_MAX_CHUNK_ELEMENTS', max_elements)
+    ds = _create_dataset()
+    kwargs = dict(
+        molecule='protein', columns=['a', 'b'], numerator_samples=['s0', 's1', 's2', 's6'],
+        denominator_samples=['s3', 's4', 's5', 's6', 's0'],
+    )
+    gt = pd.Series(np.linspace(0.5, 2, 30), index=ds.molecules['protein'].index)
+    for fn, fn_kwargs in [(calculate_sample_pair_ratios, {}), (caclulate_ratio_absolute_error, dict(ground_truth_ratios=gt))]:
+        reduced = fn(ds, reduce=True, **kwargs, **fn_kwargs)
+        expected = _reduce_reference(fn(ds, **kwargs, **fn_kwargs))
+        for column in ['a', 'b']:
+            for statistic in ['count', 'mean', 'median']:
+                np.testing.assert_allclose(
+                    reduced[(column, statistic)].to_numpy(), expected[(statistic, column)].to_numpy(), rtol=1e-12
+                )
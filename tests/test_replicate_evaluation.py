@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from pyproteonet.data import Dataset
+from pyproteonet.masking.replicate_evaluation import evaluate_masked_replicates, non_missing_replicate_masks
+from test_utils import create_random_dataset
+
+
+def _create_dataset() -> Dataset:
+    gt = np.exp(np.random.default_rng(0).normal(10, 1, size=(50, 3)))
+    abundance = gt.copy()
+    abundance[np.random.default_rng(1).random(abundance.shape) < 0.3] = -1
+    return create_random_dataset(
+        num_peptides=50, num_samples=3, columns={'peptide': ['abundance', 'gt']},
+        values={'peptide': {'abundance': abundance, 'gt': gt}}, missing_value=-1,
+    )
+
+
+def test_masks_skip_missing_values():
+    ds = _create_dataset()
+    values = ds.get_samples_value_tensor(molecule='peptide', columns=['abundance'])[0]
+    for mol_pos, sample_pos in non_missing_replicate_masks(
+        ds, molecule='peptide', column='abundance', frac=0.5, num_replicates=3, random_seed=0
+    ):
+        assert len(mol_pos) > 0
+        assert (values[mol_pos, sample_pos] != -1).all()
+
+
+def test_evaluate_masked_replicates_ignores_missing_predictions():
+    ds = _create_dataset()
+    before = ds.get_samples_value_tensor(molecule='peptide', columns=['abundance'])
+
+    def impute_ground_truth(dataset, molecule, column):
+        # ground truth for the first two samples, the last sample is left missing
+        mat = dataset.get_samples_value_matrix(molecule=molecule, column='gt')
+        mat['s2'] = dataset.missing_value
+        return mat
+
+    res = evaluate_masked_replicates(
+        ds, molecule='peptide', column='abundance', impute_fn=impute_ground_truth, num_replicates=2, frac=0.5,
+        random_seed=0,
+    )
+    masks = list(non_missing_replicate_masks(
+        ds, molecule='peptide', column='abundance', frac=0.5, num_replicates=2, random_seed=0
+    ))
+    assert res['count'].tolist() == [(sample_pos < 2).sum() for _, sample_pos in masks]
+    np.testing.assert_allclose(res['mse'], 0, atol=1e-20)
+    np.testing.assert_array_equal(ds.get_samples_value_tensor(molecule='peptide', columns=['abundance']), before)
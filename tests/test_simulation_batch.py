@@ -0,0 +1,60 @@
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.data import Dataset, MoleculeSet
+from pyproteonet.simulation import simulate_replicates
+from pyproteonet.simulation.mock import ProteinPeptideDatasetMocker
+from test_utils import create_random_dataset
+
+
+def _simulate(random_seed: np.random.Generator, num_proteins: int) -> Dataset:
+    ms = MoleculeSet(molecules={'protein': pd.DataFrame(index=pd.Index(np.arange(num_proteins), name='id'))}, mappings={})
+    values = random_seed.normal(size=(num_proteins, 3))
+    return Dataset.from_value_matrices(molecule_set=ms, sample_names=['a', 'b', 'c'], values={'protein': {'abundance': values}})
+
+
+def _matrices(datasets):
+    return [ds.get_samples_value_matrix(molecule='protein').to_numpy() for ds in datasets]
+
+
+@pytest.mark.parametrize('num_workers', [1, 2])
+def test_simulate_replicates_independent_of_workers(num_workers):
+    expected = _matrices(simulate_replicates(5, simulate_fn=_simulate, random_seed=42, num_proteins=6))
+    result = _matrices(simulate_replicates(5, simulate_fn=_simulate, random_seed=42, num_workers=num_workers, num_proteins=6))
+    assert len(result) == 5
+    for matrix, matrix_expected in zip(result, expected):
+        np.testing.assert_array_equal(matrix, matrix_expected)
+    assert not np.array_equal(result[0], result[1])
+
+
+def test_simulate_replicates_generator_seed(tmp_path):
+    def run(seed):
+        return _matrices(simulate_replicates(3, simulate_fn=_simulate, random_seed=seed, num_workers=2, num_proteins=4))
+
+    first, second = run(np.random.default_rng(0)), run(np.random.default_rng(0))
+    for matrix, matrix_same_seed in zip(first, second):
+        np.testing.assert_array_equal(matrix, matrix_same_seed)
+    paths = list(simulate_replicates(2, simulate_fn=_simulate, random_seed=np.random.default_rng(0), num_workers=2,
+                                     output_dir=tmp_path, num_proteins=4))
+    assert [p.name for p in paths] == ['replicate0', 'replicate1']
+    np.testing.assert_array_equal(_matrices([Dataset.load(paths[0])])[0], first[0])
+
+
+def test_mocked_datasets_with_spawned_workers():
+    ds = create_random_dataset(num_proteins=20, num_peptides=100, shared_peptides=[(7, 1)], mean=10, std=2, log_normal=True)
+    mocker = ProteinPeptideDatasetMocker(dataset=ds, mapping='peptide-protein', column='abundance')
+    kwargs = dict(num_datasets=3, random_seed=7, simulate_missing=False)
+    expected = list(mocker.create_mocked_datasets(**kwargs))
+    # spawned workers receive the mocker (and its dataset) pickled
+    result = list(mocker.create_mocked_datasets(num_workers=2, mp_context=multiprocessing.get_context('spawn'), **kwargs))
+    assert len(result) == 3
+    for ds_result, ds_expected in zip(result, expected):
+        for column in ['abundance', 'abundance_gt']:
+            molecule = 'peptide' if column == 'abundance' else 'protein'
+            np.testing.assert_array_equal(
+                ds_result.get_samples_value_tensor(molecule=molecule, columns=[column]),
+                ds_expected.get_samples_value_tensor(molecule=molecule, columns=[column]),
+            )
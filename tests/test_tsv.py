@@ -0,0 +1,65 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyproteonet.io.tsv import write_value_tsv
+
+SPECIAL_VALUES = [1e-05, -1e-05, 0.0, -0.0, 1e16, -1.2345e22, 1.7976931348623157e308, 5e-324, 0.1, 2.5, np.nan, np.inf,
+                  -np.inf, 123456789.125, 1 / 3]
+
+
+def _table(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([
+        np.array(SPECIAL_VALUES).reshape(-1, 3),
+        rng.lognormal(10, 4, size=(20, 3)) * rng.choice([-1, 1], size=(20, 3)),
+    ])
+    values[rng.random(values.shape) < 0.1] = np.nan
+    labels = pd.DataFrame({'id': [f'P{i}' for i in range(len(values))], 'name': [f'gene "{i}"' for i in range(len(values))]})
+    labels.loc[3, 'name'] = np.nan
+    annotations = pd.DataFrame({'score': rng.normal(size=len(values))})
+    return values, labels, annotations
+
+
+def _to_csv(values, labels, annotations, sample_names, **kwargs) -> bytes:
+    df = pd.concat([labels, pd.DataFrame(values, columns=sample_names), annotations], axis=1)
+    return df.to_csv(sep='\t', index=False, lineterminator='\n', **kwargs).encode()
+
+
+@pytest.mark.parametrize('na_rep', ['NA', '', 'NaN'])
+@pytest.mark.parametrize('chunksize', [4, 2**20])
+def test_write_value_tsv_equals_to_csv(tmp_path, na_rep, chunksize):
+    values, labels, annotations = _table()
+    sample_names = ['a', 'b', 'c']
+    path = tmp_path / 'values.tsv'
+    write_value_tsv(path, values, sample_names=sample_names, row_labels=labels, row_annotations=annotations,
+                    na_rep=na_rep, chunksize=chunksize)
+    assert path.read_bytes() == _to_csv(values, labels, annotations, sample_names, na_rep=na_rep)
+
+
+@pytest.mark.parametrize('decimals', [0, 3, 6])
+def test_write_value_tsv_decimals_equal_float_format(tmp_path, decimals):
+    values, labels, _ = _table(1)
+    values = values[~(np.abs(values) >= 1e300)]
+    values = values[: len(values) // 3 * 3].reshape(-1, 3)
+    labels = labels.iloc[: len(values)]
+    sample_names = ['a', 'b', 'c']
+    path = tmp_path / 'values.tsv'
+    write_value_tsv(path, values, sample_names=sample_names, row_labels=labels, decimals=decimals)
+    expected = _to_csv(values, labels, pd.DataFrame(index=labels.index), sample_names, na_rep='NA',
+                       float_format=f'%.{decimals}f')
+    assert path.read_bytes() == expected
+
+
+def test_write_value_tsv_compressed(tmp_path):
+    values, labels, annotations = _table()
+    kwargs = dict(values=values, sample_names=['a', 'b', 'c'], row_labels=labels, row_annotations=annotations)
+    write_value_tsv(tmp_path / 'values.tsv', **kwargs)
+    write_value_tsv(tmp_path / 'values.tsv.gz', compression='gzip', **kwargs)
+    assert gzip.decompress((tmp_path / 'values.tsv.gz').read_bytes()) == (tmp_path / 'values.tsv').read_bytes()
+    zstandard = pytest.importorskip('zstandard')
+    write_value_tsv(tmp_path / 'values.tsv.zst', compression='zstd', **kwargs)
+    with zstandard.ZstdDecompressor().stream_reader(open(tmp_path / 'values.tsv.zst', 'rb')) as reader:
+        assert reader.read() == (tmp_path / 'values.tsv').read_bytes()
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
 import urllib.request
 import zipfile
 
@@ -16,6 +17,60 @@ def load_maxlfq_benchmark(path: Path = TESTDATA_DIR / 'maxlfq_benchmark')->Datas
     return datasets.load_maxlfq_benchmark(path=path)
 
 
+def create_random_dataset(
+    num_proteins: int = 10,
+    num_peptides: int = 40,
+    num_samples: int = 4,
+    shared_peptides: Sequence[Tuple[int, int]] = (),
+    columns: Optional[Dict[str, Sequence[str]]] = None,
+    values: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+    mean: float = 0.0,
+    std: float = 1.0,
+    log_normal: bool = False,
+    decimals: Optional[int] = None,
+    missing_frac: float = 0.3,
+    missing_columns: Sequence[str] = ('abundance',),
+    missing_value: float = np.nan,
+    seed: int = 0,
+) -> Dataset:
+    """Random protein/peptide dataset built with Dataset.from_value_matrices.
+
+    Peptide i belongs to protein "P{i % num_proteins}", every (step, shift) in shared_peptides additionally maps every
+    step-th peptide to the protein shift positions further. Value columns are drawn from a normal (or log normal)
+    distribution unless given in values, a fraction of the cells of the missing_columns is set to missing_value.
+    """
+    rng = np.random.default_rng(seed)
+    proteins = pd.DataFrame(index=pd.Index([f'P{i}' for i in range(num_proteins)], name='id'))
+    peptides = pd.DataFrame(index=pd.Index(np.arange(num_peptides), name='id'))
+    pairs = [(pep, f'P{pep % num_proteins}') for pep in range(num_peptides)]
+    for step, shift in shared_peptides:
+        pairs += [(pep, f'P{(pep + shift) % num_proteins}') for pep in range(0, num_peptides, step)]
+    mapping = pd.DataFrame(pairs, columns=['peptide', 'protein']).drop_duplicates().set_index(['peptide', 'protein'])
+    ms = MoleculeSet(molecules={'protein': proteins, 'peptide': peptides}, mappings={'peptide-protein': mapping})
+    if columns is None:
+        columns = {'peptide': ['abundance']}
+    given = values if values is not None else {}
+    matrices: Dict[str, Dict[str, np.ndarray]] = {}
+    for molecule, mol_columns in columns.items():
+        matrices[molecule] = {}
+        for column in mol_columns:
+            if column in given.get(molecule, {}):
+                matrices[molecule][column] = np.array(given[molecule][column], dtype=np.float64)
+                continue
+            matrix = rng.normal(mean, std, size=(len(ms.molecules[molecule]), num_samples))
+            if log_normal:
+                matrix = np.exp(matrix)
+            if decimals is not None:
+                matrix = np.round(matrix, decimals)
+            if column in missing_columns:
+                matrix[rng.random(matrix.shape) < missing_frac] = missing_value
+            matrices[molecule][column] = matrix
+    return Dataset.from_value_matrices(
+        molecule_set=ms, sample_names=[f's{i}' for i in range(num_samples)], values=matrices,
+        missing_value=missing_value,
+    )
+
+
 def create_toy_dataset()->Dataset:
     proteins = pd.DataFrame(index=['A', 'B', 'C', 'D'])
     peptides = pd.DataFrame(index=list(range(13)))